@@ -0,0 +1,21 @@
+#!/bin/bash
+# Add the secondary indexes declared in models.py to an existing database
+
+echo "🔄 Adding secondary indexes to database..."
+
+cd "$(dirname "$0")/../src/app/api/backend"
+
+python3 << 'EOF_PY'
+from models import ensure_indexes
+
+created = ensure_indexes()
+if created:
+    print(f"✅ Created {len(created)} indexes:")
+    for name in created:
+        print(f"  - {name}")
+else:
+    print("✅ All indexes already exist")
+EOF_PY
+
+echo ""
+echo "✅ Index migration complete!"
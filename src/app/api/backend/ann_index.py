@@ -0,0 +1,96 @@
+"""
+Approximate nearest neighbours for content similarity
+Random-projection LSH (SimHash) over L2-normalised TF-IDF vectors:
+- Each of n_tables hash tables draws n_bits random hyperplanes; a product's
+  bucket is the sign pattern of its vector against them.
+- A query collects the products sharing its bucket in any table (plus buckets
+  one bit away when multi-probe is on) and re-ranks only those candidates with
+  the exact cosine score.
+Buckets are stored as sorted code arrays, so lookups are searchsorted ranges.
+Use benchmark_content_ann.py to compare recall@K and latency with the exact path.
+"""
+
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from typing import List, Tuple
+
+DEFAULT_TABLES = 24
+DEFAULT_BITS = 12
+
+
+class RandomProjectionLSH:
+    def __init__(self, n_tables: int = DEFAULT_TABLES, n_bits: int = DEFAULT_BITS, multi_probe: bool = True, seed: int = 0):
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.multi_probe = multi_probe
+        self.seed = seed
+        self.vectors = None
+        self._planes = None
+        self._sorted_codes: List[np.ndarray] = []
+        self._sorted_rows: List[np.ndarray] = []
+
+    def fit(self, vectors) -> "RandomProjectionLSH":
+        """Index one L2-normalised vector per row."""
+        self.vectors = normalize(sparse.csr_matrix(vectors, dtype=np.float32))
+        rng = np.random.default_rng(self.seed)
+        self._planes = rng.standard_normal(
+            (self.vectors.shape[1], self.n_tables * self.n_bits)
+        ).astype(np.float32)
+
+        codes = self._codes(self.vectors)
+        self._sorted_codes, self._sorted_rows = [], []
+        for table in range(self.n_tables):
+            order = np.argsort(codes[:, table], kind='stable')
+            self._sorted_codes.append(codes[order, table])
+            self._sorted_rows.append(order.astype(np.int32))
+        return self
+
+    def _codes(self, vectors) -> np.ndarray:
+        """Bucket code of every row in every table, shape (rows, n_tables)."""
+        projections = np.asarray(vectors @ self._planes) > 0
+        bits = projections.reshape(vectors.shape[0], self.n_tables, self.n_bits)
+        weights = (1 << np.arange(self.n_bits, dtype=np.int64))
+        return (bits * weights).sum(axis=2)
+
+    def _probe_masks(self) -> np.ndarray:
+        if not self.multi_probe:
+            return np.zeros(1, dtype=np.int64)
+        return np.concatenate([[0], 1 << np.arange(self.n_bits, dtype=np.int64)])
+
+    def candidates(self, query_vector) -> np.ndarray:
+        """Rows sharing a (probed) bucket with the query in any table."""
+        codes = self._codes(query_vector)[0]
+        masks = self._probe_masks()
+        found = []
+        for table in range(self.n_tables):
+            sorted_codes = self._sorted_codes[table]
+            probes = codes[table] ^ masks
+            starts = np.searchsorted(sorted_codes, probes, side='left')
+            ends = np.searchsorted(sorted_codes, probes, side='right')
+            for start, end in zip(starts[ends > starts], ends[ends > starts]):
+                found.append(self._sorted_rows[table][start:end])
+        if not found:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(found))
+
+    def query(self, query_vector, k: int, exclude_row: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k rows by cosine similarity to one query vector.
+        Returns (rows, scores), best first, dropping non-positive scores.
+        """
+        query_vector = normalize(sparse.csr_matrix(query_vector, dtype=np.float32))
+        rows = self.candidates(query_vector)
+        if exclude_row >= 0:
+            rows = rows[rows != exclude_row]
+        if len(rows) == 0:
+            return rows, np.empty(0, dtype=np.float32)
+
+        scores = self.vectors[rows] @ query_vector.toarray().ravel()
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        top = top[scores[top] > 0]
+        return rows[top], scores[top].astype(np.float32)
@@ -7,8 +7,15 @@ import os
 import json
 import sqlite3
 from github_client import GitHubClient
+from sqlite_connections import get_connection_manager
 from ticket_estimator import TicketEstimator
 from ticket_generator import TicketGenerator
+from interaction_store import interaction_store
+from search_index import ensure_search_index
+from trending_store import ensure_trending_backfilled
+from review_stats import ensure_review_stats_backfilled
+from models import Session, ensure_indexes, session
+from instrumentation import get_stage_histograms
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for Next.js frontend
@@ -19,6 +26,14 @@ app.add_url_rule(
 )
 
 
+@app.teardown_appcontext
+def _remove_db_session(exception=None):
+    # End of request: roll back anything left uncommitted and release this thread's session
+    if exception is not None:
+        session.rollback()
+    session.remove()
+
+
 def _normalize_repo(repo: str) -> str:
     """Normalize repository format to owner/repo"""
     if 'github.com/' in repo:
@@ -27,38 +42,33 @@ def _normalize_repo(repo: str) -> str:
 
 
 def _assistant_profile_db_path() -> str:
-    data_dir = os.path.join(os.path.dirname(__file__), 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    return os.path.join(data_dir, 'assistant_profiles.db')
+    return os.path.join(os.path.dirname(__file__), 'data', 'assistant_profiles.db')
 
 
-def _init_assistant_profile_db():
-    conn = sqlite3.connect(_assistant_profile_db_path())
-    cursor = conn.cursor()
-    cursor.execute('''
+def _init_assistant_profile_db(conn: sqlite3.Connection):
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS assistant_user_profiles (
             profile_id TEXT PRIMARY KEY,
             profile_json TEXT NOT NULL,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    conn.commit()
-    conn.close()
+
+
+# Pooled connections (closed at exit); the table is created on the first connection
+_assistant_profile_db = get_connection_manager(_assistant_profile_db_path(), _init_assistant_profile_db)
 
 
 def _get_assistant_profile(profile_id: str):
-    conn = sqlite3.connect(_assistant_profile_db_path())
-    cursor = conn.cursor()
-    cursor.execute(
-        '''
-        SELECT profile_json
-        FROM assistant_user_profiles
-        WHERE profile_id = ?
-        ''',
-        (profile_id,),
-    )
-    row = cursor.fetchone()
-    conn.close()
+    with _assistant_profile_db.connection() as conn:
+        row = conn.execute(
+            '''
+            SELECT profile_json
+            FROM assistant_user_profiles
+            WHERE profile_id = ?
+            ''',
+            (profile_id,),
+        ).fetchone()
 
     if not row:
         return None
@@ -70,23 +80,36 @@ def _get_assistant_profile(profile_id: str):
 
 
 def _save_assistant_profile(profile_id: str, profile):
-    conn = sqlite3.connect(_assistant_profile_db_path())
-    cursor = conn.cursor()
-    cursor.execute(
-        '''
-        INSERT INTO assistant_user_profiles (profile_id, profile_json, updated_at)
-        VALUES (?, ?, CURRENT_TIMESTAMP)
-        ON CONFLICT(profile_id) DO UPDATE SET
-            profile_json=excluded.profile_json,
-            updated_at=CURRENT_TIMESTAMP
-        ''',
-        (profile_id, json.dumps(profile)),
-    )
-    conn.commit()
-    conn.close()
-
-
-_init_assistant_profile_db()
+    with _assistant_profile_db.connection() as conn:
+        conn.execute(
+            '''
+            INSERT INTO assistant_user_profiles (profile_id, profile_json, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(profile_id) DO UPDATE SET
+                profile_json=excluded.profile_json,
+                updated_at=CURRENT_TIMESTAMP
+            ''',
+            (profile_id, json.dumps(profile)),
+        )
+        conn.commit()
+
+
+# Load purchase history into the recommendation interaction store once on startup
+interaction_store.rebuild_from_db()
+
+# Add any secondary indexes declared in models.py that this database is missing
+ensure_indexes()
+
+# Create (or backfill) the full-text product search index and its sync triggers
+ensure_search_index()
+
+# Populate the hourly trending buckets and review histograms from history on first run
+_startup_session = Session()
+try:
+    ensure_trending_backfilled(_startup_session)
+    ensure_review_stats_backfilled(_startup_session)
+finally:
+    _startup_session.close()
 
 # Ticket generation endpoint
 @app.route("/api/tickets/generate", methods=["POST"])
@@ -237,6 +260,12 @@ def save_assistant_profile():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/recommendations/metrics", methods=["GET"])
+def get_recommendation_metrics():
+    # Per-stage timing histograms of the recommendation pipeline
+    return jsonify({"stages": get_stage_histograms()}), 200
+
 if __name__ == "__main__":
     port = int(os.environ.get("BACKEND_PORT", 8000))
-    app.run(debug=True, port=port)
+    # Resolvers use per-thread sessions, so requests can be served concurrently
+    app.run(debug=True, port=port, threaded=True)
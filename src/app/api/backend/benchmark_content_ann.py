@@ -0,0 +1,102 @@
+"""
+Recall@K vs latency benchmark: exact content similarity vs the LSH index
+Generates a synthetic catalog of sparse TF-IDF-like vectors (products drawn
+around topic centroids, like categories/brands in the real catalog), then for a
+sample of query products compares the approximate top-K with the exact top-K.
+
+Usage:
+    python benchmark_content_ann.py --products 100000 --queries 200 --k 10
+    python benchmark_content_ann.py --tables 8,16,24 --bits 10,12
+"""
+
+import argparse
+import time
+
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from ann_index import RandomProjectionLSH, DEFAULT_BITS, DEFAULT_TABLES
+
+
+def synthetic_catalog(n_products: int, n_features: int, n_topics: int, terms_per_product: int, seed: int):
+    """Sparse L2-normalised vectors; each product mixes its topic's terms with random ones."""
+    rng = np.random.default_rng(seed)
+    topic_terms = rng.integers(0, n_features, size=(n_topics, terms_per_product * 2))
+    topics = rng.integers(0, n_topics, size=n_products)
+
+    own_terms = terms_per_product - terms_per_product // 3
+    picks = rng.integers(0, topic_terms.shape[1], size=(n_products, own_terms))
+    cols = np.hstack([
+        topic_terms[topics[:, None], picks],
+        rng.integers(0, n_features, size=(n_products, terms_per_product - own_terms)),
+    ])
+    rows = np.repeat(np.arange(n_products), terms_per_product)
+    weights = rng.random(n_products * terms_per_product).astype(np.float32) + 0.1
+
+    vectors = sparse.csr_matrix((weights, (rows, cols.ravel())), shape=(n_products, n_features))
+    vectors.sum_duplicates()
+    return normalize(vectors)
+
+
+def exact_top_k(vectors, row: int, k: int) -> np.ndarray:
+    scores = vectors @ vectors[row].toarray().ravel()
+    scores[row] = 0.0
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return top[scores[top] > 0]
+
+
+def _int_list(value: str):
+    return [int(part) for part in value.split(',') if part]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Content similarity ANN benchmark")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--features", type=int, default=200, help="Vocabulary size (the TF-IDF model keeps 200)")
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--terms", type=int, default=12, help="Non-zero terms per product")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--tables", type=_int_list, default=[DEFAULT_TABLES])
+    parser.add_argument("--bits", type=_int_list, default=[DEFAULT_BITS])
+    parser.add_argument("--no-multi-probe", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    vectors = synthetic_catalog(args.products, args.features, args.topics, args.terms, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    query_rows = rng.choice(args.products, size=min(args.queries, args.products), replace=False)
+
+    started = time.perf_counter()
+    truth = {int(row): exact_top_k(vectors, int(row), args.k) for row in query_rows}
+    exact_ms = (time.perf_counter() - started) * 1000 / len(query_rows)
+
+    print(f"{args.products} products, {args.features} features, {len(query_rows)} queries, K={args.k}")
+    print(f"{'engine':<24}{'build s':>10}{'query ms':>10}{'recall@K':>10}{'candidates':>12}")
+    print(f"{'exact':<24}{'-':>10}{exact_ms:>10.3f}{1.0:>10.3f}{args.products:>12}")
+
+    for n_tables in args.tables:
+        for n_bits in args.bits:
+            started = time.perf_counter()
+            index = RandomProjectionLSH(n_tables, n_bits, multi_probe=not args.no_multi_probe, seed=args.seed).fit(vectors)
+            build_s = time.perf_counter() - started
+
+            hits = expected = candidates = 0
+            started = time.perf_counter()
+            for row in query_rows:
+                found, _ = index.query(vectors[int(row)], args.k, exclude_row=int(row))
+                hits += len(np.intersect1d(found, truth[int(row)]))
+                expected += len(truth[int(row)])
+            query_ms = (time.perf_counter() - started) * 1000 / len(query_rows)
+            for row in query_rows:
+                candidates += len(index.candidates(vectors[int(row)]))
+
+            recall = hits / expected if expected else 1.0
+            label = f"lsh L={n_tables} b={n_bits}"
+            print(f"{label:<24}{build_s:>10.2f}{query_ms:>10.3f}{recall:>10.3f}{candidates // len(query_rows):>12}")
+
+
+if __name__ == "__main__":
+    main()
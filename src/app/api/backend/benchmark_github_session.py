@@ -0,0 +1,117 @@
+"""
+Connection reuse in GitHubClient (see github_client.get_http_session)
+Starts a local keep-alive stub of the GitHub REST API (optionally over TLS with
+a throwaway self-signed certificate made by the openssl CLI) and times the same
+sequence of GETs issued with module-level requests.get, which opens a new
+connection per call, and with the shared pooled session.
+
+Usage:
+    python benchmark_github_session.py --requests 500
+    python benchmark_github_session.py --requests 500 --tls --threads 4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from github_client import build_http_session
+
+BODY = json.dumps([{"number": n, "head": {"ref": f"feature-{n}"}} for n in range(30)]).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without TCP_NODELAY keep-alive
+    # responses stall on delayed ACKs, which real servers do not do
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+def _self_signed_certificate(directory: str):
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-subj", "/CN=localhost", "-addext", "subjectAltName=IP:127.0.0.1",
+            "-keyout", key, "-out", cert,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def start_stub(tls: bool, scratch: str):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    cert = None
+    if tls:
+        cert, key = _self_signed_certificate(scratch)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    scheme = "https" if tls else "http"
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}/repos/octo/repo/pulls", cert
+
+
+def run(get, url: str, count: int, threads: int, verify) -> float:
+    def fetch(_):
+        response = get(url, params={"per_page": 30}, verify=verify)
+        response.raise_for_status()
+        return len(response.content)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(fetch, range(count)))
+    return time.perf_counter() - start
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="GitHub client HTTP session benchmark")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--tls", action="store_true", help="serve over HTTPS to include TLS handshakes")
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.mkdtemp(prefix="github-session-bench-")
+    try:
+        server, url, cert = start_stub(args.tls, scratch)
+        verify = cert or True
+        shared = build_http_session()
+        results = [
+            ("requests.get", run(requests.get, url, args.requests, args.threads, verify)),
+            ("shared session", run(shared.get, url, args.requests, args.threads, verify)),
+        ]
+        server.shutdown()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print(f"{args.requests} GETs, {args.threads} thread(s), {'https' if args.tls else 'http'}")
+    print(f"{'client':<16}{'total s':>10}{'ms/req':>10}{'req/s':>10}")
+    for name, seconds in results:
+        print(f"{name:<16}{seconds:>10.2f}{seconds * 1000 / args.requests:>10.2f}{args.requests / seconds:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
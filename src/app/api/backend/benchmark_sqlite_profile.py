@@ -0,0 +1,127 @@
+"""
+Read/write throughput of the SQLite engine profiles (see models.SQLITE_PROFILES)
+Copies products.db to a scratch directory per profile, then runs reader threads
+(product pages with variants, like Query.products) alongside writer threads
+(checkout-style transactions inserting an order with items) for a fixed time.
+
+Usage:
+    python benchmark_sqlite_profile.py --readers 8 --writers 2 --seconds 10
+    python benchmark_sqlite_profile.py --profiles default,production
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import create_sqlite_engine
+
+SOURCE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "products.db")
+
+READ_SQL = text("""
+    SELECT p.id, p.name, p.price, v.id, v.sku, v.color
+    FROM products p JOIN variants v ON v.product_id = p.id
+    WHERE p.id > :after ORDER BY p.id LIMIT 200
+""")
+
+
+def _reader(engine, deadline: float, stats: dict, lock: threading.Lock) -> None:
+    reads = errors = 0
+    after = 0
+    while time.perf_counter() < deadline:
+        try:
+            with engine.connect() as connection:
+                rows = connection.execute(READ_SQL, {"after": after}).fetchall()
+            after = rows[-1][0] if rows else 0
+            reads += 1
+        except OperationalError:
+            errors += 1
+    with lock:
+        stats["reads"] += reads
+        stats["read_errors"] += errors
+
+
+def _writer(engine, deadline: float, stats: dict, lock: threading.Lock, user_id: int, product_id: int, variant_id: int) -> None:
+    writes = errors = 0
+    while time.perf_counter() < deadline:
+        try:
+            with engine.begin() as connection:
+                order_id = connection.execute(
+                    text("INSERT INTO orders (user_id, status, total, created_at) VALUES (:u, 'pending', 10.0, datetime('now'))"),
+                    {"u": user_id},
+                ).lastrowid
+                for _ in range(3):
+                    connection.execute(
+                        text("""
+                            INSERT INTO order_items
+                                (order_id, product_id, variant_id, quantity, price, product_name, color, size, added_at)
+                            VALUES (:o, :p, :v, 1, 10.0, 'bench', 'bench', 'M', datetime('now'))
+                        """),
+                        {"o": order_id, "p": product_id, "v": variant_id},
+                    )
+            writes += 1
+        except OperationalError:
+            errors += 1
+    with lock:
+        stats["writes"] += writes
+        stats["write_errors"] += errors
+
+
+def run_profile(profile: str, readers: int, writers: int, seconds: float) -> dict:
+    scratch = tempfile.mkdtemp(prefix="sqlite-bench-")
+    try:
+        path = os.path.join(scratch, "products.db")
+        shutil.copyfile(SOURCE_DB, path)
+        engine = create_sqlite_engine(f"sqlite:///{path}", profile)
+        if profile == "default":
+            # The source file may already be in WAL mode; start from the stock rollback journal
+            with engine.connect() as connection:
+                connection.exec_driver_sql("PRAGMA journal_mode=DELETE")
+
+        with engine.connect() as connection:
+            user_id = connection.execute(text("SELECT id FROM users LIMIT 1")).scalar()
+            product_id, variant_id = connection.execute(text("SELECT product_id, id FROM variants LIMIT 1")).one()
+
+        stats = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=_reader, args=(engine, deadline, stats, lock)) for _ in range(readers)]
+        threads += [
+            threading.Thread(target=_writer, args=(engine, deadline, stats, lock, user_id, product_id, variant_id))
+            for _ in range(writers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+        return stats
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="SQLite engine profile benchmark")
+    parser.add_argument("--profiles", default="default,production")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g}s per profile")
+    print(f"{'profile':<12}{'reads/s':>10}{'writes/s':>10}{'read errs':>11}{'write errs':>12}")
+    for profile in args.profiles.split(","):
+        stats = run_profile(profile, args.readers, args.writers, args.seconds)
+        print(
+            f"{profile:<12}{stats['reads'] / args.seconds:>10.1f}{stats['writes'] / args.seconds:>10.1f}"
+            f"{stats['read_errors']:>11}{stats['write_errors']:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,30 +2,97 @@
 GitHub API client for fetching repository history and metrics
 """
 import requests
-from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Optional, Tuple, Any
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import parse_qs, urlparse
 import sqlite3
 import json
+import math
 import os
 import statistics
 import re
+import threading
+import time
 from difflib import SequenceMatcher
+from email.utils import parsedate_to_datetime
+from sqlite_connections import get_connection_manager
+
+# Concurrent page requests per paginated endpoint
+PAGE_FETCH_WORKERS = 4
+
+# Longest we sleep for a rate-limit reset before giving up on a request
+RATE_LIMIT_MAX_WAIT_SECONDS = 60
+RATE_LIMIT_MAX_RETRIES = 3
+
+# Keep-alive connections kept per host; covers every endpoint family paging at once
+HTTP_POOL_SIZE = 16
+
+# Transport-level retries: transient 5xx with exponential backoff. Rate limits
+# (403/429 and their Retry-After) are left to GitHubClient._get, which caps the
+# wait at RATE_LIMIT_MAX_WAIT_SECONDS; urllib3 would sleep for any Retry-After.
+HTTP_RETRY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(500, 502, 503, 504),
+    allowed_methods=frozenset({"GET"}),
+    respect_retry_after_header=False,
+    raise_on_status=False,
+)
+
+
+def build_http_session(
+    pool_size: int = HTTP_POOL_SIZE,
+    retry: Retry = HTTP_RETRY,
+    compress: bool = True,
+) -> requests.Session:
+    """requests.Session with a keep-alive pool and retries; compress=False asks for identity encoding"""
+    http_session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    http_session.mount("https://", adapter)
+    http_session.mount("http://", adapter)
+    http_session.headers["Accept-Encoding"] = "gzip, deflate" if compress else "identity"
+    return http_session
+
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Process-wide session shared by every GitHubClient and thread, so ticket
+    requests reuse warm TCP/TLS connections. Auth stays per request.
+    """
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                _http_session = build_http_session()
+    return _http_session
 
 class GitHubClient:
-    def __init__(self, token: str):
+    def __init__(self, token: str, db_path: Optional[str] = None, http_session: Optional[requests.Session] = None):
         self.token = token
         self.base_url = "https://api.github.com"
         self.headers = {
             "Authorization": f"Bearer {token}",
             "Accept": "application/vnd.github.v3+json"
         }
-        self.db_path = os.path.join(os.path.dirname(__file__), 'data', 'repo_cache.db')
-        self._init_db()
+        self.db_path = db_path or os.path.join(os.path.dirname(__file__), 'data', 'repo_cache.db')
+        self.http_session = http_session or get_http_session()
+        # Last seen X-RateLimit-Remaining / X-RateLimit-Reset (None until the first response)
+        self.rate_limit_remaining: Optional[int] = None
+        self.rate_limit_reset: Optional[float] = None
+        self._rate_limit_lock = threading.Lock()
+        # Schema is created once per process, on the first connection to db_path
+        self._db = get_connection_manager(self.db_path, self._create_schema)
     
-    def _init_db(self):
-        """Initialize SQLite database for caching"""
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        conn = sqlite3.connect(self.db_path)
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        """Create the caching tables (runs inside the manager's first transaction)"""
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -53,6 +120,20 @@ class GitHubClient:
             )
         ''')
 
+        # Per-endpoint validators for conditional requests, plus the newest
+        # PR updated_at seen (high-water mark for incremental PR sync)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                repo_name TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                high_water_mark TEXT,
+                synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (repo_name, endpoint)
+            )
+        ''')
+
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS ticket_history (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -71,23 +152,22 @@ class GitHubClient:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
-        
-        conn.commit()
-        conn.close()
     
-    def _get_cached_data(self, repo_name: str, max_age_hours: int = 24) -> Optional[Dict]:
-        """Get cached repository data if fresh enough"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _get_cached_data(self, repo_name: str, max_age_hours: Optional[int] = 24) -> Optional[Dict]:
+        """Get cached repository data if fresh enough (any age when max_age_hours is None)"""
+        with self._db.connection() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT data, cached_at FROM repo_cache 
-            WHERE repo_name = ? 
-            AND datetime(cached_at) > datetime('now', ?)
-        ''', (repo_name, f'-{max_age_hours} hours'))
+            if max_age_hours is None:
+                cursor.execute('SELECT data, cached_at FROM repo_cache WHERE repo_name = ?', (repo_name,))
+            else:
+                cursor.execute('''
+                    SELECT data, cached_at FROM repo_cache 
+                    WHERE repo_name = ? 
+                    AND datetime(cached_at) > datetime('now', ?)
+                ''', (repo_name, f'-{max_age_hours} hours'))
         
-        result = cursor.fetchone()
-        conn.close()
+            result = cursor.fetchone()
         
         if result:
             return json.loads(result[0])
@@ -95,23 +175,79 @@ class GitHubClient:
     
     def _cache_data(self, repo_name: str, data: Dict):
         """Cache repository data"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._db.connection() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO repo_cache (repo_name, data, cached_at)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-        ''', (repo_name, json.dumps(data)))
+            cursor.execute('''
+                INSERT OR REPLACE INTO repo_cache (repo_name, data, cached_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            ''', (repo_name, json.dumps(data)))
         
-        conn.commit()
-        conn.close()
+            conn.commit()
+
+    def _get_sync_state(self, repo_name: str, endpoint: str) -> Dict[str, Optional[str]]:
+        """Stored validators and high-water mark of an endpoint ({} before its first sync)"""
+        with self._db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            row = cursor.execute(
+                'SELECT etag, last_modified, high_water_mark FROM sync_state WHERE repo_name = ? AND endpoint = ?',
+                (repo_name, endpoint),
+            ).fetchone()
+        return dict(row) if row else {}
+
+    def _save_sync_state(
+        self,
+        repo_name: str,
+        endpoint: str,
+        response: requests.Response,
+        high_water_mark: Optional[str] = None,
+    ) -> None:
+        with self._db.connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO sync_state (repo_name, endpoint, etag, last_modified, high_water_mark, synced_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (
+                repo_name,
+                endpoint,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                high_water_mark,
+            ))
+            conn.commit()
+
+    def _clear_sync_state(self, repo_name: str, endpoint: str) -> None:
+        """Forget an endpoint's validators and high-water mark, forcing a full fetch next time"""
+        with self._db.connection() as conn:
+            conn.execute('DELETE FROM sync_state WHERE repo_name = ? AND endpoint = ?', (repo_name, endpoint))
+            conn.commit()
+
+    def _get_first_page(
+        self,
+        repo_name: str,
+        endpoint: str,
+        url: str,
+        params: Dict,
+        conditional: bool,
+    ) -> requests.Response:
+        """First page of an endpoint, conditional on the stored ETag/Last-Modified when requested"""
+        headers = {}
+        if conditional:
+            state = self._get_sync_state(repo_name, endpoint)
+            if state.get("etag"):
+                headers["If-None-Match"] = state["etag"]
+            if state.get("last_modified"):
+                headers["If-Modified-Since"] = state["last_modified"]
+        return self._get(url, params, headers)
     
-    def fetch_repository_stats(self, repo_name: str, use_cache: bool = True) -> Dict[str, Any]:
+    def fetch_repository_stats(self, repo_name: str, use_cache: bool = True, incremental: bool = True) -> Dict[str, Any]:
         """
         Fetch comprehensive repository statistics
         Args:
             repo_name: Format "owner/repo"
             use_cache: Whether to use cached data
+            incremental: Sync against the last cached data with conditional
+                requests instead of downloading everything again
         Returns:
             Dictionary with repo stats and historical data
         """
@@ -119,14 +255,23 @@ class GitHubClient:
             cached = self._get_cached_data(repo_name)
             if cached:
                 return cached
+
+        previous = (self._get_cached_data(repo_name, max_age_hours=None) if incremental else None) or {}
         
-        stats = {
-            "repo_name": repo_name,
-            "branches": self._fetch_branches(repo_name),
-            "pull_requests": self._fetch_pull_requests(repo_name),
-            "commits": self._fetch_recent_commits(repo_name),
-            "metrics": {}
-        }
+        # The three endpoint families are independent; each paginates on its own pool
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            branches = executor.submit(self._fetch_branches, repo_name, previous.get("branches"))
+            pull_requests = executor.submit(
+                self._fetch_pull_requests, repo_name, cached=previous.get("pull_requests")
+            )
+            commits = executor.submit(self._fetch_recent_commits, repo_name, cached=previous.get("commits"))
+            stats = {
+                "repo_name": repo_name,
+                "branches": branches.result(),
+                "pull_requests": pull_requests.result(),
+                "commits": commits.result(),
+                "metrics": {}
+            }
         
         # Calculate metrics
         stats["metrics"] = self._calculate_metrics(stats)
@@ -136,63 +281,242 @@ class GitHubClient:
         
         return stats
     
-    def _fetch_branches(self, repo_name: str) -> List[Dict]:
-        """Fetch all branches"""
-        url = f"{self.base_url}/repos/{repo_name}/branches"
-        response = requests.get(url, headers=self.headers)
+    def _record_rate_limit(self, response: requests.Response) -> None:
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        with self._rate_limit_lock:
+            if remaining is not None:
+                self.rate_limit_remaining = int(remaining)
+            if reset is not None:
+                self.rate_limit_reset = float(reset)
+
+    def _rate_limit_wait(self, response: requests.Response) -> Optional[float]:
+        """Seconds to wait before retrying a rate-limited response, None if it was not rate limited"""
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get("Retry-After")
+        wait = self._retry_after_seconds(retry_after) if retry_after is not None else None
+        if wait is not None:
+            return wait
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            reset = float(response.headers.get("X-RateLimit-Reset", time.time()))
+            return max(reset - time.time(), 0) + 1
+        return None
+
+    @staticmethod
+    def _retry_after_seconds(retry_after: str) -> Optional[float]:
+        """Retry-After as seconds (delta-seconds or HTTP date), None when it cannot be parsed"""
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(retry_at.timestamp() - time.time(), 0)
+
+    def _get(self, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None) -> requests.Response:
+        """GET that waits out short rate-limit windows (primary and secondary limits)"""
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            response = self.http_session.get(url, headers={**self.headers, **(headers or {})}, params=params)
+            self._record_rate_limit(response)
+            wait = self._rate_limit_wait(response)
+            if wait is None or wait > RATE_LIMIT_MAX_WAIT_SECONDS or attempt == RATE_LIMIT_MAX_RETRIES:
+                break
+            time.sleep(wait)
         response.raise_for_status()
-        return response.json()
+        return response
+
+    def _paginate(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        max_pages: Optional[int] = None,
+        first: Optional[requests.Response] = None,
+    ) -> Tuple[List[Dict], bool]:
+        """
+        Fetch every page of a list endpoint following its Link header.
+        When the first page advertises rel="last", the remaining pages are
+        requested concurrently, capped by max_pages and the remaining rate-limit
+        budget; otherwise rel="next" is followed one page at a time.
+        `first` is an already fetched first page. Returns the items in page order
+        and whether the rate-limit budget cut the page range short.
+        """
+        params = dict(params or {})
+        first = first or self._get(url, params)
+        pages = {1: first.json()}
+        truncated = False
+
+        last_link = first.links.get("last")
+        if last_link:
+            last_page = int(parse_qs(urlparse(last_link["url"]).query).get("page", ["1"])[0])
+            if max_pages:
+                last_page = min(last_page, max_pages)
+            if self.rate_limit_remaining is not None and last_page > 1 + self.rate_limit_remaining:
+                last_page = 1 + self.rate_limit_remaining
+                truncated = True
+
+            with ThreadPoolExecutor(max_workers=PAGE_FETCH_WORKERS) as executor:
+                futures = {
+                    executor.submit(self._get, url, {**params, "page": page}): page
+                    for page in range(2, last_page + 1)
+                }
+                for future in as_completed(futures):
+                    pages[futures[future]] = future.result().json()
+        else:
+            next_link = first.links.get("next")
+            while next_link and (not max_pages or len(pages) < max_pages):
+                # The next URL already carries the query string
+                response = self._get(next_link["url"])
+                items = response.json()
+                pages[len(pages) + 1] = items
+                next_link = response.links.get("next")
+
+        return [item for page in sorted(pages) for item in pages[page]], truncated
+
+    def _fetch_branches(self, repo_name: str, cached: Optional[List[Dict]] = None) -> List[Dict]:
+        """
+        Fetch all branches. Branches are listed by name, so a new branch can land
+        on any page; a 304 on the first page only proves the list unchanged when
+        the cached list fits on that page. Longer lists are always refetched.
+        """
+        url = f"{self.base_url}/repos/{repo_name}/branches"
+        params = {"per_page": 100}
+        single_page = cached is not None and len(cached) < params["per_page"]
+        first = self._get_first_page(repo_name, "branches", url, params, conditional=single_page)
+        if first.status_code == 304:
+            return cached
+        branches, _ = self._paginate(url, params, first=first)
+        self._save_sync_state(repo_name, "branches", first)
+        return branches
     
-    def _fetch_pull_requests(self, repo_name: str, state: str = "all", max_results: int = 100) -> List[Dict]:
-        """Fetch pull requests with their details"""
+    def _fetch_pull_requests(
+        self,
+        repo_name: str,
+        state: str = "all",
+        max_results: Optional[int] = None,
+        cached: Optional[List[Dict]] = None,
+    ) -> List[Dict]:
+        """
+        Fetch pull requests with their details (every page unless max_results is given).
+        With the previously fetched PRs in `cached`, only PRs updated after the
+        stored high-water mark are downloaded and written to branch_history.
+        Merged PRs are no longer written as each page arrives: every page is
+        downloaded first and the rows are upserted in one transaction afterwards,
+        so SQLite's write lock is never held across network I/O.
+        """
         url = f"{self.base_url}/repos/{repo_name}/pulls"
-        params = {"state": state, "per_page": min(max_results, 100), "sort": "updated", "direction": "desc"}
-        
-        response = requests.get(url, headers=self.headers, params=params)
-        response.raise_for_status()
-        pulls = response.json()
-        
-        # Store in database
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        for pr in pulls:
-            if pr.get('merged_at'):
-                created_at = datetime.fromisoformat(pr['created_at'].replace('Z', '+00:00'))
-                merged_at = datetime.fromisoformat(pr['merged_at'].replace('Z', '+00:00'))
-                time_to_merge = (merged_at - created_at).total_seconds() / 3600
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO branch_history 
-                    (repo_name, branch_name, created_at, merged_at, time_to_merge_hours, 
-                     pr_number, commits_count, files_changed, additions, deletions)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    repo_name,
-                    pr['head']['ref'],
-                    pr['created_at'],
-                    pr['merged_at'],
-                    time_to_merge,
-                    pr['number'],
-                    pr.get('commits', 0),
-                    pr.get('changed_files', 0),
-                    pr.get('additions', 0),
-                    pr.get('deletions', 0)
-                ))
-        
-        conn.commit()
-        conn.close()
-        
+        per_page = min(max_results or 100, 100)
+        params = {"state": state, "per_page": per_page, "sort": "updated", "direction": "desc"}
+        max_pages = math.ceil(max_results / per_page) if max_results else None
+
+        high_water_mark = None
+        if cached is not None:
+            high_water_mark = self._get_sync_state(repo_name, "pulls").get("high_water_mark")
+        first = self._get_first_page(repo_name, "pulls", url, params, conditional=high_water_mark is not None)
+        if first.status_code == 304:
+            return cached
+
+        truncated = False
+        if high_water_mark is None:
+            fetched, truncated = self._paginate(url, params, max_pages=max_pages, first=first)
+            pulls = fetched
+        else:
+            fetched = self._fetch_updated_pulls(first, high_water_mark)
+            pulls = fetched + cached
+
+        # Newest first, so a PR updated while paging (or since the last sync) keeps its latest copy
+        unique_pulls = {}
+        for pr in sorted(pulls, key=lambda pr: pr.get('updated_at') or '', reverse=True):
+            unique_pulls.setdefault(pr['number'], pr)
+        pulls = list(unique_pulls.values())
+
+        fetched_numbers = {pr['number'] for pr in fetched}
+        with self._db.connection() as conn, conn:
+            self._store_merged_pulls(
+                conn.cursor(), repo_name, [pr for pr in pulls if pr['number'] in fetched_numbers]
+            )
+
+        if truncated:
+            # The oldest pages are missing; without stored validators or a
+            # high-water mark the next sync downloads the full list again
+            self._clear_sync_state(repo_name, "pulls")
+            return pulls
+
+        new_high_water_mark = max((pr['updated_at'] for pr in pulls if pr.get('updated_at')), default=None)
+        self._save_sync_state(repo_name, "pulls", first, new_high_water_mark or high_water_mark)
         return pulls
+
+    def _fetch_updated_pulls(self, first: requests.Response, high_water_mark: str) -> List[Dict]:
+        """Walk pages (sorted by updated desc) until reaching PRs at or before the high-water mark"""
+        updated = []
+        response = first
+        while True:
+            page = response.json()
+            # ISO-8601 UTC timestamps compare correctly as strings
+            fresh = [pr for pr in page if (pr.get('updated_at') or '') > high_water_mark]
+            updated.extend(fresh)
+            next_link = response.links.get("next")
+            if len(fresh) < len(page) or not next_link:
+                return updated
+            response = self._get(next_link["url"])
+
+    @staticmethod
+    def _time_to_merge_hours(pr: Dict) -> float:
+        """
+        Hours from creation to merge of a merged PR. Parsed once and kept on the
+        PR dict (it is cached with the stats), so _calculate_metrics reuses it.
+        """
+        if 'time_to_merge_hours' not in pr:
+            created_at = datetime.fromisoformat(pr['created_at'].replace('Z', '+00:00'))
+            merged_at = datetime.fromisoformat(pr['merged_at'].replace('Z', '+00:00'))
+            pr['time_to_merge_hours'] = (merged_at - created_at).total_seconds() / 3600
+        return pr['time_to_merge_hours']
+
+    def _store_merged_pulls(self, cursor: sqlite3.Cursor, repo_name: str, pulls: List[Dict]) -> None:
+        """Upsert the merged PRs of a sync with one executemany (not committed)"""
+        rows = [
+            (
+                repo_name,
+                pr['head']['ref'],
+                pr['created_at'],
+                pr['merged_at'],
+                self._time_to_merge_hours(pr),
+                pr['number'],
+                pr.get('commits', 0),
+                pr.get('changed_files', 0),
+                pr.get('additions', 0),
+                pr.get('deletions', 0)
+            )
+            for pr in pulls
+            if pr.get('merged_at')
+        ]
+        cursor.executemany('''
+            INSERT OR REPLACE INTO branch_history 
+            (repo_name, branch_name, created_at, merged_at, time_to_merge_hours, 
+             pr_number, commits_count, files_changed, additions, deletions)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
     
-    def _fetch_recent_commits(self, repo_name: str, max_results: int = 100) -> List[Dict]:
-        """Fetch recent commits"""
+    def _fetch_recent_commits(
+        self,
+        repo_name: str,
+        max_results: int = 100,
+        cached: Optional[List[Dict]] = None,
+    ) -> List[Dict]:
+        """Fetch recent commits; the cached list is kept while the first page is unchanged"""
         url = f"{self.base_url}/repos/{repo_name}/commits"
-        params = {"per_page": min(max_results, 100)}
-        
-        response = requests.get(url, headers=self.headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        per_page = min(max_results, 100)
+        params = {"per_page": per_page}
+        first = self._get_first_page(repo_name, "commits", url, params, conditional=cached is not None)
+        if first.status_code == 304:
+            return cached
+        commits, _ = self._paginate(url, params, max_pages=math.ceil(max_results / per_page), first=first)
+        self._save_sync_state(repo_name, "commits", first)
+        return commits[:max_results]
     
     def _calculate_metrics(self, stats: Dict) -> Dict[str, Any]:
         """Calculate useful metrics from fetched data"""
@@ -214,10 +538,7 @@ class GitHubClient:
         files_changed_counts = []
         
         for pr in merged_pulls:
-            created = datetime.fromisoformat(pr['created_at'].replace('Z', '+00:00'))
-            merged = datetime.fromisoformat(pr['merged_at'].replace('Z', '+00:00'))
-            time_diff = (merged - created).total_seconds() / 3600
-            times_to_merge.append(time_diff)
+            times_to_merge.append(self._time_to_merge_hours(pr))
             commits_counts.append(pr.get('commits', 0))
             files_changed_counts.append(pr.get('changed_files', 0))
         
@@ -236,21 +557,20 @@ class GitHubClient:
     
     def get_historical_tasks(self, repo_name: str) -> List[Dict]:
         """Get historical branch/PR data from database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._db.connection() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT branch_name, created_at, merged_at, time_to_merge_hours,
-                   commits_count, files_changed, additions, deletions
-            FROM branch_history
-            WHERE repo_name = ? AND merged_at IS NOT NULL
-            ORDER BY merged_at DESC
-        ''', (repo_name,))
+            cursor.execute('''
+                SELECT branch_name, created_at, merged_at, time_to_merge_hours,
+                       commits_count, files_changed, additions, deletions
+                FROM branch_history
+                WHERE repo_name = ? AND merged_at IS NOT NULL
+                ORDER BY merged_at DESC
+            ''', (repo_name,))
         
-        columns = [desc[0] for desc in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            columns = [desc[0] for desc in cursor.description]
+            results = [dict(zip(columns, row)) for row in cursor.fetchall()]
         
-        conn.close()
         return results
 
     def save_ticket_history(
@@ -269,114 +589,111 @@ class GitHubClient:
         normalized_title = self._normalize_ticket_title(ticket.get("title", ""), normalized_task)
         new_fingerprint = self._task_fingerprint(normalized_task)
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute(
-            '''
-            SELECT task_description, title
-            FROM ticket_history
-            WHERE repo_name = ?
-              AND context = ?
-              AND datetime(created_at) > datetime('now', '-24 hours')
-            ORDER BY datetime(created_at) DESC
-            LIMIT 50
-            ''',
-            (repo_name, context),
-        )
-
-        existing_recent = cursor.fetchall()
-        for existing_task, existing_title in existing_recent:
-            existing_task_normalized = " ".join(((existing_task or "").lower()).split())
-            existing_title_normalized = self._normalize_ticket_title(
-                existing_title or "",
-                existing_task_normalized,
+        with self._db.connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(
+                '''
+                SELECT task_description, title
+                FROM ticket_history
+                WHERE repo_name = ?
+                  AND context = ?
+                  AND datetime(created_at) > datetime('now', '-24 hours')
+                ORDER BY datetime(created_at) DESC
+                LIMIT 50
+                ''',
+                (repo_name, context),
             )
 
-            exact_match = existing_task_normalized == normalized_task
-            fingerprint_match = (
-                new_fingerprint
-                and self._task_fingerprint(existing_task_normalized) == new_fingerprint
+            existing_recent = cursor.fetchall()
+            for existing_task, existing_title in existing_recent:
+                existing_task_normalized = " ".join(((existing_task or "").lower()).split())
+                existing_title_normalized = self._normalize_ticket_title(
+                    existing_title or "",
+                    existing_task_normalized,
+                )
+
+                exact_match = existing_task_normalized == normalized_task
+                fingerprint_match = (
+                    new_fingerprint
+                    and self._task_fingerprint(existing_task_normalized) == new_fingerprint
+                )
+                task_similarity = SequenceMatcher(None, normalized_task, existing_task_normalized).ratio()
+                title_similarity = SequenceMatcher(
+                    None,
+                    normalized_title.lower(),
+                    existing_title_normalized.lower(),
+                ).ratio()
+
+                if exact_match or fingerprint_match or (task_similarity >= 0.88 and title_similarity >= 0.9):
+                    return
+
+            cursor.execute(
+                '''
+                INSERT INTO ticket_history (
+                    repo_name,
+                    ticket_id,
+                    title,
+                    context,
+                    task_description,
+                    estimated_hours,
+                    estimate_low,
+                    estimate_high,
+                    confidence,
+                    predicted_commits,
+                    github_commits_overall_snapshot,
+                    merged_prs_snapshot
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (
+                    repo_name,
+                    ticket.get("id", "UNKNOWN"),
+                    normalized_title,
+                    context,
+                    normalized_task,
+                    estimation.get("hours", 0),
+                    estimation.get("range", [0, 0])[0],
+                    estimation.get("range", [0, 0])[1],
+                    estimation.get("confidence", 0),
+                    metrics.get("avg_commits_per_pr", 0),
+                    len(commits),
+                    metrics.get("total_merged_prs", 0),
+                ),
             )
-            task_similarity = SequenceMatcher(None, normalized_task, existing_task_normalized).ratio()
-            title_similarity = SequenceMatcher(
-                None,
-                normalized_title.lower(),
-                existing_title_normalized.lower(),
-            ).ratio()
-
-            if exact_match or fingerprint_match or (task_similarity >= 0.88 and title_similarity >= 0.9):
-                conn.close()
-                return
-
-        cursor.execute(
-            '''
-            INSERT INTO ticket_history (
-                repo_name,
-                ticket_id,
-                title,
-                context,
-                task_description,
-                estimated_hours,
-                estimate_low,
-                estimate_high,
-                confidence,
-                predicted_commits,
-                github_commits_overall_snapshot,
-                merged_prs_snapshot
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''',
-            (
-                repo_name,
-                ticket.get("id", "UNKNOWN"),
-                normalized_title,
-                context,
-                normalized_task,
-                estimation.get("hours", 0),
-                estimation.get("range", [0, 0])[0],
-                estimation.get("range", [0, 0])[1],
-                estimation.get("confidence", 0),
-                metrics.get("avg_commits_per_pr", 0),
-                len(commits),
-                metrics.get("total_merged_prs", 0),
-            ),
-        )
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
     def get_ticket_history(self, repo_name: str, limit: int = 50) -> List[Dict[str, Any]]:
         """Return ticket generation history for a repository"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute(
-            '''
-            SELECT
-                id,
-                ticket_id,
-                title,
-                task_description,
-                context,
-                estimated_hours,
-                estimate_low,
-                estimate_high,
-                confidence,
-                predicted_commits,
-                github_commits_overall_snapshot,
-                merged_prs_snapshot,
-                created_at
-            FROM ticket_history
-            WHERE repo_name = ?
-            ORDER BY datetime(created_at) DESC
-            LIMIT ?
-            ''',
-            (repo_name, limit),
-        )
+        with self._db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+
+            cursor.execute(
+                '''
+                SELECT
+                    id,
+                    ticket_id,
+                    title,
+                    task_description,
+                    context,
+                    estimated_hours,
+                    estimate_low,
+                    estimate_high,
+                    confidence,
+                    predicted_commits,
+                    github_commits_overall_snapshot,
+                    merged_prs_snapshot,
+                    created_at
+                FROM ticket_history
+                WHERE repo_name = ?
+                ORDER BY datetime(created_at) DESC
+                LIMIT ?
+                ''',
+                (repo_name, limit),
+            )
 
-        rows = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+            rows = [dict(row) for row in cursor.fetchall()]
 
         deduped_rows: List[Dict[str, Any]] = []
         seen_ticket_ids = set()
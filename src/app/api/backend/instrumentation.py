@@ -0,0 +1,130 @@
+"""
+Lightweight instrumentation for the recommendation hot paths
+- stage_timer(name): context manager recording wall time into a per-stage histogram
+- get_stage_histograms(): snapshot of all histograms (served by /api/recommendations/metrics)
+- get_logger(name): leveled logger that is silent by default and can be sampled
+
+Configuration (environment):
+- RECOMMENDATIONS_DEBUG=1 enables debug logging (off by default)
+- RECOMMENDATIONS_LOG_SAMPLE_RATE=0.05 keeps ~5% of debug lines when enabled
+"""
+
+import bisect
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+# Upper bounds (milliseconds) of the histogram buckets; the last bucket is +Inf
+STAGE_BUCKETS_MS = [1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class StageHistogram:
+    def __init__(self, buckets: List[float] = STAGE_BUCKETS_MS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, duration_ms: float) -> None:
+        bucket = bisect.bisect_left(self.buckets, duration_ms)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.total_ms += duration_ms
+            self.max_ms = max(self.max_ms, duration_ms)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            cumulative = 0
+            buckets = []
+            for upper_bound, count in zip(self.buckets + ["+Inf"], self.counts):
+                cumulative += count
+                buckets.append({"le": upper_bound, "count": cumulative})
+            return {
+                "count": self.count,
+                "sum_ms": round(self.total_ms, 3),
+                "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+                "max_ms": round(self.max_ms, 3),
+                "buckets": buckets,
+            }
+
+
+_histograms: Dict[str, StageHistogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def _histogram(stage: str) -> StageHistogram:
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(stage, StageHistogram())
+    return histogram
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time the enclosed block and record it under the given stage name."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _histogram(stage).observe((time.perf_counter() - started) * 1000)
+
+
+def get_stage_histograms() -> Dict[str, Dict]:
+    with _histograms_lock:
+        stages = list(_histograms.items())
+    return {stage: histogram.snapshot() for stage, histogram in stages}
+
+
+def reset_stage_histograms() -> None:
+    with _histograms_lock:
+        _histograms.clear()
+
+
+class SampledLogger:
+    """
+    Wraps a logging.Logger so that debug lines are dropped cheaply when debug
+    logging is off and only a sample of them is emitted when it is on.
+    Messages use lazy %-formatting, so disabled calls never build strings.
+    """
+
+    def __init__(self, logger: logging.Logger, sample_rate: float = 1.0):
+        self.logger = logger
+        self.sample_rate = sample_rate
+
+    def is_debug_enabled(self) -> bool:
+        return self.logger.isEnabledFor(logging.DEBUG)
+
+    def debug(self, message: str, *args) -> None:
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self.logger.debug(message, *args)
+
+    def info(self, message: str, *args) -> None:
+        self.logger.info(message, *args)
+
+    def warning(self, message: str, *args) -> None:
+        self.logger.warning(message, *args)
+
+
+def get_logger(name: str) -> SampledLogger:
+    logger = logging.getLogger(name)
+    if os.environ.get("RECOMMENDATIONS_DEBUG", "").lower() in ("1", "true", "yes"):
+        logger.setLevel(logging.DEBUG)
+        if not logging.getLogger().handlers and not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("[%(levelname)s] %(name)s - %(message)s"))
+            logger.addHandler(handler)
+    else:
+        logger.setLevel(logging.WARNING)
+    sample_rate = float(os.environ.get("RECOMMENDATIONS_LOG_SAMPLE_RATE", "1.0"))
+    return SampledLogger(logger, sample_rate)
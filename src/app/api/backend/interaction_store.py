@@ -0,0 +1,117 @@
+"""
+Incrementally maintained user-item interaction store
+Holds the quantity each user purchased of each product (non-cart orders only)
+as a sparse mapping, so recommendation requests never scan order history:
+- rebuild_from_db(): one aggregated query, used on startup
+- record_order(): appends a checked-out cart
+- to_sparse() / to_dataframe(): matrix views for the similarity model
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sqlalchemy import func
+from typing import Dict, Iterable, List, Tuple
+
+from models import Order, OrderItem, Session
+
+
+class InteractionStore:
+    def __init__(self):
+        self._quantities: Dict[int, Dict[int, float]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def rebuild_from_db(self) -> None:
+        """Reload all interactions with a single GROUP BY over completed orders."""
+        db_session = Session()
+        try:
+            rows = (
+                db_session.query(Order.user_id, OrderItem.product_id, func.sum(OrderItem.quantity))
+                .join(OrderItem, OrderItem.order_id == Order.id)
+                .filter(Order.status != "cart")
+                .group_by(Order.user_id, OrderItem.product_id)
+                .all()
+            )
+        finally:
+            db_session.close()
+
+        quantities: Dict[int, Dict[int, float]] = {}
+        for user_id, product_id, quantity in rows:
+            quantities.setdefault(user_id, {})[product_id] = float(quantity or 0)
+
+        with self._lock:
+            self._quantities = quantities
+            self._loaded = True
+
+    def ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.rebuild_from_db()
+
+    def record_order(self, user_id: int, items: Iterable[Tuple[int, int]]) -> None:
+        """
+        Add the (product_id, quantity) lines of a newly placed order. Called
+        after the order is committed, so a cold store just loads from the
+        database, which already includes it.
+        """
+        if not self._loaded:
+            self.rebuild_from_db()
+            return
+        with self._lock:
+            user_quantities = self._quantities.setdefault(user_id, {})
+            for product_id, quantity in items:
+                user_quantities[product_id] = user_quantities.get(product_id, 0.0) + float(quantity or 0)
+
+    def products_for_user(self, user_id: int) -> List[int]:
+        """Products the user has purchased at least once."""
+        self.ensure_loaded()
+        with self._lock:
+            return list(self._quantities.get(user_id, {}))
+
+    def products_for_users(self, user_ids: Iterable[int]) -> Dict[int, List[int]]:
+        self.ensure_loaded()
+        with self._lock:
+            return {user_id: list(self._quantities.get(user_id, {})) for user_id in user_ids}
+
+    def to_sparse(self) -> Tuple[np.ndarray, np.ndarray, sparse.csr_matrix]:
+        """
+        Return (user_ids, product_ids, matrix) where matrix is a users x products
+        CSR matrix of purchased quantities. Ids are sorted ascending.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            triples = [
+                (user_id, product_id, quantity)
+                for user_id, products in self._quantities.items()
+                for product_id, quantity in products.items()
+                if quantity
+            ]
+
+        if not triples:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, sparse.csr_matrix((0, 0), dtype=np.float32)
+
+        users, products, quantities = (np.asarray(column) for column in zip(*triples))
+        user_ids, user_rows = np.unique(users, return_inverse=True)
+        product_ids, product_cols = np.unique(products, return_inverse=True)
+        matrix = sparse.csr_matrix(
+            (quantities.astype(np.float32), (user_rows, product_cols)),
+            shape=(len(user_ids), len(product_ids)),
+        )
+        return user_ids, product_ids, matrix
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Dense users x products DataFrame (empty when there are no orders)."""
+        user_ids, product_ids, matrix = self.to_sparse()
+        if matrix.nnz == 0:
+            return pd.DataFrame()
+        return pd.DataFrame(
+            matrix.toarray(),
+            index=pd.Index(user_ids, name='user_id'),
+            columns=pd.Index(product_ids, name='product_id'),
+        )
+
+
+interaction_store = InteractionStore()
@@ -6,14 +6,18 @@
     This file creates the infrastructure necessary for the database to exist.
     It's populated by another code (seed.py)
 '''
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, DateTime, UniqueConstraint
-from sqlalchemy.orm import relationship, sessionmaker, declarative_base
+import os
+from sqlalchemy import create_engine, event, inspect, Column, Integer, String, Float, ForeignKey, DateTime, Index, UniqueConstraint
+from sqlalchemy.orm import relationship, scoped_session, sessionmaker, declarative_base
 from datetime import datetime
 
 Base = declarative_base()
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ix_products_category", "category"),
+    )
     id = Column(Integer, primary_key=True)
     name = Column(String)
     category = Column(String)
@@ -67,6 +71,10 @@ class ProductRelation(Base):
 
 class Variant(Base):
     __tablename__ = "variants"
+    __table_args__ = (
+        Index("ix_variants_product_id", "product_id"),
+        Index("ix_variants_color_product_id", "color", "product_id"),  # color filter
+    )
     id = Column(Integer, primary_key=True)
     sku = Column(String)
     color = Column(String)
@@ -87,6 +95,10 @@ class User(Base):
 
 class Favorite(Base):
     __tablename__ = "favorites"
+    __table_args__ = (
+        Index("ix_favorites_user_id_removed_at", "user_id", "removed_at"),  # active favorites
+        Index("ix_favorites_user_id_product_id", "user_id", "product_id"),  # add/remove lookups
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -98,6 +110,9 @@ class Favorite(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_user_id_status", "user_id", "status"),  # cart lookup on every cart mutation
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     status = Column(String, default="cart", nullable=False)  # cart (draft), pending, processing, shipped, delivered, cancelled
@@ -122,6 +137,11 @@ class Order(Base):
 
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id"),
+        Index("ix_order_items_product_id_added_at", "product_id", "added_at"),
+        Index("ix_order_items_added_at", "added_at"),  # time-window scans
+    )
     id = Column(Integer, primary_key=True)
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -139,6 +159,10 @@ class OrderItem(Base):
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        Index("ix_reviews_product_id_created_at_id", "product_id", "created_at", "id"),  # newest-first pages
+        Index("ix_reviews_product_id_user_id", "product_id", "user_id"),  # one review per user lookup
+    )
     id = Column(Integer, primary_key=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -153,11 +177,141 @@ class Review(Base):
     user = relationship("User")
     #There's a relation of many reviews to one product and one user
 
+class ReviewStats(Base):
+    # Per-product rating histogram maintained by submit_review
+    __tablename__ = "review_stats"
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    rating_1 = Column(Integer, default=0, nullable=False)
+    rating_2 = Column(Integer, default=0, nullable=False)
+    rating_3 = Column(Integer, default=0, nullable=False)
+    rating_4 = Column(Integer, default=0, nullable=False)
+    rating_5 = Column(Integer, default=0, nullable=False)
+    rating_sum = Column(Integer, default=0, nullable=False)
+    rating_count = Column(Integer, default=0, nullable=False)
+
+class TrendingBucket(Base):
+    # Hourly per-product activity counters maintained by add_to_cart and checkout_cart
+    __tablename__ = "trending_buckets"
+    __table_args__ = (
+        Index("ix_trending_buckets_bucket_start", "bucket_start"),  # window scans
+    )
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)  # Start of the UTC hour
+    cart_adds = Column(Integer, default=0, nullable=False)
+    purchases = Column(Integer, default=0, nullable=False)
+
 # DB setup
-engine = create_engine("sqlite:///products.db")
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///products.db")
+
+# SQLite engine profiles (SQLITE_PROFILE):
+# - "production" (default): WAL so readers never block the writer, synchronous=NORMAL
+#   (safe with WAL; only the last commits before a power loss can be lost), a larger
+#   page cache, memory-mapped reads, a busy timeout instead of immediate
+#   "database is locked" errors, and a connection pool sized for a threaded server
+# - "default": stock SQLite/SQLAlchemy settings (rollback journal, no tuning)
+# Individual values can be overridden with the SQLITE_* variables in sqlite_settings().
+SQLITE_PROFILES = {
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size_kb": 64 * 1024,
+        "mmap_size": 256 * 1024 * 1024,
+        "busy_timeout_ms": 5000,
+        "pool_size": 10,
+        "max_overflow": 20,
+    },
+}
+
+_SQLITE_OVERRIDES = {
+    "journal_mode": ("SQLITE_JOURNAL_MODE", str),
+    "synchronous": ("SQLITE_SYNCHRONOUS", str),
+    "cache_size_kb": ("SQLITE_CACHE_SIZE_KB", int),
+    "mmap_size": ("SQLITE_MMAP_SIZE", int),
+    "busy_timeout_ms": ("SQLITE_BUSY_TIMEOUT_MS", int),
+    "pool_size": ("SQLITE_POOL_SIZE", int),
+    "max_overflow": ("SQLITE_MAX_OVERFLOW", int),
+}
+
+
+def sqlite_settings(profile: str = None) -> dict:
+    profile = profile or os.environ.get("SQLITE_PROFILE", "production")
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE: {profile}")
+    settings = dict(SQLITE_PROFILES[profile])
+    for key, (variable, convert) in _SQLITE_OVERRIDES.items():
+        if os.environ.get(variable):
+            settings[key] = convert(os.environ[variable])
+    return settings
+
+
+def create_sqlite_engine(url: str = DATABASE_URL, profile: str = None):
+    """Create an engine for url with the PRAGMAs and pooling of the given profile."""
+    settings = sqlite_settings(profile)
+    engine_args = {}
+    if "pool_size" in settings:
+        engine_args["pool_size"] = settings["pool_size"]
+        engine_args["max_overflow"] = settings.get("max_overflow", 0)
+    if "busy_timeout_ms" in settings:
+        engine_args["connect_args"] = {"timeout": settings["busy_timeout_ms"] / 1000}
+    new_engine = create_engine(url, **engine_args)
+
+    pragmas = []
+    if "journal_mode" in settings:
+        pragmas.append(f"PRAGMA journal_mode={settings['journal_mode']}")
+    if "synchronous" in settings:
+        pragmas.append(f"PRAGMA synchronous={settings['synchronous']}")
+    if "cache_size_kb" in settings:
+        pragmas.append(f"PRAGMA cache_size=-{settings['cache_size_kb']}")  # negative means KiB
+    if "mmap_size" in settings:
+        pragmas.append(f"PRAGMA mmap_size={settings['mmap_size']}")
+    if "busy_timeout_ms" in settings:
+        pragmas.append(f"PRAGMA busy_timeout={settings['busy_timeout_ms']}")
+
+    if pragmas:
+        @event.listens_for(new_engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    return new_engine
+
+
+engine = create_sqlite_engine()
 Session = sessionmaker(bind=engine)
+
+
+def ensure_indexes(bind=None) -> list:
+    """
+    Create any index declared on the models that the database is missing.
+    create_all() only builds indexes for new tables, so this is the migration
+    path for existing databases. Returns the names of the indexes created.
+    """
+    bind = bind or engine
+    existing = set()
+    inspector = inspect(bind)
+    for table_name in inspector.get_table_names():
+        existing.update(index["name"] for index in inspector.get_indexes(table_name))
+
+    created = []
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind, checkfirst=True)
+                created.append(index.name)
+    if created:
+        with bind.begin() as connection:
+            connection.exec_driver_sql("ANALYZE")  # refresh planner statistics for the new indexes
+    return created
+
+
 Base.metadata.create_all(engine)
-session = Session()
+# Thread-local session registry: each request/thread transparently gets its own
+# Session through this proxy; app.py removes it when the request ends.
+# Background jobs and scripts that need an independent session use Session().
+session = scoped_session(Session)
 
 def init_db():
     Base.metadata.drop_all(engine)
@@ -0,0 +1,215 @@
+"""
+Sparse top-K neighbour index for item similarity
+Keeps only the K most similar products per product in CSR form:
+- row_ids: product id of each row (sorted, int32)
+- indptr: row boundaries into the neighbour arrays
+- neighbour_ids / scores: neighbour product ids (int32) and similarities (float32)
+Memory is O(N*K) instead of the O(N^2) of a dense similarity DataFrame.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from typing import Iterable, Optional, Tuple
+
+# Neighbours kept per product
+DEFAULT_NEIGHBOURS = 50
+
+# Rows scored at once when building from vectors (bounds the dense block to chunk x N)
+BUILD_CHUNK_SIZE = 1024
+
+# Working memory for one chunk when building from vectors. A chunk x N block
+# costs about BUILD_BYTES_PER_SCORE per pair (float32 scores, their negated copy,
+# int64 argpartition indices and the self mask), so chunks shrink as N grows:
+# 128 MiB is ~55 rows at 100k products.
+BUILD_MEMORY_BUDGET_BYTES = 128 * 1024 * 1024
+BUILD_BYTES_PER_SCORE = 24
+
+_EMPTY_IDS = np.empty(0, dtype=np.int32)
+_EMPTY_SCORES = np.empty(0, dtype=np.float32)
+
+
+def build_chunk_size(n_products: int, budget_bytes: int = BUILD_MEMORY_BUDGET_BYTES) -> int:
+    """Rows per chunk so a chunk x n_products block stays within budget_bytes."""
+    return max(1, min(BUILD_CHUNK_SIZE, budget_bytes // (BUILD_BYTES_PER_SCORE * max(n_products, 1))))
+
+
+class NeighbourIndex:
+    def __init__(self, row_ids: np.ndarray, indptr: np.ndarray, neighbour_ids: np.ndarray, scores: np.ndarray):
+        self.row_ids = row_ids
+        self.indptr = indptr
+        self.neighbour_ids = neighbour_ids
+        self.scores = scores
+
+    @classmethod
+    def empty(cls) -> "NeighbourIndex":
+        return cls(_EMPTY_IDS, np.zeros(1, dtype=np.int64), _EMPTY_IDS, _EMPTY_SCORES)
+
+    @classmethod
+    def from_score_rows(
+        cls,
+        row_ids: Iterable[int],
+        candidate_ids: Iterable[int],
+        score_rows: np.ndarray,
+        k: int = DEFAULT_NEIGHBOURS,
+    ) -> "NeighbourIndex":
+        """
+        Build an index from dense similarity rows.
+        score_rows[i, j] is the similarity between row_ids[i] and candidate_ids[j].
+        Self-similarity and non-positive scores are dropped.
+        """
+        row_ids = np.asarray(list(row_ids), dtype=np.int32)
+        candidate_ids = np.asarray(list(candidate_ids), dtype=np.int32)
+        if len(row_ids) == 0 or len(candidate_ids) == 0:
+            return cls.empty()
+
+        order = np.argsort(row_ids, kind='stable')
+        blocks = [cls._top_k_block(row_ids[order], candidate_ids, np.asarray(score_rows)[order], k)]
+        return cls._concat(row_ids[order], blocks)
+
+    @classmethod
+    def from_vectors(
+        cls,
+        product_ids: Iterable[int],
+        vectors,
+        k: int = DEFAULT_NEIGHBOURS,
+        chunk_size: Optional[int] = None,
+    ) -> "NeighbourIndex":
+        """
+        Build an all-pairs cosine index from one feature vector per product.
+        Similarities are computed chunk by chunk so the full N x N matrix is
+        never materialised; by default chunks are sized to
+        BUILD_MEMORY_BUDGET_BYTES (at most BUILD_CHUNK_SIZE rows).
+        """
+        product_ids = np.asarray(list(product_ids), dtype=np.int32)
+        if len(product_ids) == 0:
+            return cls.empty()
+
+        order = np.argsort(product_ids, kind='stable')
+        product_ids = product_ids[order]
+        vectors = normalize(sparse.csr_matrix(vectors)[order]).astype(np.float32)
+        vectors_t = vectors.T.tocsc()
+        if chunk_size is None:
+            chunk_size = build_chunk_size(len(product_ids))
+
+        blocks = []
+        for start in range(0, len(product_ids), chunk_size):
+            end = min(start + chunk_size, len(product_ids))
+            block_scores = (vectors[start:end] @ vectors_t).toarray()
+            blocks.append(cls._top_k_block(product_ids[start:end], product_ids, block_scores, k))
+
+        return cls._concat(product_ids, blocks)
+
+    @classmethod
+    def from_similarity_frame(cls, similarity_df: pd.DataFrame, k: int = DEFAULT_NEIGHBOURS) -> "NeighbourIndex":
+        """Build an index from a dense similarity DataFrame (columns are the rows' products)."""
+        if similarity_df.empty:
+            return cls.empty()
+        return cls.from_score_rows(similarity_df.columns, similarity_df.index, similarity_df.values.T, k)
+
+    @classmethod
+    def from_neighbour_lists(cls, row_ids: Iterable[int], neighbours) -> "NeighbourIndex":
+        """
+        Build an index from precomputed neighbours, e.g. an approximate search.
+        neighbours[i] is a (neighbour_ids, scores) pair for row_ids[i], best first.
+        """
+        row_ids = np.asarray(list(row_ids), dtype=np.int32)
+        if len(row_ids) == 0:
+            return cls.empty()
+
+        order = np.argsort(row_ids, kind='stable')
+        blocks = [
+            (np.array([len(neighbours[i][0])]), np.asarray(neighbours[i][0]), np.asarray(neighbours[i][1]))
+            for i in order
+        ]
+        return cls._concat(row_ids[order], blocks)
+
+    @staticmethod
+    def _top_k_block(row_ids: np.ndarray, candidate_ids: np.ndarray, scores: np.ndarray, k: int):
+        scores = np.array(scores, dtype=np.float32)
+        scores[row_ids[:, None] == candidate_ids[None, :]] = 0.0
+
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+
+        # Highest similarity first within each row
+        ranking = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, ranking, axis=1)
+        top_scores = np.take_along_axis(top_scores, ranking, axis=1)
+
+        keep = top_scores > 0
+        counts = keep.sum(axis=1)
+        return counts, candidate_ids[top[keep]], top_scores[keep]
+
+    @classmethod
+    def _concat(cls, row_ids: np.ndarray, blocks) -> "NeighbourIndex":
+        counts = np.concatenate([block[0] for block in blocks])
+        indptr = np.zeros(len(row_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        neighbour_ids = np.concatenate([block[1] for block in blocks]).astype(np.int32)
+        scores = np.concatenate([block[2] for block in blocks]).astype(np.float32)
+        return cls(row_ids, indptr, neighbour_ids, scores)
+
+    @property
+    def is_empty(self) -> bool:
+        return len(self.row_ids) == 0
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    def _row(self, product_id: int) -> int:
+        row = int(np.searchsorted(self.row_ids, product_id))
+        if row < len(self.row_ids) and self.row_ids[row] == product_id:
+            return row
+        return -1
+
+    def __contains__(self, product_id: int) -> bool:
+        return self._row(product_id) >= 0
+
+    def neighbours(self, product_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Neighbour product ids and similarity scores, most similar first."""
+        row = self._row(product_id)
+        if row < 0:
+            return _EMPTY_IDS, _EMPTY_SCORES
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.neighbour_ids[start:end], self.scores[start:end]
+
+    def gather(self, product_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Concatenated neighbour ids and scores of several products, in one vectorised slice."""
+        product_ids = np.asarray(list(product_ids), dtype=np.int64)
+        if len(product_ids) == 0 or self.is_empty:
+            return _EMPTY_IDS, _EMPTY_SCORES
+
+        rows = np.searchsorted(self.row_ids, product_ids)
+        in_range = rows < len(self.row_ids)
+        rows, product_ids = rows[in_range], product_ids[in_range]
+        rows = rows[self.row_ids[rows] == product_ids]
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return _EMPTY_IDS, _EMPTY_SCORES
+
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        positions = offsets + np.arange(total)
+        return self.neighbour_ids[positions], self.scores[positions]
+
+    def to_sparse(self) -> Tuple[np.ndarray, sparse.csr_matrix]:
+        """
+        Return (product_ids, matrix) where matrix[i, j] is the similarity of
+        product_ids[i] to product_ids[j], for scoring many users with one product.
+        """
+        product_ids = np.union1d(self.row_ids, self.neighbour_ids)
+        rows = np.searchsorted(product_ids, np.repeat(self.row_ids, np.diff(self.indptr)))
+        cols = np.searchsorted(product_ids, self.neighbour_ids)
+        matrix = sparse.csr_matrix(
+            (self.scores, (rows, cols)),
+            shape=(len(product_ids), len(product_ids)),
+        )
+        return product_ids, matrix
+
+    @property
+    def nbytes(self) -> int:
+        return self.row_ids.nbytes + self.indptr.nbytes + self.neighbour_ids.nbytes + self.scores.nbytes
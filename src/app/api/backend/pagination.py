@@ -0,0 +1,87 @@
+"""
+Keyset (cursor) pagination helpers for Relay-style connections
+- encode_cursor / decode_cursor: opaque cursors over the (sort_key, id) of a row
+- count_cache: short-lived cache of filtered row counts for totalCount, cleared
+  whenever rows of the counted table are inserted or deleted
+"""
+
+import base64
+import json
+import threading
+import time
+from typing import Callable, Dict, Hashable, List
+
+from sqlalchemy import event
+
+from models import Product, Review, Variant
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+COUNT_CACHE_TTL_SECONDS = 60
+
+
+def encode_cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, size: int) -> List:
+    """Decode a cursor holding exactly `size` values; raises ValueError if malformed."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def page_size(first: int) -> int:
+    if first is None:
+        return DEFAULT_PAGE_SIZE
+    if first < 0:
+        raise ValueError("first must be non-negative")
+    return min(first, MAX_PAGE_SIZE)
+
+
+class CountCache:
+    def __init__(self, ttl_seconds: int = COUNT_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._counts: Dict[Hashable, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get_or_count(self, key: tuple, count: Callable[[], int]) -> int:
+        """Cached count for key, where key[0] names the table; calls count() on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._counts.get(key)
+        if entry and entry[1] > now:
+            return entry[0]
+        value = count()
+        with self._lock:
+            self._counts[key] = (value, now + self.ttl_seconds)
+        return value
+
+    def invalidate(self, table: str) -> None:
+        with self._lock:
+            for key in [key for key in self._counts if key[0] == table]:
+                del self._counts[key]
+
+
+count_cache = CountCache()
+
+
+# Updates matter too: a product's category or a variant's color moves rows between filters
+@event.listens_for(Product, 'after_insert')
+@event.listens_for(Product, 'after_update')
+@event.listens_for(Product, 'after_delete')
+@event.listens_for(Variant, 'after_insert')
+@event.listens_for(Variant, 'after_update')
+@event.listens_for(Variant, 'after_delete')
+def _invalidate_product_counts(mapper, connection, target):
+    count_cache.invalidate("products")
+
+
+@event.listens_for(Review, 'after_insert')
+@event.listens_for(Review, 'after_delete')
+def _invalidate_review_counts(mapper, connection, target):
+    count_cache.invalidate("reviews")
@@ -0,0 +1,227 @@
+"""
+Product relation materialisation
+Builds the product_relations rows behind relatedProducts in set-based batches,
+off the request path:
+- rank_relations(): score same-category candidates for a product, with every
+  product's tags parsed once
+- materialize_product_relations(): rank a batch of products and write both
+  directions of every pair with a single INSERT OR IGNORE
+- RelationJobQueue / relation_jobs: background worker the PDP read path
+  schedules products on instead of writing itself
+
+Usage:
+    python product_relations.py            # materialise every product
+"""
+
+import queue
+import threading
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+
+from models import Product, ProductRelation, Session
+
+MAX_RELATION_LINKS = 24
+
+# Candidates considered per product (same category, lowest ids first)
+RELATION_CANDIDATE_POOL = 200
+
+# Products ranked per write transaction by the background worker
+RELATION_JOB_BATCH_SIZE = 64
+
+
+def _tags_set(tags: Optional[str]) -> FrozenSet[str]:
+    if not tags:
+        return frozenset()
+    return frozenset(tag.strip().lower() for tag in tags.split(',') if tag.strip())
+
+
+def _infer_relation_type(base_product: Product, candidate: Product, shared_tags: FrozenSet[str]) -> Optional[str]:
+    same_category = base_product.category == candidate.category
+    same_brand = bool(base_product.brand and candidate.brand and base_product.brand == candidate.brand)
+    same_material = bool(base_product.material and candidate.material and base_product.material == candidate.material)
+
+    if same_category and same_brand:
+        return "collection"
+    if len(shared_tags) >= 2 or same_material:
+        return "dependency"
+
+    if same_category:
+        max_price = max(base_product.price or 0, candidate.price or 0, 1)
+        relative_price_delta = abs((base_product.price or 0) - (candidate.price or 0)) / max_price
+        if relative_price_delta <= 0.35:
+            return "bundle"
+
+    return None
+
+
+def _relation_score(base_product: Product, candidate: Product, shared_tags: FrozenSet[str]) -> int:
+    score = len(shared_tags)
+
+    if base_product.category == candidate.category:
+        score += 3
+    if base_product.brand and candidate.brand and base_product.brand == candidate.brand:
+        score += 3
+    if base_product.material and candidate.material and base_product.material == candidate.material:
+        score += 2
+
+    return score
+
+
+def rank_relations(
+    product: Product,
+    candidates: Sequence[Product],
+    max_links: int = MAX_RELATION_LINKS,
+    tags: Optional[Dict[int, FrozenSet[str]]] = None,
+) -> List[Tuple[Product, str]]:
+    """
+    Best `max_links` (candidate, relation_type) pairs for product, highest
+    score first; equal scores keep candidate order. `tags` maps product id to
+    its parsed tag set and is filled in for any product not in it yet.
+    """
+    tags = {} if tags is None else tags
+    for row in (product, *candidates):
+        if row.id not in tags:
+            tags[row.id] = _tags_set(row.tags)
+
+    base_tags = tags[product.id]
+    pool = [candidate for candidate in candidates if candidate.id != product.id][:RELATION_CANDIDATE_POOL]
+    ranked = []
+    for candidate in pool:
+        shared_tags = base_tags & tags[candidate.id]
+        relation_type = _infer_relation_type(product, candidate, shared_tags)
+        if relation_type:
+            ranked.append((_relation_score(product, candidate, shared_tags), candidate, relation_type))
+
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    return [(candidate, relation_type) for _, candidate, relation_type in ranked[:max_links]]
+
+
+def candidate_pool(db_session, category: Optional[str]) -> List[Product]:
+    """
+    Candidate products of a category. One extra row over the pool size means
+    every product in the category still has RELATION_CANDIDATE_POOL candidates
+    after excluding itself.
+    """
+    return (
+        db_session.query(Product)
+        .filter(Product.category == category)
+        .order_by(Product.id)
+        .limit(RELATION_CANDIDATE_POOL + 1)
+        .all()
+    )
+
+
+def materialize_product_relations(db_session, product_ids: Iterable[int], max_links: int = MAX_RELATION_LINKS) -> int:
+    """
+    Materialise relations for product_ids that have fewer than max_links.
+    Candidate pools are loaded once per category, and all pairs (both
+    directions) go out as one INSERT OR IGNORE, so existing pairs are left
+    alone. Commits; returns the number of pairs offered to the insert.
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    if not product_ids:
+        return 0
+
+    existing_counts = dict(
+        db_session.query(ProductRelation.product_id, func.count(ProductRelation.id))
+        .filter(ProductRelation.product_id.in_(product_ids))
+        .group_by(ProductRelation.product_id)
+        .all()
+    )
+    pending = [pid for pid in product_ids if existing_counts.get(pid, 0) < max_links]
+    if not pending:
+        return 0
+
+    products_by_category = defaultdict(list)
+    for product in db_session.query(Product).filter(Product.id.in_(pending)).all():
+        products_by_category[product.category].append(product)
+
+    tags = {}
+    rows = []
+    for category, products in products_by_category.items():
+        candidates = candidate_pool(db_session, category)
+        for product in products:
+            for candidate, relation_type in rank_relations(product, candidates, max_links, tags):
+                rows.append({"product_id": product.id, "related_product_id": candidate.id, "relation_type": relation_type})
+                rows.append({"product_id": candidate.id, "related_product_id": product.id, "relation_type": relation_type})
+
+    if rows:
+        # executemany: the whole candidate set is one statement
+        db_session.execute(insert(ProductRelation).on_conflict_do_nothing(), rows)
+    db_session.commit()
+    return len(rows)
+
+
+class RelationJobQueue:
+    """
+    Background materialisation of product relations. schedule() is cheap and
+    never touches the database; a single daemon worker drains the queue in
+    batches on its own session. Products are built at most once per process.
+    """
+
+    def __init__(self, batch_size: int = RELATION_JOB_BATCH_SIZE, max_links: int = MAX_RELATION_LINKS):
+        self.batch_size = batch_size
+        self.max_links = max_links
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._worker = None
+
+    def schedule(self, product_id: int) -> bool:
+        """Queue product_id unless it was already queued or built; True if queued."""
+        with self._lock:
+            if product_id in self._seen:
+                return False
+            self._seen.add(product_id)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="relation-jobs", daemon=True)
+                self._worker.start()
+        self._queue.put(product_id)
+        return True
+
+    def join(self) -> None:
+        """Block until every scheduled product has been processed."""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            db_session = Session()
+            try:
+                materialize_product_relations(db_session, batch, self.max_links)
+            except Exception:
+                db_session.rollback()
+                # Let a later request retry the batch
+                with self._lock:
+                    self._seen.difference_update(batch)
+            finally:
+                db_session.close()
+                for _ in batch:
+                    self._queue.task_done()
+
+
+relation_jobs = RelationJobQueue()
+
+
+def _main() -> None:
+    db_session = Session()
+    try:
+        product_ids = [pid for (pid,) in db_session.query(Product.id).order_by(Product.id)]
+        for start in range(0, len(product_ids), RELATION_JOB_BATCH_SIZE):
+            materialize_product_relations(db_session, product_ids[start:start + RELATION_JOB_BATCH_SIZE])
+        print(f"materialised relations for {len(product_ids)} products")
+    finally:
+        db_session.close()
+
+
+if __name__ == "__main__":
+    _main()
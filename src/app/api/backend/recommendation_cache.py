@@ -0,0 +1,162 @@
+"""
+Per-user cache for personalized ("For You") recommendations
+Entries store recommended product IDs (never ORM objects) with the similarity
+model version they were computed from, and are invalidated by the mutations
+that change a user's inputs (favorites, checkout, reviews).
+
+Backends:
+- InMemoryCacheBackend: in-process LRU with TTL (default)
+- RedisCacheBackend: any Redis-compatible client exposing get/set(ex=)/delete,
+  selected with RECOMMENDATION_CACHE_URL=redis://host:port/db
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from instrumentation import get_logger
+
+DEFAULT_CACHE_TTL_SECONDS = 10 * 60
+DEFAULT_CACHE_MAX_ENTRIES = 10_000
+
+logger = get_logger("recommendation_cache")
+
+
+class InMemoryCacheBackend:
+    def __init__(self, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class RedisCacheBackend:
+    def __init__(self, client, prefix: str = "recs:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        self.client.set(self.prefix + key, value, ex=ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+    def size(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*"))
+
+
+class RecommendationCache:
+    def __init__(self, backend=None, ttl_seconds: int = DEFAULT_CACHE_TTL_SECONDS):
+        self.backend = backend or InMemoryCacheBackend()
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"personalized:{user_id}"
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, user_id: int, limit: int, model_version: int) -> Optional[List[int]]:
+        """Cached product IDs, or None when missing, expired or built from an older model."""
+        raw = self.backend.get(self._key(user_id))
+        entry = json.loads(raw) if raw else None
+        # An entry computed for a larger limit can serve any smaller one
+        if not entry or entry["model_version"] != model_version or entry["limit"] < limit:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return entry["product_ids"][:limit]
+
+    def set(self, user_id: int, limit: int, model_version: int, product_ids: List[int]) -> None:
+        entry = {"limit": limit, "model_version": model_version, "product_ids": product_ids}
+        self.backend.set(self._key(user_id), json.dumps(entry), self.ttl_seconds)
+
+    def invalidate_user(self, user_id: int) -> None:
+        self.backend.delete(self._key(user_id))
+        self._count("invalidations")
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits, misses, invalidations = self.hits, self.misses, self.invalidations
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "invalidations": invalidations,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "size": self.backend.size(),
+        }
+
+
+def _backend_from_environment():
+    url = os.environ.get("RECOMMENDATION_CACHE_URL")
+    if not url:
+        return InMemoryCacheBackend(int(os.environ.get("RECOMMENDATION_CACHE_MAX_ENTRIES", DEFAULT_CACHE_MAX_ENTRIES)))
+    try:
+        import redis
+    except ImportError:
+        logger.warning("RECOMMENDATION_CACHE_URL is set but the redis package is not installed; using in-memory cache")
+        return InMemoryCacheBackend()
+    return RedisCacheBackend(redis.Redis.from_url(url))
+
+
+recommendation_cache = RecommendationCache(
+    _backend_from_environment(),
+    ttl_seconds=int(os.environ.get("RECOMMENDATION_CACHE_TTL_SECONDS", DEFAULT_CACHE_TTL_SECONDS)),
+)
+
+
+def invalidate_user_recommendations(user_id: int) -> None:
+    recommendation_cache.invalidate_user(user_id)
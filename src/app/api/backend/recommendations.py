@@ -6,57 +6,68 @@ Combines collaborative filtering and content-based filtering:
 - Quality Filter: Bayesian average of ratings to penalize poorly-reviewed products
 """
 
+import math
+import os
+import threading
+import time
+
 import numpy as np
 import pandas as pd
-from scipy import stats
+from scipy import sparse, stats
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import TfidfVectorizer
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import joinedload
 from models import Order, OrderItem, Product, Favorite, Session
-from typing import List, Dict
+from neighbour_index import NeighbourIndex, DEFAULT_NEIGHBOURS
+from ann_index import RandomProjectionLSH
+from interaction_store import interaction_store
+from recommendation_cache import recommendation_cache
+from instrumentation import get_logger, stage_timer
+from typing import List, Dict, Iterator, Optional, Tuple
+
+# The collaborative similarity model is rebuilt in the background once this many
+# orders have changed since the last build, or once it is older than the TTL.
+SIMILARITY_MODEL_REBUILD_THRESHOLD = 25
+SIMILARITY_MODEL_TTL_SECONDS = 15 * 60
+
+# Minimum reviews before ratings move the quality factor
+MIN_REVIEWS_FOR_PENALTY = 5  # Need at least 5 reviews to apply penalties
+MIN_REVIEWS_FOR_BOOST = 10   # Need at least 10 reviews to apply boosts
+
+# Users scored per chunk by the batch recommendation API
+BATCH_CHUNK_SIZE = 500
+
+# Silent unless RECOMMENDATIONS_DEBUG is set (see instrumentation.py)
+logger = get_logger("recommendations")
 
 
 def build_user_item_matrix() -> pd.DataFrame:
     """
     Build a user-item interaction matrix from order history.
     Rows: users, Columns: products, Values: number of times user purchased product
+    Served from the incrementally maintained interaction store, not an order scan.
     """
-    # Create a new session for this request
-    db_session = Session()
-    try:
-        # Get all completed orders (not carts)
-        orders = db_session.query(Order).filter(Order.status != "cart").all()
-        
-        # Build list of interactions
-        interactions = []
-        for order in orders:
-            for item in order.items:
-                interactions.append({
-                    'user_id': order.user_id,
-                    'product_id': item.product_id,
-                    'quantity': item.quantity
-                })
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(interactions)
-        
-        if df.empty:
-            # Return empty matrix if no orders exist
-            return pd.DataFrame()
-        
-        # Create pivot table (user-item matrix)
-        # Rows: users, Columns: products, Values: sum of quantities purchased
-        user_item_matrix = df.pivot_table(
-            index='user_id',
-            columns='product_id',
-            values='quantity',
-            aggfunc='sum',
-            fill_value=0
-        )
-        
-        return user_item_matrix
-    finally:
-        db_session.close()
+    return interaction_store.to_dataframe()
+
+
+def build_item_neighbour_index(user_item_matrix: pd.DataFrame, k: int = DEFAULT_NEIGHBOURS) -> NeighbourIndex:
+    """
+    Collaborative filtering neighbours: the top-K products per product by
+    cosine similarity of their purchase vectors, without a dense N x N matrix.
+    """
+    if user_item_matrix.empty:
+        return NeighbourIndex.empty()
+    
+    item_vectors = sparse.csr_matrix(user_item_matrix.T.values, dtype=np.float32)
+    return NeighbourIndex.from_vectors(user_item_matrix.columns, item_vectors, k)
+
+
+def _as_neighbour_index(similarity) -> NeighbourIndex:
+    """Accept either a NeighbourIndex or a legacy dense similarity DataFrame."""
+    if isinstance(similarity, NeighbourIndex):
+        return similarity
+    return NeighbourIndex.from_similarity_frame(similarity)
 
 
 def calculate_item_similarity(user_item_matrix: pd.DataFrame) -> pd.DataFrame:
@@ -86,6 +97,329 @@ def calculate_item_similarity(user_item_matrix: pd.DataFrame) -> pd.DataFrame:
     return similarity_df
 
 
+class ItemSimilarityModel:
+    """
+    Immutable snapshot of the collaborative filtering neighbour index.
+    Request handlers only ever read a fully built model; rebuilds create a new
+    instance and swap the module-level reference in one assignment.
+    """
+
+    def __init__(self, version: int, neighbours: NeighbourIndex, built_at: float):
+        self.version = version
+        self.neighbours = neighbours
+        self.built_at = built_at
+
+    @property
+    def is_empty(self) -> bool:
+        return self.neighbours.is_empty
+
+    def age_seconds(self) -> float:
+        return time.time() - self.built_at
+
+
+_similarity_model: Optional[ItemSimilarityModel] = None
+_similarity_model_version = 0
+_pending_order_changes = 0
+_rebuild_in_progress = False
+_similarity_state_lock = threading.Lock()
+_similarity_build_lock = threading.Lock()
+
+
+def record_checkout(user_id: int, items) -> None:
+    """
+    Feed a checked-out cart's (product_id, quantity) lines into the interaction
+    store and count it towards the next similarity model rebuild.
+    """
+    interaction_store.record_order(user_id, items)
+    mark_orders_changed()
+
+
+def mark_orders_changed(count: int = 1) -> None:
+    """
+    Record that orders changed (e.g. a cart was checked out).
+    Once enough changes accumulate the similarity model is rebuilt in the background.
+    """
+    global _pending_order_changes
+    with _similarity_state_lock:
+        _pending_order_changes += count
+
+
+def _similarity_model_is_stale(model: ItemSimilarityModel) -> bool:
+    return (
+        _pending_order_changes >= SIMILARITY_MODEL_REBUILD_THRESHOLD
+        or model.age_seconds() >= SIMILARITY_MODEL_TTL_SECONDS
+    )
+
+
+def rebuild_item_similarity_model() -> ItemSimilarityModel:
+    """
+    Build a new similarity model from order history and swap it in atomically.
+    Concurrent callers are serialized so only one build runs at a time.
+    """
+    global _similarity_model, _similarity_model_version, _pending_order_changes
+    with _similarity_build_lock:
+        with _similarity_state_lock:
+            changes_seen = _pending_order_changes
+
+        with stage_timer("matrix_build"):
+            _, product_ids, user_item = interaction_store.to_sparse()
+        with stage_timer("similarity"):
+            neighbours = NeighbourIndex.from_vectors(product_ids, user_item.T)
+
+        with _similarity_state_lock:
+            _similarity_model_version += 1
+            model = ItemSimilarityModel(_similarity_model_version, neighbours, time.time())
+            _similarity_model = model
+            # Changes recorded while we were building still count towards the next rebuild
+            _pending_order_changes = max(_pending_order_changes - changes_seen, 0)
+        return model
+
+
+def _rebuild_in_background() -> None:
+    global _rebuild_in_progress
+    try:
+        rebuild_item_similarity_model()
+    finally:
+        with _similarity_state_lock:
+            _rebuild_in_progress = False
+
+
+def get_item_similarity_model() -> ItemSimilarityModel:
+    """
+    Return the current similarity model.
+    The first call builds it synchronously; afterwards a stale model keeps being
+    served while a background thread builds its replacement.
+    """
+    global _rebuild_in_progress
+    model = _similarity_model
+    if model is None:
+        return rebuild_item_similarity_model()
+
+    with _similarity_state_lock:
+        should_rebuild = not _rebuild_in_progress and _similarity_model_is_stale(model)
+        if should_rebuild:
+            _rebuild_in_progress = True
+
+    if should_rebuild:
+        threading.Thread(target=_rebuild_in_background, daemon=True).start()
+
+    return model
+
+
+# Product columns that feed the content model; changing any of them invalidates its row
+CONTENT_FEATURE_COLUMNS = ('description', 'tags', 'material', 'brand', 'category')
+
+# Incremental updates reuse the fitted vocabulary; refit once this share of the catalog changed
+CONTENT_REFIT_FRACTION = 0.2
+
+# Content neighbour search: "exact" scores every product, "lsh" searches the
+# random-projection index in ann_index.py (for catalogs of ~100k+ products)
+CONTENT_ENGINES = ('exact', 'lsh')
+CONTENT_SIMILARITY_ENGINE = os.environ.get("RECOMMENDATIONS_CONTENT_ENGINE", "exact").lower()
+
+
+def _product_content_text(product: Product) -> str:
+    """Combine the text attributes of a product into one weighted document."""
+    text_parts = []
+    
+    if product.description:
+        text_parts.append(product.description)
+    if product.tags:
+        text_parts.append(product.tags.replace(',', ' '))
+    if product.material:
+        # Repeat material multiple times for higher weight
+        text_parts.append(f"{product.material} {product.material} {product.material}")
+    if product.brand:
+        # Repeat brand for higher weight
+        text_parts.append(f"{product.brand} {product.brand}")
+    if product.category:
+        # Category is very important
+        text_parts.append(f"{product.category} {product.category} {product.category}")
+    
+    return ' '.join(text_parts)
+
+
+def _new_content_vectorizer() -> TfidfVectorizer:
+    return TfidfVectorizer(
+        max_features=200,
+        stop_words='english',
+        ngram_range=(1, 2)  # Use both single words and pairs
+    )
+
+
+class _ContentSnapshot:
+    """Fitted vectorizer plus L2-normalised sparse TF-IDF rows, one per product."""
+
+    def __init__(self, vectorizer: TfidfVectorizer, product_ids: List[int], features):
+        self.vectorizer = vectorizer
+        self.product_ids = product_ids
+        self.row_index = {product_id: row for row, product_id in enumerate(product_ids)}
+        self.features = features.tocsr()
+        self._ann_index: Optional[RandomProjectionLSH] = None
+        self._ann_lock = threading.Lock()
+
+    def ann_index(self) -> RandomProjectionLSH:
+        """LSH index over this snapshot's rows, built on first use."""
+        if self._ann_index is None:
+            with self._ann_lock:
+                if self._ann_index is None:
+                    self._ann_index = RandomProjectionLSH().fit(self.features)
+        return self._ann_index
+
+
+class ContentFeatureStore:
+    """
+    Persistent content model for content-based filtering.
+    The vectorizer is fitted once; products whose text attributes change are
+    re-transformed incrementally and only the requested similarity columns are
+    ever computed.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[_ContentSnapshot] = None
+        self._dirty_product_ids = set()
+        self._updates_since_fit = 0
+        # _lock guards the dirty set only, so mark_dirty never waits on a build;
+        # _build_lock serialises every read-modify-swap of the snapshot
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def mark_dirty(self, product_ids) -> None:
+        with self._lock:
+            self._dirty_product_ids.update(product_ids)
+
+    def rebuild(self) -> None:
+        """Refit the vectorizer on the full catalog."""
+        with self._build_lock:
+            self._rebuild_locked()
+
+    def _rebuild_locked(self) -> None:
+        # Clear before reading, so products marked while we read are applied later
+        with self._lock:
+            self._dirty_product_ids.clear()
+        db_session = Session()
+        try:
+            products = db_session.query(Product).order_by(Product.id).all()
+            if not products:
+                self._snapshot = None
+                return
+            vectorizer = _new_content_vectorizer()
+            features = vectorizer.fit_transform([_product_content_text(p) for p in products])
+            self._snapshot = _ContentSnapshot(vectorizer, [p.id for p in products], features)
+            self._updates_since_fit = 0
+        finally:
+            db_session.close()
+
+    def _apply_dirty_locked(self) -> None:
+        with self._lock:
+            dirty_ids = list(self._dirty_product_ids)
+            self._dirty_product_ids.clear()
+        if not dirty_ids:
+            return
+
+        snapshot = self._snapshot
+        self._updates_since_fit += len(dirty_ids)
+        if self._updates_since_fit > CONTENT_REFIT_FRACTION * max(len(snapshot.product_ids), 1):
+            self._rebuild_locked()
+            return
+
+        db_session = Session()
+        try:
+            products = db_session.query(Product).filter(Product.id.in_(dirty_ids)).all()
+        finally:
+            db_session.close()
+
+        # Drop rows for changed or deleted products, then append the re-transformed ones
+        dirty_set = set(dirty_ids)
+        keep_rows = [row for row, pid in enumerate(snapshot.product_ids) if pid not in dirty_set]
+        product_ids = [snapshot.product_ids[row] for row in keep_rows]
+        features = snapshot.features[keep_rows]
+        if products:
+            new_rows = snapshot.vectorizer.transform([_product_content_text(p) for p in products])
+            features = sparse.vstack([features, new_rows])
+            product_ids.extend(p.id for p in products)
+
+        self._snapshot = _ContentSnapshot(snapshot.vectorizer, product_ids, features)
+
+    def _current_snapshot(self) -> Optional[_ContentSnapshot]:
+        if self._snapshot is None or self._dirty_product_ids:
+            with self._build_lock:
+                if self._snapshot is None:
+                    self._rebuild_locked()
+                elif self._dirty_product_ids:
+                    self._apply_dirty_locked()
+        return self._snapshot
+
+    def similarities_for(self, product_ids: List[int]) -> pd.DataFrame:
+        """
+        Content similarity between every product and the given products.
+        Returns a DataFrame indexed by all product ids with one column per
+        requested product that exists in the store.
+        """
+        snapshot = self._current_snapshot()
+        if snapshot is None:
+            return pd.DataFrame()
+
+        columns = [pid for pid in dict.fromkeys(product_ids) if pid in snapshot.row_index]
+        if not columns:
+            return pd.DataFrame()
+
+        # Rows are L2-normalised, so cosine similarity is a sparse dot product
+        requested = snapshot.features[[snapshot.row_index[pid] for pid in columns]]
+        scores = (snapshot.features @ requested.T).toarray()
+
+        return pd.DataFrame(scores, index=snapshot.product_ids, columns=columns)
+
+    def neighbours_for(self, product_ids: List[int], k: int = DEFAULT_NEIGHBOURS, engine: str = None) -> NeighbourIndex:
+        """
+        Top-K content neighbours of the given products only.
+        engine overrides CONTENT_SIMILARITY_ENGINE ("exact" or "lsh").
+        """
+        engine = engine or CONTENT_SIMILARITY_ENGINE
+        if engine not in CONTENT_ENGINES:
+            raise ValueError(f"Unknown content similarity engine: {engine}")
+        if engine == 'lsh':
+            return self._approximate_neighbours_for(product_ids, k)
+
+        columns = self.similarities_for(product_ids)
+        if columns.empty:
+            return NeighbourIndex.empty()
+        return NeighbourIndex.from_score_rows(columns.columns, columns.index, columns.values.T, k)
+
+    def _approximate_neighbours_for(self, product_ids: List[int], k: int) -> NeighbourIndex:
+        snapshot = self._current_snapshot()
+        if snapshot is None:
+            return NeighbourIndex.empty()
+
+        rows = [snapshot.row_index[pid] for pid in dict.fromkeys(product_ids) if pid in snapshot.row_index]
+        if not rows:
+            return NeighbourIndex.empty()
+
+        ann_index = snapshot.ann_index()
+        row_product_ids = np.asarray(snapshot.product_ids, dtype=np.int32)
+        neighbours = []
+        for row in rows:
+            neighbour_rows, scores = ann_index.query(snapshot.features[row], k, exclude_row=row)
+            neighbours.append((row_product_ids[neighbour_rows], scores))
+        return NeighbourIndex.from_neighbour_lists(row_product_ids[rows], neighbours)
+
+
+content_feature_store = ContentFeatureStore()
+
+
+@event.listens_for(Product, 'after_insert')
+@event.listens_for(Product, 'after_delete')
+def _mark_product_content_dirty(mapper, connection, target):
+    content_feature_store.mark_dirty([target.id])
+
+
+@event.listens_for(Product, 'after_update')
+def _mark_changed_product_content_dirty(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[column].history.has_changes() for column in CONTENT_FEATURE_COLUMNS):
+        content_feature_store.mark_dirty([target.id])
+
+
 def build_content_similarity_matrix(product_ids: List[int] = None) -> pd.DataFrame:
     """
     Calculate content-based similarity using TF-IDF on product attributes.
@@ -113,33 +447,11 @@ def build_content_similarity_matrix(product_ids: List[int] = None) -> pd.DataFra
         product_ids_list = []
         
         for product in products:
-            # Combine all text features
-            text_parts = []
-            
-            if product.description:
-                text_parts.append(product.description)
-            if product.tags:
-                text_parts.append(product.tags.replace(',', ' '))
-            if product.material:
-                # Repeat material multiple times for higher weight
-                text_parts.append(f"{product.material} {product.material} {product.material}")
-            if product.brand:
-                # Repeat brand for higher weight
-                text_parts.append(f"{product.brand} {product.brand}")
-            if product.category:
-                # Category is very important
-                text_parts.append(f"{product.category} {product.category} {product.category}")
-            
-            combined_text = ' '.join(text_parts)
-            product_texts.append(combined_text)
+            product_texts.append(_product_content_text(product))
             product_ids_list.append(product.id)
         
         # Create TF-IDF vectors
-        vectorizer = TfidfVectorizer(
-            max_features=200,
-            stop_words='english',
-            ngram_range=(1, 2)  # Use both single words and pairs
-        )
+        vectorizer = _new_content_vectorizer()
         
         tfidf_matrix = vectorizer.fit_transform(product_texts)
         
@@ -189,13 +501,11 @@ def calculate_rating_quality_factor(rating_avg: float, rating_count: int) -> flo
     if rating_count == 0:
         return 1.0
     
-    # Require minimum reviews for statistical significance
-    MIN_REVIEWS_FOR_PENALTY = 5  # Need at least 5 reviews to apply penalties
-    MIN_REVIEWS_FOR_BOOST = 10   # Need at least 10 reviews to apply boosts
-    
     # Convert 5-star rating to probability (0 to 1 scale)
     # 1 star = 0%, 5 stars = 100%, 3 stars = 50%
-    success_rate = (rating_avg - 1.0) / 4.0  # Maps [1,5] to [0,1]
+    # Averages below 1 star (e.g. unrated 0.0 with stale counts) clamp to 0 so the
+    # Wilson radicand stays non-negative
+    success_rate = min(max((rating_avg - 1.0) / 4.0, 0.0), 1.0)  # Maps [1,5] to [0,1]
     
     # Calculate Wilson score lower bound (conservative estimate)
     # This is the lower bound of 95% confidence interval
@@ -206,7 +516,7 @@ def calculate_rating_quality_factor(rating_avg: float, rating_count: int) -> flo
     # https://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval#Wilson_score_interval
     denominator = 1 + z**2 / n
     center = success_rate + z**2 / (2*n)
-    spread = z * np.sqrt((success_rate * (1 - success_rate) + z**2 / (4*n)) / n)
+    spread = z * math.sqrt((success_rate * (1 - success_rate) + z**2 / (4*n)) / n)
     
     wilson_lower_bound = (center - spread) / denominator
     
@@ -231,17 +541,137 @@ def calculate_rating_quality_factor(rating_avg: float, rating_count: int) -> flo
     if rating_avg >= 4.5 and rating_count >= MIN_REVIEWS_FOR_BOOST:
         # Excellent product with confidence - give boost
         quality_factor = 1.0 + (wilson_lower_bound - 0.5) * 0.4
-        return np.clip(quality_factor, 1.0, 1.2)
+        return min(max(quality_factor, 1.0), 1.2)
     
     elif rating_avg < 3.5:
         # Below average product - apply penalty
         quality_factor = 0.5 + wilson_lower_bound
-        return np.clip(quality_factor, 0.5, 1.0)
+        return min(max(quality_factor, 0.5), 1.0)
     
     else:
         # Average product (3.5-4.5) - stay neutral to slight boost
         quality_factor = 0.9 + wilson_lower_bound * 0.2
-        return np.clip(quality_factor, 0.9, 1.1)
+        return min(max(quality_factor, 0.9), 1.1)
+
+
+def calculate_rating_quality_factors(rating_avg, rating_count) -> np.ndarray:
+    """
+    Array version of calculate_rating_quality_factor.
+    Computes the Wilson-bound quality factor for whole candidate arrays in one
+    pass, with the same piecewise rules as the scalar function.
+    
+    Args:
+        rating_avg: Array of average ratings (0-5 stars)
+        rating_count: Array of review counts
+    
+    Returns:
+        Array of quality factors between 0.5 and 1.2
+    """
+    rating_avg = np.asarray(rating_avg, dtype=np.float64)
+    rating_count = np.asarray(rating_count, dtype=np.float64)
+    
+    success_rate = np.clip((rating_avg - 1.0) / 4.0, 0.0, 1.0)
+    z = 1.96
+    # Products without reviews are masked out below; avoid dividing by zero for them
+    n = np.where(rating_count > 0, rating_count, 1.0)
+    
+    denominator = 1 + z**2 / n
+    center = success_rate + z**2 / (2*n)
+    spread = z * np.sqrt((success_rate * (1 - success_rate) + z**2 / (4*n)) / n)
+    wilson_lower_bound = (center - spread) / denominator
+    
+    boost = (rating_avg >= 4.5) & (rating_count >= MIN_REVIEWS_FOR_BOOST)
+    penalty = ~boost & (rating_avg < 3.5)
+    
+    factors = np.clip(0.9 + wilson_lower_bound * 0.2, 0.9, 1.1)
+    factors = np.where(penalty, np.clip(0.5 + wilson_lower_bound, 0.5, 1.0), factors)
+    factors = np.where(boost, np.clip(1.0 + (wilson_lower_bound - 0.5) * 0.4, 1.0, 1.2), factors)
+    
+    # Too few reviews to be confident (including none) - stay neutral
+    return np.where(rating_count < MIN_REVIEWS_FOR_PENALTY, 1.0, factors)
+
+
+class QualityFactorStore:
+    """
+    Precomputed rating quality factor per product, kept in sorted arrays so a
+    whole candidate array is looked up with one searchsorted and no DB query.
+    Rows are refreshed from Product rating changes (e.g. submit_review).
+    """
+
+    def __init__(self):
+        self._product_ids = np.empty(0, dtype=np.int64)
+        self._factors = np.empty(0, dtype=np.float64)
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        db_session = Session()
+        try:
+            rows = db_session.query(Product.id, Product.rating_avg, Product.rating_count).order_by(Product.id).all()
+        finally:
+            db_session.close()
+        
+        product_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        factors = calculate_rating_quality_factors(
+            [row[1] or 0.0 for row in rows],
+            [row[2] or 0 for row in rows]
+        )
+        with self._lock:
+            self._product_ids, self._factors = product_ids, factors
+            self._loaded = True
+
+    def update_product(self, product_id: int, rating_avg: float, rating_count: int) -> None:
+        if not self._loaded:
+            return
+        factor = calculate_rating_quality_factor(rating_avg or 0.0, rating_count or 0)
+        with self._lock:
+            position = int(np.searchsorted(self._product_ids, product_id))
+            if position < len(self._product_ids) and self._product_ids[position] == product_id:
+                factors = self._factors.copy()
+                factors[position] = factor
+                self._factors = factors
+            else:
+                self._product_ids = np.insert(self._product_ids, position, product_id)
+                self._factors = np.insert(self._factors, position, factor)
+
+    def factors_for(self, product_ids) -> np.ndarray:
+        """Quality factor per product id (1.0 for unknown products)."""
+        if not self._loaded:
+            self.load()
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        with self._lock:
+            known_ids, factors = self._product_ids, self._factors
+        if len(known_ids) == 0:
+            return np.ones(len(product_ids))
+        positions = np.minimum(np.searchsorted(known_ids, product_ids), len(known_ids) - 1)
+        return np.where(known_ids[positions] == product_ids, factors[positions], 1.0)
+
+
+quality_factor_store = QualityFactorStore()
+
+
+# Ratings flushed in a session, applied to quality_factor_store only once it commits
+_PENDING_QUALITY_FACTORS = 'pending_quality_factors'
+
+
+@event.listens_for(Product, 'after_insert')
+@event.listens_for(Product, 'after_update')
+def _refresh_product_quality_factor(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.rating_avg.history.has_changes() or state.attrs.rating_count.history.has_changes():
+        pending = state.session.info.setdefault(_PENDING_QUALITY_FACTORS, {})
+        pending[target.id] = (target.rating_avg, target.rating_count)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending_quality_factors(db_session):
+    for product_id, (rating_avg, rating_count) in db_session.info.pop(_PENDING_QUALITY_FACTORS, {}).items():
+        quality_factor_store.update_product(product_id, rating_avg, rating_count)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_quality_factors(db_session):
+    db_session.info.pop(_PENDING_QUALITY_FACTORS, None)
 
 
 def apply_rating_quality_to_recommendations(
@@ -262,19 +692,29 @@ def apply_rating_quality_to_recommendations(
     if not recommendations:
         return recommendations
     
+    with stage_timer("quality_adjustment"):
+        return _apply_rating_quality(recommendations, db_session)
+
+
+def _apply_rating_quality(recommendations: List[Dict], db_session) -> List[Dict]:
     # Fetch product ratings
     product_ids = [rec['product_id'] for rec in recommendations]
     products = db_session.query(Product).filter(
         Product.id.in_(product_ids)
     ).all()
     
-    # Build rating lookup
+    # Build rating lookup (quality factors computed for all products in one pass)
+    factors = calculate_rating_quality_factors(
+        [p.rating_avg or 0.0 for p in products],
+        [p.rating_count or 0 for p in products]
+    )
     ratings_lookup = {
         p.id: {
             'rating_avg': p.rating_avg or 0.0,
-            'rating_count': p.rating_count or 0
+            'rating_count': p.rating_count or 0,
+            'quality_factor': float(factor)
         }
-        for p in products
+        for p, factor in zip(products, factors)
     }
     
     # Apply quality factors
@@ -285,19 +725,17 @@ def apply_rating_quality_to_recommendations(
         
         if product_id in ratings_lookup:
             rating_data = ratings_lookup[product_id]
-            quality_factor = calculate_rating_quality_factor(
-                rating_avg=rating_data['rating_avg'],
-                rating_count=rating_data['rating_count']
-            )
+            quality_factor = rating_data['quality_factor']
             
             adjusted_score = original_score * quality_factor
             
             # Debug logging
             if rating_data['rating_count'] > 0:
-                print(f"[RATING] Product {product_id}: "
-                      f"{rating_data['rating_avg']:.1f}★ ({rating_data['rating_count']} reviews) "
-                      f"→ Quality factor: {quality_factor:.2f}x "
-                      f"(Score: {original_score:.3f} → {adjusted_score:.3f})")
+                logger.debug(
+                    "Rating - Product %s: %.1f★ (%s reviews) → Quality factor: %.2fx (Score: %.3f → %.3f)",
+                    product_id, rating_data['rating_avg'], rating_data['rating_count'],
+                    quality_factor, original_score, adjusted_score
+                )
             
             adjusted_recommendations.append({
                 'product_id': product_id,
@@ -314,12 +752,41 @@ def apply_rating_quality_to_recommendations(
     return adjusted_recommendations
 
 
+def _accumulate_scores(weighted_sources, exclude_product_ids: List[int]):
+    """
+    Sum (ids, scores, weight) neighbour arrays into one score per candidate
+    and drop excluded products with a boolean mask.
+    """
+    all_ids = np.concatenate([ids for ids, _, _ in weighted_sources])
+    if len(all_ids) == 0:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+    all_scores = np.concatenate([scores.astype(np.float64) * weight for _, scores, weight in weighted_sources])
+    
+    candidate_ids, inverse = np.unique(all_ids, return_inverse=True)
+    totals = np.bincount(inverse, weights=all_scores, minlength=len(candidate_ids))
+    
+    keep = ~np.isin(candidate_ids, np.asarray(list(exclude_product_ids), dtype=np.int64))
+    return candidate_ids[keep], totals[keep]
+
+
+def _top_k_positions(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first, using argpartition."""
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    if len(scores) > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
 def get_hybrid_recommendations(
     cart_product_ids: List[int],
-    collaborative_similarity: pd.DataFrame,
+    collaborative_similarity,
     limit: int = 5,
     exclude_product_ids: List[int] = None,
-    db_session = None
+    db_session = None,
+    content_engine: str = None
 ) -> List[Dict]:
     """
     Hybrid recommendation combining collaborative and content-based filtering.
@@ -327,76 +794,60 @@ def get_hybrid_recommendations(
     
     Args:
         cart_product_ids: Products currently in cart
-        collaborative_similarity: Pre-calculated collaborative filtering similarity matrix
+        collaborative_similarity: Collaborative filtering NeighbourIndex (or legacy dense DataFrame)
         limit: Number of recommendations to return
         exclude_product_ids: Products to exclude from results
-        db_session: Optional database session for rating lookups
+        db_session: Optional database session; when given, scores are adjusted by rating quality
+        content_engine: "exact" or "lsh"; defaults to RECOMMENDATIONS_CONTENT_ENGINE
     
     Returns:
         List of recommended product IDs with hybrid scores (adjusted by quality)
     """
     exclude_product_ids = exclude_product_ids or []
+    collaborative_neighbours = _as_neighbour_index(collaborative_similarity)
     
-    # Get content-based similarity for cart products
-    content_similarity = build_content_similarity_matrix()
-    
-    recommendations_scores = {}
+    # Get content-based neighbours for cart products only
+    with stage_timer("similarity"):
+        content_neighbours = content_feature_store.neighbours_for(cart_product_ids, engine=content_engine)
     
     # Weight factors (tune these for better results)
     COLLABORATIVE_WEIGHT = 0.6
     CONTENT_WEIGHT = 0.4
     
-    for product_id in cart_product_ids:
-        # Collaborative filtering scores
-        if not collaborative_similarity.empty and product_id in collaborative_similarity.index:
-            cf_scores = collaborative_similarity[product_id]
-            
-            for similar_product_id, cf_score in cf_scores.items():
-                if similar_product_id == product_id or similar_product_id in exclude_product_ids:
-                    continue
-                
-                # Initialize score if not exists
-                if similar_product_id not in recommendations_scores:
-                    recommendations_scores[similar_product_id] = {'cf': 0.0, 'content': 0.0}
-                
-                recommendations_scores[similar_product_id]['cf'] += cf_score
-        
-        # Content-based filtering scores
-        if not content_similarity.empty and product_id in content_similarity.index:
-            content_scores = content_similarity[product_id]
-            
-            for similar_product_id, content_score in content_scores.items():
-                if similar_product_id == product_id or similar_product_id in exclude_product_ids:
-                    continue
-                
-                # Initialize score if not exists
-                if similar_product_id not in recommendations_scores:
-                    recommendations_scores[similar_product_id] = {'cf': 0.0, 'content': 0.0}
-                
-                recommendations_scores[similar_product_id]['content'] += content_score
-    
-    # Calculate hybrid scores
-    hybrid_scores = []
-    for product_id, scores in recommendations_scores.items():
-        hybrid_score = (
-            scores['cf'] * COLLABORATIVE_WEIGHT +
-            scores['content'] * CONTENT_WEIGHT
+    # Sum the weighted neighbour rows of every cart product in one pass
+    with stage_timer("scoring"):
+        cf_ids, cf_scores = collaborative_neighbours.gather(cart_product_ids)
+        content_ids, content_scores = content_neighbours.gather(cart_product_ids)
+        candidate_ids, hybrid_scores = _accumulate_scores(
+            [
+                (cf_ids, cf_scores, COLLABORATIVE_WEIGHT),
+                (content_ids, content_scores, CONTENT_WEIGHT),
+            ],
+            exclude_product_ids,
         )
-        hybrid_scores.append({'product_id': int(product_id), 'score': float(hybrid_score)})
     
     # Apply rating quality adjustment if db_session provided
-    if db_session:
-        hybrid_scores = apply_rating_quality_to_recommendations(hybrid_scores, db_session)
+    quality_factors = None
+    if db_session and len(candidate_ids):
+        with stage_timer("quality_adjustment"):
+            quality_factors = quality_factor_store.factors_for(candidate_ids)
+            hybrid_scores = hybrid_scores * quality_factors
     
-    # Sort by adjusted score
-    hybrid_scores.sort(key=lambda x: x['score'], reverse=True)
+    with stage_timer("scoring"):
+        top = _top_k_positions(hybrid_scores, limit)
+    results = []
+    for position in top:
+        result = {'product_id': int(candidate_ids[position]), 'score': float(hybrid_scores[position])}
+        if quality_factors is not None:
+            result['quality_factor'] = float(quality_factors[position])
+        results.append(result)
     
-    return hybrid_scores[:limit]
+    return results
 
 
 def get_recommendations_for_items(
     product_ids: List[int],
-    similarity_df: pd.DataFrame,
+    similarity_df,
     n_recommendations: int = 5,
     exclude_product_ids: List[int] = None
 ) -> List[Dict]:
@@ -405,55 +856,30 @@ def get_recommendations_for_items(
     
     Args:
         product_ids: List of product IDs in user's cart
-        similarity_df: Pre-calculated item similarity matrix
+        similarity_df: Item NeighbourIndex (or legacy dense similarity DataFrame)
         n_recommendations: Number of recommendations to return
         exclude_product_ids: Product IDs to exclude (e.g., already in cart)
     
     Returns:
         List of recommended product IDs with similarity scores
     """
-    if similarity_df.empty or not product_ids:
+    neighbour_index = _as_neighbour_index(similarity_df)
+    if neighbour_index.is_empty or not product_ids:
         return []
     
     exclude_product_ids = exclude_product_ids or []
     
-    # For each product in cart, get similar products
-    recommendations_scores = {}
-    
-    for product_id in product_ids:
-        if product_id not in similarity_df.index:
-            continue
-        
-        # Get similarity scores for this product
-        similar_items = similarity_df[product_id].sort_values(ascending=False)
-        
-        # Aggregate scores (sum similarity for products recommended by multiple cart items)
-        for similar_product_id, similarity_score in similar_items.items():
-            # Skip the product itself
-            if similar_product_id == product_id:
-                continue
-            
-            # Skip excluded products
-            if similar_product_id in exclude_product_ids:
-                continue
-            
-            # Aggregate scores
-            if similar_product_id in recommendations_scores:
-                recommendations_scores[similar_product_id] += similarity_score
-            else:
-                recommendations_scores[similar_product_id] = similarity_score
-    
-    # Sort by aggregated similarity score
-    sorted_recommendations = sorted(
-        recommendations_scores.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )
+    # Sum the neighbour rows of all context products (products recommended by
+    # several context items accumulate their similarity)
+    with stage_timer("scoring"):
+        similar_ids, similar_scores = neighbour_index.gather(product_ids)
+        candidate_ids, scores = _accumulate_scores([(similar_ids, similar_scores, 1.0)], exclude_product_ids)
+        top = _top_k_positions(scores, n_recommendations)
     
     # Return top N recommendations
     return [
-        {'product_id': int(product_id), 'score': float(score)}
-        for product_id, score in sorted_recommendations[:n_recommendations]
+        {'product_id': int(candidate_ids[position]), 'score': float(scores[position])}
+        for position in top
     ]
 
 
@@ -489,14 +915,7 @@ def get_cart_recommendations(user_id: int, limit: int = 5) -> List[Product]:
         cart_product_ids = [item.product_id for item in cart.items]
         
         # Get user's past order history (completed orders)
-        past_orders = db_session.query(Order).filter(
-            Order.user_id == user_id,
-            Order.status != "cart"
-        ).all()
-        past_order_product_ids = []
-        for order in past_orders:
-            past_order_product_ids.extend([item.product_id for item in order.items])
-        past_order_product_ids = list(set(past_order_product_ids))  # Remove duplicates
+        past_order_product_ids = interaction_store.products_for_user(user_id)
         
         # Get user's favorite products
         favorites = db_session.query(Favorite).filter(
@@ -513,48 +932,46 @@ def get_cart_recommendations(user_id: int, limit: int = 5) -> List[Product]:
         # Items to exclude from recommendations (already in cart)
         exclude_product_ids = cart_product_ids
         
-        # Build user-item matrix from all order history
-        user_item_matrix = build_user_item_matrix()
+        # Read the precomputed collaborative filtering model
+        similarity_model = get_item_similarity_model()
         
-        print(f"[DEBUG] User {user_id} - Cart products: {cart_product_ids}")
-        print(f"[DEBUG] User {user_id} - Past order products: {past_order_product_ids}")
-        print(f"[DEBUG] User {user_id} - Favorite products: {favorite_product_ids}")
-        print(f"[DEBUG] User {user_id} - Context products: {context_product_ids}")
-        print(f"[DEBUG] User {user_id} - Matrix shape: {user_item_matrix.shape if not user_item_matrix.empty else 'empty'}")
+        logger.debug("User %s - Cart products: %s", user_id, cart_product_ids)
+        logger.debug("User %s - Past order products: %s", user_id, past_order_product_ids)
+        logger.debug("User %s - Favorite products: %s", user_id, favorite_product_ids)
+        logger.debug("User %s - Context products: %s", user_id, context_product_ids)
+        logger.debug("User %s - Similarity model v%s products: %s", user_id, similarity_model.version, len(similarity_model.neighbours) if not similarity_model.is_empty else 'empty')
         
-        if user_item_matrix.empty:
+        if similarity_model.is_empty:
             # Not enough data for collaborative filtering
             # Fall back to category-based recommendations
-            print(f"[DEBUG] User {user_id} - Using fallback (empty matrix)")
+            logger.debug("User %s - Using fallback (empty matrix)", user_id)
             return get_fallback_recommendations(cart_product_ids, limit, db_session)
         
-        # Calculate item similarity matrix (collaborative filtering)
-        similarity_df = calculate_item_similarity(user_item_matrix)
-        
         # Use hybrid recommendations (collaborative + content-based)
-        print(f"[DEBUG] User {user_id} - Using hybrid recommendations (CF + content-based)")
+        logger.debug("User %s - Using hybrid recommendations (CF + content-based)", user_id)
         recommendations = get_hybrid_recommendations(
             cart_product_ids=cart_product_ids,
-            collaborative_similarity=similarity_df,
+            collaborative_similarity=similarity_model.neighbours,
             limit=limit * 2,  # Get extra to filter out unavailable
             exclude_product_ids=exclude_product_ids,
             db_session=db_session  # Pass session for rating quality adjustment
         )
         
-        print(f"[DEBUG] User {user_id} - Hybrid filtering found {len(recommendations)} recommendations")
+        logger.debug("User %s - Hybrid filtering found %s recommendations", user_id, len(recommendations))
         
         # If collaborative filtering found too few recommendations (less than limit),
         # blend with fallback recommendations to fill the gap
         if len(recommendations) < limit:
-            print(f"[DEBUG] User {user_id} - Blending with fallback (only {len(recommendations)} CF recommendations)")
+            logger.debug("User %s - Blending with fallback (only %s CF recommendations)", user_id, len(recommendations))
             
             # Get collaborative filtering results
             cf_product_ids = [rec['product_id'] for rec in recommendations] if recommendations else []
-            cf_products = db_session.query(Product).options(
-                joinedload(Product.variants)
-            ).filter(
-                Product.id.in_(cf_product_ids)
-            ).all() if cf_product_ids else []
+            with stage_timer("product_fetch"):
+                cf_products = db_session.query(Product).options(
+                    joinedload(Product.variants)
+                ).filter(
+                    Product.id.in_(cf_product_ids)
+                ).all() if cf_product_ids else []
             
             # Get fallback recommendations, excluding already recommended products
             fallback_limit = limit - len(cf_products)
@@ -568,19 +985,20 @@ def get_cart_recommendations(user_id: int, limit: int = 5) -> List[Product]:
             
             # Combine both lists
             combined_products = cf_products + fallback_products
-            print(f"[DEBUG] User {user_id} - Returning {len(combined_products)} products ({len(cf_products)} CF + {len(fallback_products)} fallback)")
+            logger.debug("User %s - Returning %s products (%s CF + %s fallback)", user_id, len(combined_products), len(cf_products), len(fallback_products))
             return combined_products[:limit]
         
         # Enough collaborative filtering recommendations
         recommended_product_ids = [rec['product_id'] for rec in recommendations]
-        print(f"[DEBUG] User {user_id} - Fetching {len(recommended_product_ids)} products, limit={limit}")
-        products = db_session.query(Product).options(
-            joinedload(Product.variants)
-        ).filter(
-            Product.id.in_(recommended_product_ids)
-        ).limit(limit).all()
+        logger.debug("User %s - Fetching %s products, limit=%s", user_id, len(recommended_product_ids), limit)
+        with stage_timer("product_fetch"):
+            products = db_session.query(Product).options(
+                joinedload(Product.variants)
+            ).filter(
+                Product.id.in_(recommended_product_ids)
+            ).limit(limit).all()
         
-        print(f"[DEBUG] User {user_id} - Returning {len(products)} products")
+        logger.debug("User %s - Returning %s products", user_id, len(products))
         return products
     finally:
         db_session.close()
@@ -614,23 +1032,24 @@ def get_fallback_recommendations(cart_product_ids: List[int], limit: int, db_ses
         
         cart_categories = list(set([p.category for p in cart_products]))
         
-        print(f"[DEBUG] Fallback - Cart product IDs: {cart_product_ids}")
-        print(f"[DEBUG] Fallback - Exclude product IDs: {all_exclude_ids}")
-        print(f"[DEBUG] Fallback - Cart categories: {cart_categories}")
-        print(f"[DEBUG] Fallback - Limit: {limit}")
+        logger.debug("Fallback - Cart product IDs: %s", cart_product_ids)
+        logger.debug("Fallback - Exclude product IDs: %s", all_exclude_ids)
+        logger.debug("Fallback - Cart categories: %s", cart_categories)
+        logger.debug("Fallback - Limit: %s", limit)
         
         if not cart_categories:
             return []
         
         # Get products from same categories, excluding specified items
-        recommended_products = db_session.query(Product).options(
-            joinedload(Product.variants)
-        ).filter(
-            Product.category.in_(cart_categories),
-            ~Product.id.in_(all_exclude_ids)
-        ).limit(limit).all()
+        with stage_timer("product_fetch"):
+            recommended_products = db_session.query(Product).options(
+                joinedload(Product.variants)
+            ).filter(
+                Product.category.in_(cart_categories),
+                ~Product.id.in_(all_exclude_ids)
+            ).limit(limit).all()
         
-        print(f"[DEBUG] Fallback - Found {len(recommended_products)} recommendations")
+        logger.debug("Fallback - Found %s recommendations", len(recommended_products))
         
         return recommended_products
     finally:
@@ -656,96 +1075,106 @@ def get_personalized_recommendations(user_id: int, limit: int = 8) -> List[Produ
     Returns:
         List of recommended Product objects
     """
+    # Serve from the per-user cache while the user's inputs and the model are unchanged
+    model_version = get_item_similarity_model().version
+    cached_product_ids = recommendation_cache.get(user_id, limit, model_version)
+    
     db_session = Session()
     try:
-        # Get user's purchase history (completed orders)
-        past_orders = db_session.query(Order).filter(
-            Order.user_id == user_id,
-            Order.status != "cart"
-        ).all()
-        
-        # Collect all products user has purchased
-        purchased_product_ids = []
-        for order in past_orders:
-            purchased_product_ids.extend([item.product_id for item in order.items])
-        purchased_product_ids = list(set(purchased_product_ids))  # Remove duplicates
+        if cached_product_ids is not None:
+            with stage_timer("product_fetch"):
+                products = db_session.query(Product).options(
+                    joinedload(Product.variants)
+                ).filter(
+                    Product.id.in_(cached_product_ids)
+                ).all()
+            product_dict = {p.id: p for p in products}
+            return [product_dict[pid] for pid in cached_product_ids if pid in product_dict]
         
-        # Get user's favorites
-        favorites = db_session.query(Favorite).filter(
-            Favorite.user_id == user_id,
-            Favorite.removed_at.is_(None)
-        ).all()
-        favorite_product_ids = [fav.product_id for fav in favorites]
+        products = _compute_personalized_recommendations(user_id, limit, db_session)
+        recommendation_cache.set(user_id, limit, model_version, [p.id for p in products])
+        return products
+    finally:
+        db_session.close()
+
+
+def _compute_personalized_recommendations(user_id: int, limit: int, db_session) -> List[Product]:
+    """Run the personalized recommendation strategies (see get_personalized_recommendations)."""
+    # Get all products the user has purchased (completed orders)
+    purchased_product_ids = interaction_store.products_for_user(user_id)
+    
+    # Get user's favorites
+    favorites = db_session.query(Favorite).filter(
+        Favorite.user_id == user_id,
+        Favorite.removed_at.is_(None)
+    ).all()
+    favorite_product_ids = [fav.product_id for fav in favorites]
+    
+    logger.debug("Personalized - User %s has %s purchased products", user_id, len(purchased_product_ids))
+    logger.debug("Personalized - User %s has %s favorites", user_id, len(favorite_product_ids))
+    
+    # Strategy 1: User has purchase history - use collaborative filtering
+    if purchased_product_ids:
+        logger.debug("Personalized - Using collaborative filtering for user %s", user_id)
         
-        print(f"[DEBUG] Personalized - User {user_id} has {len(purchased_product_ids)} purchased products")
-        print(f"[DEBUG] Personalized - User {user_id} has {len(favorite_product_ids)} favorites")
+        # Read the precomputed collaborative filtering model
+        similarity_model = get_item_similarity_model()
         
-        # Strategy 1: User has purchase history - use collaborative filtering
-        if purchased_product_ids:
-            print(f"[DEBUG] Personalized - Using collaborative filtering for user {user_id}")
+        if not similarity_model.is_empty:
+            # Get recommendations based on purchase history
+            # Combine purchased products and favorites for better context
+            context_product_ids = list(set(purchased_product_ids + favorite_product_ids))
             
-            # Build user-item matrix
-            user_item_matrix = build_user_item_matrix()
+            recommendations = get_recommendations_for_items(
+                product_ids=context_product_ids,
+                similarity_df=similarity_model.neighbours,
+                n_recommendations=limit * 2,  # Get extra to filter
+                exclude_product_ids=purchased_product_ids  # Don't recommend already purchased
+            )
             
-            if not user_item_matrix.empty:
-                # Calculate item similarity
-                similarity_df = calculate_item_similarity(user_item_matrix)
-                
-                # Get recommendations based on purchase history
-                # Combine purchased products and favorites for better context
-                context_product_ids = list(set(purchased_product_ids + favorite_product_ids))
-                
-                recommendations = get_recommendations_for_items(
-                    product_ids=context_product_ids,
-                    similarity_df=similarity_df,
-                    n_recommendations=limit * 2,  # Get extra to filter
-                    exclude_product_ids=purchased_product_ids  # Don't recommend already purchased
-                )
-                
-                if recommendations:
-                    recommended_product_ids = [rec['product_id'] for rec in recommendations[:limit]]
+            if recommendations:
+                recommended_product_ids = [rec['product_id'] for rec in recommendations[:limit]]
+                with stage_timer("product_fetch"):
                     products = db_session.query(Product).options(
                         joinedload(Product.variants)
                     ).filter(
                         Product.id.in_(recommended_product_ids)
                     ).all()
-                    
-                    # Sort products to match recommendation order
-                    product_dict = {p.id: p for p in products}
-                    sorted_products = [product_dict[pid] for pid in recommended_product_ids if pid in product_dict]
-                    
-                    print(f"[DEBUG] Personalized - Returning {len(sorted_products)} CF recommendations")
-                    return sorted_products
-        
-        # Strategy 2: User has favorites but no purchases - recommend similar to favorites
-        if favorite_product_ids:
-            print(f"[DEBUG] Personalized - Using favorites-based recommendations for user {user_id}")
-            
-            # Get categories from favorite products
-            favorite_products = db_session.query(Product).filter(
-                Product.id.in_(favorite_product_ids)
-            ).all()
-            favorite_categories = list(set([p.category for p in favorite_products]))
-            
-            # Recommend popular products from same categories
+                
+                # Sort products to match recommendation order
+                product_dict = {p.id: p for p in products}
+                sorted_products = [product_dict[pid] for pid in recommended_product_ids if pid in product_dict]
+                
+                logger.debug("Personalized - Returning %s CF recommendations", len(sorted_products))
+                return sorted_products
+    
+    # Strategy 2: User has favorites but no purchases - recommend similar to favorites
+    if favorite_product_ids:
+        logger.debug("Personalized - Using favorites-based recommendations for user %s", user_id)
+        
+        # Get categories from favorite products
+        favorite_products = db_session.query(Product).filter(
+            Product.id.in_(favorite_product_ids)
+        ).all()
+        favorite_categories = list(set([p.category for p in favorite_products]))
+        
+        # Recommend popular products from same categories
+        with stage_timer("product_fetch"):
             recommendations = db_session.query(Product).options(
                 joinedload(Product.variants)
             ).filter(
                 Product.category.in_(favorite_categories),
                 ~Product.id.in_(favorite_product_ids)  # Exclude favorites
             ).limit(limit).all()
-            
-            print(f"[DEBUG] Personalized - Returning {len(recommendations)} category-based recommendations")
-            return recommendations
-        
-        # Strategy 3: New user with no history - show trending/popular products
-        print(f"[DEBUG] Personalized - Using trending products for new user {user_id}")
-        trending_products = get_trending_products(limit, db_session)
-        print(f"[DEBUG] Personalized - Returning {len(trending_products)} trending products")
-        return trending_products
         
-    finally:
-        db_session.close()
+        logger.debug("Personalized - Returning %s category-based recommendations", len(recommendations))
+        return recommendations
+    
+    # Strategy 3: New user with no history - show trending/popular products
+    logger.debug("Personalized - Using trending products for new user %s", user_id)
+    trending_products = get_trending_products(limit, db_session)
+    logger.debug("Personalized - Returning %s trending products", len(trending_products))
+    return trending_products
 
 
 def get_trending_products(limit: int, db_session=None) -> List[Product]:
@@ -801,3 +1230,136 @@ def get_trending_products(limit: int, db_session=None) -> List[Product]:
     finally:
         if should_close:
             db_session.close()
+
+
+def _load_cart_product_ids(user_ids: List[int], db_session) -> Dict[int, List[int]]:
+    """Products in each user's active cart, loaded with one query."""
+    rows = db_session.query(Order.user_id, OrderItem.product_id).join(
+        OrderItem, OrderItem.order_id == Order.id
+    ).filter(
+        Order.user_id.in_(user_ids),
+        Order.status == "cart"
+    ).all()
+    
+    cart_product_ids = {user_id: [] for user_id in user_ids}
+    for user_id, product_id in rows:
+        cart_product_ids[user_id].append(product_id)
+    return cart_product_ids
+
+
+def _load_favorite_product_ids(user_ids: List[int], db_session) -> Dict[int, List[int]]:
+    """Active favorite products of each user, loaded with one query."""
+    rows = db_session.query(Favorite.user_id, Favorite.product_id).filter(
+        Favorite.user_id.in_(user_ids),
+        Favorite.removed_at.is_(None)
+    ).all()
+    
+    favorite_product_ids = {user_id: [] for user_id in user_ids}
+    for user_id, product_id in rows:
+        favorite_product_ids[user_id].append(product_id)
+    return favorite_product_ids
+
+
+def iter_batch_recommendations(
+    user_ids: List[int],
+    limit: int = 8,
+    chunk_size: int = BATCH_CHUNK_SIZE
+) -> Iterator[List[Tuple[int, List[int]]]]:
+    """
+    Recommend products for many users at once (nightly emails, homepage pre-warm).
+    Every user is scored against the same similarity model: each chunk of users
+    becomes a sparse users x products context matrix (cart + purchases + favorites)
+    that is multiplied by the item similarity matrix in one operation.
+    Users without collaborative signal are filled with trending products.
+    
+    Args:
+        user_ids: Users to recommend for
+        limit: Recommendations per user
+        chunk_size: Users loaded and scored per chunk
+    
+    Yields:
+        Lists of (user_id, recommended product IDs) pairs, one list per chunk
+    """
+    similarity_model = get_item_similarity_model()
+    product_ids, similarity = similarity_model.neighbours.to_sparse()
+    column_of = {int(product_id): column for column, product_id in enumerate(product_ids)}
+    
+    db_session = Session()
+    try:
+        # Shared filler for users the model can't score (computed once per batch)
+        trending_ids = [p.id for p in get_trending_products(limit * 3, db_session)]
+        
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = list(user_ids[start:start + chunk_size])
+            cart_product_ids = _load_cart_product_ids(chunk, db_session)
+            favorite_product_ids = _load_favorite_product_ids(chunk, db_session)
+            purchased_product_ids = interaction_store.products_for_users(chunk)
+            
+            # Build the users x products context matrix for this chunk
+            rows, columns = [], []
+            for row, user_id in enumerate(chunk):
+                context = set(cart_product_ids[user_id]) | set(purchased_product_ids[user_id]) | set(favorite_product_ids[user_id])
+                for product_id in context:
+                    column = column_of.get(product_id)
+                    if column is not None:
+                        rows.append(row)
+                        columns.append(column)
+            context_matrix = sparse.csr_matrix(
+                (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+                shape=(len(chunk), len(product_ids))
+            )
+            scores = context_matrix @ similarity
+            
+            results = []
+            for row, user_id in enumerate(chunk):
+                exclude = set(cart_product_ids[user_id]) | set(purchased_product_ids[user_id])
+                user_scores = scores.getrow(row)
+                candidate_ids = product_ids[user_scores.indices]
+                candidate_scores = user_scores.data.astype(np.float64)
+                keep = ~np.isin(candidate_ids, list(exclude))
+                candidate_ids, candidate_scores = candidate_ids[keep], candidate_scores[keep]
+                
+                recommended = [int(candidate_ids[position]) for position in _top_k_positions(candidate_scores, limit)]
+                for product_id in trending_ids:
+                    if len(recommended) >= limit:
+                        break
+                    if product_id not in exclude and product_id not in recommended:
+                        recommended.append(product_id)
+                results.append((user_id, recommended))
+            
+            yield results
+    finally:
+        db_session.close()
+
+
+def _main(argv: List[str]) -> int:
+    import argparse
+    import json
+    
+    parser = argparse.ArgumentParser(description="Batch product recommendations")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    batch = subcommands.add_parser("batch", help="Recommend for many users, one JSON line per user")
+    batch.add_argument("user_ids", help="Comma-separated user IDs, or 'all' for every user")
+    batch.add_argument("--limit", type=int, default=8)
+    batch.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    
+    if args.user_ids == "all":
+        from models import User
+        db_session = Session()
+        try:
+            user_ids = [user_id for (user_id,) in db_session.query(User.id).order_by(User.id)]
+        finally:
+            db_session.close()
+    else:
+        user_ids = [int(user_id) for user_id in args.user_ids.split(",") if user_id.strip()]
+    
+    for chunk in iter_batch_recommendations(user_ids, args.limit, args.chunk_size):
+        for user_id, product_ids in chunk:
+            print(json.dumps({"user_id": user_id, "product_ids": product_ids}), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(_main(sys.argv[1:]))
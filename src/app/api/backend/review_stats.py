@@ -0,0 +1,86 @@
+"""
+Per-product review statistics
+review_stats holds a 1-5 star histogram plus the rating sum and count of each
+product. submit_review applies the change of a single review inside its own
+transaction, so the rating distribution and average are O(1) reads:
+- record_rating(): upsert the histogram delta of a new or edited review
+- get_rating_histogram(): {1: count, ..., 5: count} for a product
+- get_rating_summary(): (rating_count, rating_avg) for a product
+- backfill_review_stats(): rebuild every row from the reviews table
+"""
+
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.dialects.sqlite import insert
+
+from models import Review, ReviewStats
+
+RATING_COLUMNS = {rating: f"rating_{rating}" for rating in range(1, 6)}
+
+
+def record_rating(db_session, product_id: int, rating: int, previous_rating: Optional[int] = None) -> None:
+    """
+    Add a new review's rating, or move an edited review from previous_rating
+    to rating. Not committed; runs in the caller's transaction.
+    """
+    delta = {column: 0 for column in RATING_COLUMNS.values()}
+    delta[RATING_COLUMNS[rating]] += 1
+    delta["rating_sum"] = rating
+    delta["rating_count"] = 1
+    if previous_rating is not None:
+        delta[RATING_COLUMNS[previous_rating]] -= 1
+        delta["rating_sum"] -= previous_rating
+        delta["rating_count"] = 0
+
+    statement = insert(ReviewStats).values(product_id=product_id, **delta)
+    statement = statement.on_conflict_do_update(
+        index_elements=[ReviewStats.product_id],
+        set_={column: getattr(ReviewStats, column) + getattr(statement.excluded, column) for column in delta},
+    )
+    db_session.execute(statement)
+
+
+def get_rating_summary(db_session, product_id: int) -> Tuple[int, float]:
+    """(rating_count, rating_avg) of a product; (0, 0.0) when it has no reviews."""
+    row = (
+        db_session.query(ReviewStats.rating_count, ReviewStats.rating_sum)
+        .filter(ReviewStats.product_id == product_id)
+        .first()
+    )
+    if not row or not row.rating_count:
+        return 0, 0.0
+    return row.rating_count, row.rating_sum / row.rating_count
+
+
+def get_rating_histogram(db_session, product_id: int) -> Dict[int, int]:
+    columns = [getattr(ReviewStats, column) for column in RATING_COLUMNS.values()]
+    row = db_session.query(*columns).filter(ReviewStats.product_id == product_id).first()
+    return {rating: (row[index] if row else 0) for index, rating in enumerate(RATING_COLUMNS)}
+
+
+def backfill_review_stats(db_session) -> None:
+    """Rebuild review_stats with one GROUP BY over reviews."""
+    counts = [func.sum(case((Review.rating == rating, 1), else_=0)) for rating in RATING_COLUMNS]
+    rows = (
+        db_session.query(Review.product_id, *counts, func.sum(Review.rating), func.count(Review.id))
+        .group_by(Review.product_id)
+        .all()
+    )
+    db_session.query(ReviewStats).delete()
+    db_session.bulk_insert_mappings(ReviewStats, [
+        {
+            "product_id": row[0],
+            **{column: row[index + 1] for index, column in enumerate(RATING_COLUMNS.values())},
+            "rating_sum": row[6],
+            "rating_count": row[7],
+        }
+        for row in rows
+    ])
+    db_session.commit()
+
+
+def ensure_review_stats_backfilled(db_session) -> None:
+    """Backfill once when review_stats is empty but reviews exist."""
+    if db_session.query(ReviewStats.product_id).first() is None and db_session.query(Review.id).first() is not None:
+        backfill_review_stats(db_session)
@@ -6,12 +6,119 @@
     Mutations: Write operations (create users, add/remove favorites)
 '''
 import strawberry
-from typing import List, Optional
+from contextvars import ContextVar
+from strawberry.extensions import SchemaExtension
+from typing import Callable, Dict, Iterable, List, Optional
 from models import Product, ProductRelation, Variant, User, Favorite, Order, OrderItem, Review, session
-from sqlalchemy import or_, func
+from sqlalchemy import or_, tuple_
 from datetime import datetime
 import hashlib
 from werkzeug.security import check_password_hash, generate_password_hash
+from recommendation_cache import recommendation_cache, invalidate_user_recommendations
+from search_index import product_search_subquery
+from pagination import count_cache, decode_cursor, encode_cursor, page_size
+from trending_store import record_cart_add, record_purchases, top_trending
+from review_stats import get_rating_histogram, get_rating_summary, record_rating
+from product_relations import MAX_RELATION_LINKS, candidate_pool, rank_relations, relation_jobs
+
+# Request-scoped batch loaders
+# Child rows (variants, order items, ...) are collected per GraphQL operation and
+# fetched with one IN query per relation instead of one lazy load per parent.
+
+class BatchLoader:
+    """
+    Collects keys via prime() and fetches all pending keys with a single call
+    to fetch(keys) -> {key: value} on the next load(). Results are cached for
+    the rest of the operation; missing keys resolve to default_factory().
+    on_fetch(results) runs after each fetch, so dependent loaders can be primed
+    without querying until one of their fields is actually resolved.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[List], Dict],
+        default_factory: Callable = lambda: None,
+        on_fetch: Optional[Callable[[Dict], None]] = None,
+    ):
+        self._fetch = fetch
+        self._default_factory = default_factory
+        self._on_fetch = on_fetch
+        self._cache = {}
+        self._pending = set()
+
+    def prime(self, keys: Iterable) -> None:
+        self._pending.update(key for key in keys if key is not None and key not in self._cache)
+
+    def _dispatch(self) -> None:
+        keys, self._pending = list(self._pending), set()
+        results = self._fetch(keys) if keys else {}
+        for key in keys:
+            self._cache[key] = results.get(key, self._default_factory())
+        if self._on_fetch and results:
+            self._on_fetch(results)
+
+    def load(self, key):
+        if key not in self._cache:
+            self._pending.add(key)
+            self._dispatch()
+        return self._cache.get(key, self._default_factory())
+
+    def load_many(self, keys: Iterable) -> List:
+        keys = list(keys)
+        self.prime(keys)
+        if self._pending:
+            self._dispatch()
+        return [self._cache.get(key, self._default_factory()) for key in keys]
+
+
+def _fetch_by_id(model):
+    def fetch(ids):
+        return {row.id: row for row in session.query(model).filter(model.id.in_(ids)).all()}
+    return fetch
+
+
+def _fetch_grouped(model, foreign_key):
+    def fetch(parent_ids):
+        grouped = {}
+        rows = session.query(model).filter(foreign_key.in_(parent_ids)).order_by(model.id).all()
+        for row in rows:
+            grouped.setdefault(getattr(row, foreign_key.key), []).append(row)
+        return grouped
+    return fetch
+
+
+class Loaders:
+    def __init__(self):
+        self.products = BatchLoader(_fetch_by_id(Product), on_fetch=self._prime_product_children)
+        self.variants = BatchLoader(_fetch_by_id(Variant))
+        self.users = BatchLoader(_fetch_by_id(User))
+        self.variants_by_product = BatchLoader(_fetch_grouped(Variant, Variant.product_id), list)
+        self.items_by_order = BatchLoader(
+            _fetch_grouped(OrderItem, OrderItem.order_id), list, on_fetch=self._prime_item_children
+        )
+
+    def _prime_product_children(self, products: Dict) -> None:
+        self.variants_by_product.prime(products.keys())
+
+    def _prime_item_children(self, items_by_order: Dict) -> None:
+        items = [item for items in items_by_order.values() for item in items]
+        self.products.prime(item.product_id for item in items)
+        self.variants.prime(item.variant_id for item in items)
+
+
+_operation_loaders: ContextVar[Optional[Loaders]] = ContextVar("graphql_loaders", default=None)
+
+
+def get_loaders() -> Loaders:
+    # Outside a GraphQL operation (scripts, direct calls) every call gets fresh loaders
+    return _operation_loaders.get() or Loaders()
+
+
+class BatchLoaderExtension(SchemaExtension):
+    def on_operation(self):
+        token = _operation_loaders.set(Loaders())
+        yield
+        _operation_loaders.reset(token)
 
 # GraphQL Types - Define the structure of data returned by API
 
@@ -35,39 +142,87 @@ class VariantType:
 
 @strawberry.type
 class ProductType:
-    id: int
-    name: str
-    category: str
-    price: float
-    description: Optional[str]
-    brand: Optional[str]
-    material: Optional[str]
-    tags: Optional[str]
-    ratingAvg: float
-    ratingCount: int
-    salesCount: int
-    imageUrl: Optional[str]
-    createdAt: str
-    variants: List[VariantType]
+    # Fields resolve from the underlying row, so unselected relations are never loaded
+    row: strawberry.Private[Product]
+    loaders: strawberry.Private[Loaders]
+    variant_color: strawberry.Private[Optional[str]] = None
+
+    @strawberry.field
+    def id(self) -> int:
+        return self.row.id
+
+    @strawberry.field
+    def name(self) -> str:
+        return self.row.name
+
+    @strawberry.field
+    def category(self) -> str:
+        return self.row.category
+
+    @strawberry.field
+    def price(self) -> float:
+        return self.row.price
+
+    @strawberry.field
+    def description(self) -> Optional[str]:
+        return self.row.description
+
+    @strawberry.field
+    def brand(self) -> Optional[str]:
+        return self.row.brand
+
+    @strawberry.field
+    def material(self) -> Optional[str]:
+        return self.row.material
+
+    @strawberry.field
+    def tags(self) -> Optional[str]:
+        return self.row.tags
+
+    @strawberry.field
+    def ratingAvg(self) -> float:
+        return self.row.rating_avg or 0.0
+
+    @strawberry.field
+    def ratingCount(self) -> int:
+        return self.row.rating_count or 0
+
+    @strawberry.field
+    def salesCount(self) -> int:
+        return self.row.sales_count or 0
+
+    @strawberry.field
+    def imageUrl(self) -> Optional[str]:
+        return self.row.image_url
+
+    @strawberry.field
+    def createdAt(self) -> str:
+        return self.row.created_at.isoformat() if self.row.created_at else ""
+
+    @strawberry.field
+    def variants(self) -> List[VariantType]:
+        # The first product to resolve variants loads them for every primed product
+        variants = self.loaders.variants_by_product.load(self.row.id)
+        if self.variant_color:
+            variants = [variant for variant in variants if variant.color == self.variant_color]
+        return [VariantType.from_db(v) for v in variants]
     
     @staticmethod
-    def from_db(product):
-        return ProductType(
-            id=product.id,
-            name=product.name,
-            category=product.category,
-            price=product.price,
-            description=product.description,
-            brand=product.brand,
-            material=product.material,
-            tags=product.tags,
-            ratingAvg=product.rating_avg or 0.0,
-            ratingCount=product.rating_count or 0,
-            salesCount=product.sales_count or 0,
-            imageUrl=product.image_url,
-            createdAt=product.created_at.isoformat() if product.created_at else "",
-            variants=[VariantType.from_db(v) for v in product.variants]
-        )
+    def from_db(product, loaders: Loaders = None, variant_color: Optional[str] = None):
+        loaders = loaders or get_loaders()
+        loaders.variants_by_product.prime([product.id])
+        return ProductType(row=product, loaders=loaders, variant_color=variant_color)
+
+    @staticmethod
+    def from_db_many(products, variant_color: Optional[str] = None) -> List["ProductType"]:
+        # Variants of every product are loaded with one query, and only if selected
+        loaders = get_loaders()
+        return [ProductType.from_db(p, loaders, variant_color) for p in products]
+
+@strawberry.type
+class UserRecommendationsType:
+    userId: int
+    products: List[ProductType]
 
 @strawberry.type
 class UserType:
@@ -78,33 +233,116 @@ class UserType:
 
 @strawberry.type
 class ReviewType:
-    id: int
-    productId: int
-    userId: int
-    username: str
-    rating: int
-    title: Optional[str]
-    comment: Optional[str]
-    verifiedPurchase: bool
-    helpfulCount: int
-    createdAt: str
-    updatedAt: str
+    row: strawberry.Private[Review]
+    loaders: strawberry.Private[Loaders]
+
+    @strawberry.field
+    def id(self) -> int:
+        return self.row.id
+
+    @strawberry.field
+    def productId(self) -> int:
+        return self.row.product_id
+
+    @strawberry.field
+    def userId(self) -> int:
+        return self.row.user_id
+
+    @strawberry.field
+    def username(self) -> str:
+        user = self.loaders.users.load(self.row.user_id)
+        return user.username if user else "Anonymous"
+
+    @strawberry.field
+    def rating(self) -> int:
+        return self.row.rating
+
+    @strawberry.field
+    def title(self) -> Optional[str]:
+        return self.row.title
+
+    @strawberry.field
+    def comment(self) -> Optional[str]:
+        return self.row.comment
+
+    @strawberry.field
+    def verifiedPurchase(self) -> bool:
+        return bool(self.row.verified_purchase)
+
+    @strawberry.field
+    def helpfulCount(self) -> int:
+        return self.row.helpful_count
+
+    @strawberry.field
+    def createdAt(self) -> str:
+        return self.row.created_at.isoformat() if self.row.created_at else ""
+
+    @strawberry.field
+    def updatedAt(self) -> str:
+        return self.row.updated_at.isoformat() if self.row.updated_at else ""
     
     @staticmethod
-    def from_db(review):
-        return ReviewType(
-            id=review.id,
-            productId=review.product_id,
-            userId=review.user_id,
-            username=review.user.username if review.user else "Anonymous",
-            rating=review.rating,
-            title=review.title,
-            comment=review.comment,
-            verifiedPurchase=bool(review.verified_purchase),
-            helpfulCount=review.helpful_count,
-            createdAt=review.created_at.isoformat() if review.created_at else "",
-            updatedAt=review.updated_at.isoformat() if review.updated_at else ""
-        )
+    def from_db(review, loaders: Loaders = None):
+        loaders = loaders or get_loaders()
+        loaders.users.prime([review.user_id])
+        return ReviewType(row=review, loaders=loaders)
+
+    @staticmethod
+    def from_db_many(reviews) -> List["ReviewType"]:
+        # Review authors are loaded with one query, and only if username is selected
+        loaders = get_loaders()
+        return [ReviewType.from_db(r, loaders) for r in reviews]
+
+# Relay-style connections (cursor pagination)
+
+@strawberry.type
+class PageInfo:
+    hasNextPage: bool
+    hasPreviousPage: bool
+    startCursor: Optional[str]
+    endCursor: Optional[str]
+
+@strawberry.type
+class ProductEdge:
+    cursor: str
+    node: ProductType
+
+@strawberry.type
+class ProductConnection:
+    edges: List[ProductEdge]
+    pageInfo: PageInfo
+    count_key: strawberry.Private[tuple]
+    count_rows: strawberry.Private[Callable[[], int]]
+
+    @strawberry.field
+    def totalCount(self) -> int:
+        # Served from a short-lived cache rather than a COUNT(*) per page
+        return count_cache.get_or_count(self.count_key, self.count_rows)
+
+@strawberry.type
+class ReviewEdge:
+    cursor: str
+    node: ReviewType
+
+@strawberry.type
+class ReviewConnection:
+    edges: List[ReviewEdge]
+    pageInfo: PageInfo
+    count_key: strawberry.Private[tuple]
+    count_rows: strawberry.Private[Callable[[], int]]
+
+    @strawberry.field
+    def totalCount(self) -> int:
+        return count_cache.get_or_count(self.count_key, self.count_rows)
+
+
+def _page_info(cursors: List[str], has_next_page: bool, after: Optional[str]) -> PageInfo:
+    return PageInfo(
+        hasNextPage=has_next_page,
+        hasPreviousPage=after is not None,
+        startCursor=cursors[0] if cursors else None,
+        endCursor=cursors[-1] if cursors else None,
+    )
 
 @strawberry.type
 class ReviewStatsType:
@@ -114,6 +352,14 @@ class ReviewStatsType:
     rating4: int
     rating5: int
 
+@strawberry.type
+class RecommendationCacheStatsType:
+    hits: int
+    misses: int
+    invalidations: int
+    hitRate: float
+    size: int
+
 @strawberry.type
 class FavoriteType:
     id: int
@@ -121,20 +367,32 @@ class FavoriteType:
     product_id: int
     created_at: str  # ISO format timestamp
     removed_at: Optional[str]  # NULL if still favorited
-    product: ProductType  # Full product details included
+    loaders: strawberry.Private[Loaders]
+
+    @strawberry.field
+    def product(self) -> ProductType:
+        # Full product details, loaded for all favorites at once when selected
+        return ProductType.from_db(self.loaders.products.load(self.product_id), self.loaders)
     
     @staticmethod
-    def from_db(favorite):
+    def from_db(favorite, loaders: Loaders = None):
         # Convert SQLAlchemy model to GraphQL type with datetime conversion
+        loaders = loaders or get_loaders()
+        loaders.products.prime([favorite.product_id])
         return FavoriteType(
             id=favorite.id,
             user_id=favorite.user_id,
             product_id=favorite.product_id,
             created_at=favorite.created_at.isoformat() if favorite.created_at else None,
             removed_at=favorite.removed_at.isoformat() if favorite.removed_at else None,
-            product=favorite.product
+            loaders=loaders
         )
 
+    @staticmethod
+    def from_db_many(favorites) -> List["FavoriteType"]:
+        loaders = get_loaders()
+        return [FavoriteType.from_db(f, loaders) for f in favorites]
+
 @strawberry.type
 class FavoriteResponse:
     favorite: Optional[FavoriteType]
@@ -152,11 +410,21 @@ class OrderItemType:
     color: str
     size: str
     added_at: str
-    product: ProductType
-    variant: VariantType
+    loaders: strawberry.Private[Loaders]
+
+    @strawberry.field
+    def product(self) -> ProductType:
+        return ProductType.from_db(self.loaders.products.load(self.product_id), self.loaders)
+
+    @strawberry.field
+    def variant(self) -> VariantType:
+        return VariantType.from_db(self.loaders.variants.load(self.variant_id))
     
     @staticmethod
-    def from_db(order_item):
+    def from_db(order_item, loaders: Loaders = None):
+        loaders = loaders or get_loaders()
+        loaders.products.prime([order_item.product_id])
+        loaders.variants.prime([order_item.variant_id])
         return OrderItemType(
             id=order_item.id,
             order_id=order_item.order_id,
@@ -168,156 +436,96 @@ class OrderItemType:
             color=order_item.color,
             size=order_item.size,
             added_at=order_item.added_at.isoformat() if order_item.added_at else None,
-            product=order_item.product,
-            variant=order_item.variant
+            loaders=loaders
         )
 
 @strawberry.type
 class OrderType:
-    id: int
-    user_id: int
-    status: str
-    total: float
-    subtotal: float
-    tax: float
-    shipping: float
-    full_name: Optional[str]
-    address: Optional[str]
-    city: Optional[str]
-    postal_code: Optional[str]
-    country: Optional[str]
-    phone: Optional[str]
-    card_last4: Optional[str]
-    created_at: str
-    updated_at: str
-    items: List[OrderItemType]
-    
-    @staticmethod
-    def from_db(order):
-        return OrderType(
-            id=order.id,
-            user_id=order.user_id,
-            status=order.status,
-            total=order.total or 0.0,
-            subtotal=order.subtotal or 0.0,
-            tax=order.tax or 0.0,
-            shipping=order.shipping or 0.0,
-            full_name=order.full_name,
-            address=order.address,
-            city=order.city,
-            postal_code=order.postal_code,
-            country=order.country,
-            phone=order.phone,
-            card_last4=order.card_last4,
-            created_at=order.created_at.isoformat() if order.created_at else None,
-            updated_at=order.updated_at.isoformat() if order.updated_at else None,
-            items=[OrderItemType.from_db(item) for item in order.items]
-        )
+    # Fields resolve from the underlying row; items load only when selected
+    row: strawberry.Private[Order]
+    loaders: strawberry.Private[Loaders]
 
+    @strawberry.field
+    def id(self) -> int:
+        return self.row.id
 
-def _tags_set(tags: Optional[str]) -> set:
-    if not tags:
-        return set()
-    return {tag.strip().lower() for tag in tags.split(',') if tag.strip()}
+    @strawberry.field
+    def user_id(self) -> int:
+        return self.row.user_id
 
+    @strawberry.field
+    def status(self) -> str:
+        return self.row.status
 
-def _infer_relation_type(base_product: Product, candidate: Product) -> Optional[str]:
-    shared_tags = _tags_set(base_product.tags) & _tags_set(candidate.tags)
-    same_category = base_product.category == candidate.category
-    same_brand = bool(base_product.brand and candidate.brand and base_product.brand == candidate.brand)
-    same_material = bool(base_product.material and candidate.material and base_product.material == candidate.material)
+    @strawberry.field
+    def total(self) -> float:
+        return self.row.total or 0.0
 
-    if same_category and same_brand:
-        return "collection"
-    if len(shared_tags) >= 2 or same_material:
-        return "dependency"
+    @strawberry.field
+    def subtotal(self) -> float:
+        return self.row.subtotal or 0.0
 
-    if same_category:
-        max_price = max(base_product.price or 0, candidate.price or 0, 1)
-        relative_price_delta = abs((base_product.price or 0) - (candidate.price or 0)) / max_price
-        if relative_price_delta <= 0.35:
-            return "bundle"
+    @strawberry.field
+    def tax(self) -> float:
+        return self.row.tax or 0.0
 
-    return None
+    @strawberry.field
+    def shipping(self) -> float:
+        return self.row.shipping or 0.0
 
+    @strawberry.field
+    def full_name(self) -> Optional[str]:
+        return self.row.full_name
 
-def _relation_score(base_product: Product, candidate: Product) -> int:
-    shared_tags = _tags_set(base_product.tags) & _tags_set(candidate.tags)
-    score = len(shared_tags)
+    @strawberry.field
+    def address(self) -> Optional[str]:
+        return self.row.address
 
-    if base_product.category == candidate.category:
-        score += 3
-    if base_product.brand and candidate.brand and base_product.brand == candidate.brand:
-        score += 3
-    if base_product.material and candidate.material and base_product.material == candidate.material:
-        score += 2
+    @strawberry.field
+    def city(self) -> Optional[str]:
+        return self.row.city
 
-    return score
+    @strawberry.field
+    def postal_code(self) -> Optional[str]:
+        return self.row.postal_code
 
+    @strawberry.field
+    def country(self) -> Optional[str]:
+        return self.row.country
 
-def _insert_relation_pair(product_id: int, related_product_id: int, relation_type: str):
-    if product_id == related_product_id:
-        return
+    @strawberry.field
+    def phone(self) -> Optional[str]:
+        return self.row.phone
 
-    existing = session.query(ProductRelation).filter(
-        ProductRelation.product_id == product_id,
-        ProductRelation.related_product_id == related_product_id,
-    ).first()
-    if not existing:
-        session.add(
-            ProductRelation(
-                product_id=product_id,
-                related_product_id=related_product_id,
-                relation_type=relation_type,
-            )
-        )
+    @strawberry.field
+    def card_last4(self) -> Optional[str]:
+        return self.row.card_last4
 
-    reciprocal = session.query(ProductRelation).filter(
-        ProductRelation.product_id == related_product_id,
-        ProductRelation.related_product_id == product_id,
-    ).first()
-    if not reciprocal:
-        session.add(
-            ProductRelation(
-                product_id=related_product_id,
-                related_product_id=product_id,
-                relation_type=relation_type,
-            )
-        )
+    @strawberry.field
+    def created_at(self) -> str:
+        return self.row.created_at.isoformat() if self.row.created_at else None
 
+    @strawberry.field
+    def updated_at(self) -> str:
+        return self.row.updated_at.isoformat() if self.row.updated_at else None
+
+    @strawberry.field
+    def items(self) -> List[OrderItemType]:
+        # Loads the items of every primed order at once, priming their products and variants
+        items = self.loaders.items_by_order.load(self.row.id)
+        return [OrderItemType.from_db(item, self.loaders) for item in items]
+    
+    @staticmethod
+    def from_db(order, loaders: Loaders = None):
+        loaders = loaders or get_loaders()
+        loaders.items_by_order.prime([order.id])
+        return OrderType(row=order, loaders=loaders)
+
+    @staticmethod
+    def from_db_many(orders) -> List["OrderType"]:
+        loaders = get_loaders()
+        return [OrderType.from_db(o, loaders) for o in orders]
 
-def _ensure_product_relations(product: Product, max_links: int = 24):
-    existing_count = session.query(ProductRelation).filter(ProductRelation.product_id == product.id).count()
-    if existing_count >= max_links:
-        return
-
-    candidates = session.query(Product).filter(
-        Product.id != product.id,
-        Product.category == product.category,
-    ).limit(200).all()
-
-    ranked_candidates = []
-    for candidate in candidates:
-        relation_type = _infer_relation_type(product, candidate)
-        if not relation_type:
-            continue
-        ranked_candidates.append((
-            _relation_score(product, candidate),
-            candidate.id,
-            relation_type,
-        ))
-
-    ranked_candidates.sort(key=lambda item: item[0], reverse=True)
-
-    links_added = 0
-    for _, candidate_id, relation_type in ranked_candidates:
-        _insert_relation_pair(product.id, candidate_id, relation_type)
-        links_added += 1
-        if links_added >= max_links:
-            break
-
-    if links_added > 0:
-        session.commit()
 
 # Queries - Read operations
 
@@ -326,35 +534,78 @@ class Query:
     @strawberry.field
     def products(self, searchTerm: str = None, category: str = None, color: str = None, offset: int = None, limit: int = None) -> List[ProductType]:
         # Query products with optional filters and pagination
-        query = session.query(Product)
-        if color or searchTerm:
-            query = query.join(Variant)
-        if category:
-            query = query.filter(Product.category == category)
-        if color:
-            # join the Variant table and filter by color
-            query = query.filter(Variant.color == color)
-        if searchTerm:
-            like_pattern = f"%{searchTerm}%"
-            query = query.filter(
-                or_(
-                    Product.name.ilike(like_pattern),
-                    Product.category.ilike(like_pattern),
-                    Variant.sku.ilike(like_pattern),
-                    Variant.color.ilike(like_pattern),
+        search = product_search_subquery(searchTerm) if searchTerm else None
+        if search is not None:
+            # Full-text index: prefix match on every word, most relevant first
+            query = session.query(Product).join(search, search.c.product_id == Product.id)
+            if category:
+                query = query.filter(Product.category == category)
+            if color:
+                query = query.filter(Product.id.in_(
+                    session.query(Variant.product_id).filter(Variant.color == color)
+                ))
+            query = query.order_by(search.c.rank, Product.id)
+        else:
+            query = session.query(Product)
+            if color or searchTerm:
+                query = query.join(Variant)
+            if category:
+                query = query.filter(Product.category == category)
+            if color:
+                # join the Variant table and filter by color
+                query = query.filter(Variant.color == color)
+            if searchTerm:
+                like_pattern = f"%{searchTerm}%"
+                query = query.filter(
+                    or_(
+                        Product.name.ilike(like_pattern),
+                        Product.category.ilike(like_pattern),
+                        Variant.sku.ilike(like_pattern),
+                        Variant.color.ilike(like_pattern),
+                    )
                 )
-            )
-        query = query.distinct().order_by(Product.id)
+            query = query.distinct().order_by(Product.id)
         if offset:
             query = query.offset(offset)
         if limit:
             query = query.limit(limit)
         products = query.all()
 
+        # Only the matching variants are returned when filtering by color
+        return ProductType.from_db_many(products, variant_color=color)
+    
+    @strawberry.field
+    def products_connection(
+        self,
+        first: int = None,
+        after: Optional[str] = None,
+        category: Optional[str] = None,
+        color: Optional[str] = None,
+    ) -> ProductConnection:
+        # Cursor pagination over products ordered by id (keyset: id > cursor id)
+        size = page_size(first)
+        query = session.query(Product)
+        if category:
+            query = query.filter(Product.category == category)
         if color:
-            for product in products:
-                product.variants = [variant for variant in product.variants if variant.color == color]
-        return [ProductType.from_db(p) for p in products]
+            query = query.filter(Product.id.in_(
+                session.query(Variant.product_id).filter(Variant.color == color)
+            ))
+        count_query = query
+        if after is not None:
+            (after_id,) = decode_cursor(after, 1)
+            query = query.filter(Product.id > after_id)
+        rows = query.order_by(Product.id).limit(size + 1).all()
+
+        products = rows[:size]
+        cursors = [encode_cursor(p.id) for p in products]
+        nodes = ProductType.from_db_many(products, variant_color=color)
+        return ProductConnection(
+            edges=[ProductEdge(cursor=c, node=n) for c, n in zip(cursors, nodes)],
+            pageInfo=_page_info(cursors, len(rows) > size, after),
+            count_key=("products", category, color),
+            count_rows=count_query.count,
+        )
     
     @strawberry.field
     def product(self, id: int) -> ProductType:
@@ -373,7 +624,15 @@ class Query:
         if not db_product:
             return []
 
-        _ensure_product_relations(db_product)
+        # Read-only: missing relations are built by the background job
+        link_count = session.query(ProductRelation.id).filter(ProductRelation.product_id == product_id).count()
+        if link_count < MAX_RELATION_LINKS:
+            relation_jobs.schedule(product_id)
+        if link_count == 0:
+            ranked = rank_relations(db_product, candidate_pool(session, db_product.category))
+            if relation_type:
+                ranked = [(candidate, kind) for candidate, kind in ranked if kind == relation_type.lower()]
+            return ProductType.from_db_many([candidate for candidate, _ in ranked[:limit]])
 
         query = session.query(Product).join(
             ProductRelation,
@@ -384,7 +643,7 @@ class Query:
             query = query.filter(ProductRelation.relation_type == relation_type.lower())
 
         related_products = query.distinct().limit(limit).all()
-        return [ProductType.from_db(product) for product in related_products]
+        return ProductType.from_db_many(related_products)
     
     @strawberry.field
     def user(self, id: int) -> Optional[UserType]:
@@ -433,7 +692,7 @@ class Query:
             query = query.filter(Favorite.removed_at.is_(None))
         favorites = query.all()
         # Convert datetime objects to ISO format strings for JSON serialization
-        return [FavoriteType.from_db(fav) for fav in favorites]
+        return FavoriteType.from_db_many(favorites)
     
     @strawberry.field
     def cart(self, user_id: int) -> Optional[OrderType]:
@@ -456,7 +715,7 @@ class Query:
             Order.user_id == user_id,
             Order.status != "cart"
         ).order_by(Order.created_at.desc()).all()
-        return [OrderType.from_db(order) for order in orders]
+        return OrderType.from_db_many(orders)
     
     @strawberry.field
     def order(self, order_id: int) -> Optional[OrderType]:
@@ -470,54 +729,62 @@ class Query:
         # Uses collaborative filtering to suggest products based on purchase patterns
         from recommendations import get_cart_recommendations
         products = get_cart_recommendations(user_id, limit)
-        return [ProductType.from_db(p) for p in products]
+        return ProductType.from_db_many(products)
+    
+    @strawberry.field
+    def batch_recommendations(self, user_ids: List[int], limit: int = 8) -> List[UserRecommendationsType]:
+        # Recommendations for many users at once, scored against one shared model
+        # Used by pre-warm and email jobs instead of one personalizedRecommendations call per user
+        from recommendations import iter_batch_recommendations
+        loaders = get_loaders()
+        results = []
+        for chunk in iter_batch_recommendations(user_ids, limit):
+            loaders.products.prime(pid for _, product_ids in chunk for pid in product_ids)
+            for user_id, product_ids in chunk:
+                results.append(UserRecommendationsType(
+                    userId=user_id,
+                    products=[
+                        ProductType.from_db(product, loaders)
+                        for product in loaders.products.load_many(product_ids) if product
+                    ]
+                ))
+        return results
+    
+    @strawberry.field
+    def recommendation_cache_stats(self) -> RecommendationCacheStatsType:
+        # Hit/miss counters of the personalized recommendation cache (for sizing it)
+        stats = recommendation_cache.stats()
+        return RecommendationCacheStatsType(
+            hits=stats["hits"],
+            misses=stats["misses"],
+            invalidations=stats["invalidations"],
+            hitRate=stats["hit_rate"],
+            size=stats["size"]
+        )
     
     @strawberry.field
-    def trending(self, hours: int = 48, limit: int = 10) -> List[ProductType]:
+    def trending(self, hours: int = 48, limit: int = 10, decay_half_life_hours: Optional[float] = None) -> List[ProductType]:
         """
-        Get trending products based on cart additions and orders in the last N hours
-        Counts all items added to carts or purchased across all users
+        Get trending products based on cart additions in the last N hours
+        Sums the hourly trending buckets maintained by add_to_cart/checkout_cart
+        Pass decayHalfLifeHours to weight recent hours more heavily
         """
-        from datetime import timedelta
-        from sqlalchemy import func
-        
-        # Calculate cutoff time
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-        
-        # Query: Count cart additions per product in the time window
-        trending_query = (
-            session.query(
-                OrderItem.product_id,
-                func.count(OrderItem.id).label('add_count')
-            )
-            .join(Order)
-            .filter(
-                OrderItem.added_at >= cutoff_time
-                # Count items from both active carts AND completed orders
-                # to reflect true purchasing trends across all users
-            )
-            .group_by(OrderItem.product_id)
-            .order_by(func.count(OrderItem.id).desc())
-            .limit(limit)
-        )
-        
-        # Get product IDs and their counts
-        trending_products = trending_query.all()
+        trending_products = top_trending(session, hours, limit, decay_half_life_hours)
         
         if not trending_products:
             return []
         
         # Fetch full product details
-        product_ids = [p.product_id for p in trending_products]
+        product_ids = [pid for pid, _ in trending_products]
         products = session.query(Product).filter(Product.id.in_(product_ids)).all()
         
-        # Sort products by their trending count
+        # Sort products by their trending score
         product_map = {p.id: p for p in products}
         sorted_products = [
             product_map[pid] for pid, _ in trending_products if pid in product_map
         ]
         
-        return [ProductType.from_db(p) for p in sorted_products]
+        return ProductType.from_db_many(sorted_products)
     
     @strawberry.field
     def personalized_recommendations(self, user_id: int, limit: int = 8) -> List[ProductType]:
@@ -526,7 +793,7 @@ class Query:
         # Falls back to trending/popular products for new users
         from recommendations import get_personalized_recommendations
         products = get_personalized_recommendations(user_id, limit)
-        return [ProductType.from_db(p) for p in products]
+        return ProductType.from_db_many(products)
     
     @strawberry.field
     def reviews(self, product_id: int, limit: int = 20, offset: int = 0) -> List[ReviewType]:
@@ -539,22 +806,35 @@ class Query:
             .offset(offset)
             .all()
         )
-        return [ReviewType.from_db(r) for r in reviews]
+        return ReviewType.from_db_many(reviews)
+    
+    @strawberry.field
+    def reviews_connection(self, product_id: int, first: int = None, after: Optional[str] = None) -> ReviewConnection:
+        # Newest first; the keyset (created_at, id) keeps deep pages as cheap as the first
+        size = page_size(first)
+        query = session.query(Review).filter(Review.product_id == product_id)
+        count_query = query
+        if after is not None:
+            created_at, review_id = decode_cursor(after, 2)
+            query = query.filter(
+                tuple_(Review.created_at, Review.id) < (datetime.fromisoformat(created_at), review_id)
+            )
+        rows = query.order_by(Review.created_at.desc(), Review.id.desc()).limit(size + 1).all()
+
+        reviews = rows[:size]
+        cursors = [encode_cursor(r.created_at.isoformat(), r.id) for r in reviews]
+        return ReviewConnection(
+            edges=[ReviewEdge(cursor=c, node=n) for c, n in zip(cursors, ReviewType.from_db_many(reviews))],
+            pageInfo=_page_info(cursors, len(rows) > size, after),
+            count_key=("reviews", product_id),
+            count_rows=count_query.count,
+        )
     
     @strawberry.field
     def review_stats(self, product_id: int) -> ReviewStatsType:
         # Get review statistics for a product (rating distribution)
-        stats = {
-            1: 0,
-            2: 0,
-            3: 0,
-            4: 0,
-            5: 0
-        }
-        
-        reviews = session.query(Review.rating).filter(Review.product_id == product_id).all()
-        for (rating,) in reviews:
-            stats[rating] = stats.get(rating, 0) + 1
+        # Read from the review_stats histogram maintained by submit_review
+        stats = get_rating_histogram(session, product_id)
         
         return ReviewStatsType(
             rating1=stats[1],
@@ -613,6 +893,7 @@ class Mutation:
             favorite = Favorite(user_id=user_id, product_id=product_id)
             session.add(favorite)
             session.commit()
+            invalidate_user_recommendations(user_id)
             favorite_type = FavoriteType.from_db(favorite)
         
         # Get total count of active favorites
@@ -638,6 +919,7 @@ class Mutation:
         if favorite:
             favorite.removed_at = datetime.utcnow()
             session.commit()
+            invalidate_user_recommendations(user_id)
         
         # Get total count of active favorites
         total_count = session.query(Favorite).filter(
@@ -670,6 +952,9 @@ class Mutation:
             OrderItem.variant_id == variant_id
         ).first()
         
+        # Every add counts towards the product's trending bucket for this hour
+        record_cart_add(session, product_id)
+        
         if existing_item:
             existing_item.quantity += quantity
             session.commit()
@@ -779,8 +1064,14 @@ class Mutation:
         cart.tax = tax
         cart.shipping = shipping
         cart.total = total
-        
+        record_purchases(session, [item.product_id for item in cart.items])
+
         session.commit()
+
+        # Append the purchase to the recommendation interaction store
+        from recommendations import record_checkout
+        record_checkout(cart.user_id, [(item.product_id, item.quantity) for item in cart.items])
+        invalidate_user_recommendations(user_id)
         return OrderType.from_db(cart)
     
     @strawberry.mutation
@@ -811,12 +1102,12 @@ class Mutation:
         ).first() is not None
         
         if existing_review:
-            # Update existing review
+            # Update existing review, moving it between histogram buckets
+            record_rating(session, product_id, rating, previous_rating=existing_review.rating)
             existing_review.rating = rating
             existing_review.title = title
             existing_review.comment = comment
             existing_review.updated_at = datetime.utcnow()
-            session.commit()
             review = existing_review
         else:
             # Create new review
@@ -829,15 +1120,14 @@ class Mutation:
                 verified_purchase=1 if verified_purchase else 0
             )
             session.add(review)
-            session.commit()
+            record_rating(session, product_id, rating)
         
-        # Recalculate product rating average and count
-        all_reviews = session.query(Review).filter(Review.product_id == product_id).all()
+        # Refresh product rating average and count from the histogram, in the same transaction
         product = session.query(Product).get(product_id)
         if product:
-            product.rating_count = len(all_reviews)
-            product.rating_avg = sum(r.rating for r in all_reviews) / len(all_reviews) if all_reviews else 0.0
-            session.commit()
+            product.rating_count, product.rating_avg = get_rating_summary(session, product_id)
+        session.commit()
+        invalidate_user_recommendations(user_id)
         
         return ReviewType.from_db(review)
     
@@ -852,4 +1142,4 @@ class Mutation:
         session.commit()
         return ReviewType.from_db(review)
 
-schema = strawberry.Schema(query=Query, mutation=Mutation)
+schema = strawberry.Schema(query=Query, mutation=Mutation, extensions=[BatchLoaderExtension])
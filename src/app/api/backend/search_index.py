@@ -0,0 +1,146 @@
+"""
+Full-text product search backed by SQLite FTS5
+One row per product (rowid = products.id) holding its name, category and the
+SKUs and colors of its variants. Triggers on products and variants keep the
+index in sync, so writers never have to know it exists.
+
+- ensure_search_index(): create the index and triggers, rebuilding if stale
+- product_search_subquery(term): (product_id, rank) rows matching a search box
+  term, with prefix matching per word; lower rank (BM25) is more relevant
+Falls back to None when FTS5 is unavailable, so callers can keep using ILIKE.
+"""
+
+import re
+import threading
+
+from sqlalchemy import Float, Integer, text
+from sqlalchemy.exc import OperationalError
+
+from instrumentation import get_logger
+from models import engine
+
+logger = get_logger("search_index")
+
+SEARCH_TABLE = "product_search"
+
+# BM25 column weights: name, category, skus, colors
+SEARCH_COLUMN_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+
+
+def _refresh_product_sql(product_id: str) -> str:
+    return f"""
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = {product_id};
+        INSERT INTO {SEARCH_TABLE} (rowid, name, category, skus, colors)
+        SELECT p.id, p.name, p.category,
+               (SELECT group_concat(v.sku, ' ') FROM variants v WHERE v.product_id = p.id),
+               (SELECT group_concat(DISTINCT v.color) FROM variants v WHERE v.product_id = p.id)
+        FROM products p WHERE p.id = {product_id};
+    """
+
+
+_SEARCH_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        name, category, skus, colors,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_search_insert AFTER INSERT ON products BEGIN
+        {_refresh_product_sql('NEW.id')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_search_update AFTER UPDATE OF name, category ON products BEGIN
+        {_refresh_product_sql('NEW.id')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_search_delete AFTER DELETE ON products BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = OLD.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS variants_search_insert AFTER INSERT ON variants BEGIN
+        {_refresh_product_sql('NEW.product_id')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS variants_search_update AFTER UPDATE OF sku, color, product_id ON variants BEGIN
+        {_refresh_product_sql('OLD.product_id')}
+        {_refresh_product_sql('NEW.product_id')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS variants_search_delete AFTER DELETE ON variants BEGIN
+        {_refresh_product_sql('OLD.product_id')}
+    END
+    """,
+]
+
+_available = None
+_lock = threading.Lock()
+
+
+def rebuild_search_index(connection) -> None:
+    """Repopulate the whole index from products and variants."""
+    connection.exec_driver_sql(f"DELETE FROM {SEARCH_TABLE}")
+    connection.exec_driver_sql(f"""
+        INSERT INTO {SEARCH_TABLE} (rowid, name, category, skus, colors)
+        SELECT p.id, p.name, p.category,
+               (SELECT group_concat(v.sku, ' ') FROM variants v WHERE v.product_id = p.id),
+               (SELECT group_concat(DISTINCT v.color) FROM variants v WHERE v.product_id = p.id)
+        FROM products p
+    """)
+
+
+def ensure_search_index() -> bool:
+    """
+    Create the FTS5 table and its triggers if needed and backfill it when it is
+    out of step with products (e.g. after init_db() recreated the tables).
+    Returns False when this SQLite build has no FTS5.
+    """
+    global _available
+    with _lock:
+        if _available is not None:
+            return _available
+        try:
+            with engine.begin() as connection:
+                for statement in _SEARCH_DDL:
+                    connection.exec_driver_sql(statement)
+                indexed = connection.exec_driver_sql(f"SELECT count(*) FROM {SEARCH_TABLE}").scalar()
+                products = connection.exec_driver_sql("SELECT count(*) FROM products").scalar()
+                if indexed != products:
+                    rebuild_search_index(connection)
+            _available = True
+        except OperationalError as e:
+            logger.warning("Full-text search unavailable, falling back to ILIKE: %s", e)
+            _available = False
+        return _available
+
+
+def build_match_query(term: str) -> str:
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    words = re.findall(r"\w+", term.lower())
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def product_search_subquery(term: str):
+    """
+    Subquery of (product_id, rank) for products matching term, or None when the
+    term has no searchable words or FTS5 is unavailable.
+    """
+    match = build_match_query(term or "")
+    if not match or not ensure_search_index():
+        return None
+    weights = ", ".join(str(weight) for weight in SEARCH_COLUMN_WEIGHTS)
+    return (
+        text(
+            f"SELECT rowid AS product_id, bm25({SEARCH_TABLE}, {weights}) AS rank "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match"
+        )
+        .bindparams(match=match)
+        .columns(product_id=Integer, rank=Float)
+        .subquery("product_search_matches")
+    )
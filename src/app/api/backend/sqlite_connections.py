@@ -0,0 +1,144 @@
+"""
+Pooled SQLite connections for the raw-sqlite3 stores
+(data/repo_cache.db for GitHubClient, data/assistant_profiles.db for app.py)
+Connections are kept open in a small bounded pool per database instead of
+connecting per call, so prepared statements stay cached between requests,
+and short-lived request or executor threads do not each leave one behind:
+- SQLiteConnectionManager.connection(): context manager that checks out a
+  connection (WAL, synchronous=NORMAL, busy timeout, statement cache) and
+  returns it to the pool afterwards
+- the schema callback runs once per database per process, on first use
+- get_connection_manager(): the process-wide manager of a database path
+- close_all_connections(): closes every idle pooled connection (run at exit)
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+# Prepared statements kept per connection (sqlite3 default is 128)
+CACHED_STATEMENTS = 256
+
+# How long a writer waits on another connection's lock before failing; also
+# how long a checkout waits for a free connection when the pool is exhausted
+BUSY_TIMEOUT_SECONDS = 5.0
+
+# Open connections per database; SQLite serialises writers, so a few suffice
+POOL_SIZE = 4
+
+
+class SQLiteConnectionManager:
+    def __init__(
+        self,
+        path: str,
+        init_schema: Optional[Callable[[sqlite3.Connection], None]] = None,
+        cached_statements: int = CACHED_STATEMENTS,
+        pool_size: int = POOL_SIZE,
+    ):
+        self.path = path
+        self.cached_statements = cached_statements
+        self.pool_size = pool_size
+        self._init_schema = init_schema
+        self._schema_ready = init_schema is None
+        self._schema_lock = threading.Lock()
+        # LIFO so the most recently used connection (warmest statement cache) goes out first
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._opened = 0
+        self._pool_lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Check out a connection for the with block; use `with conn:` inside for a transaction."""
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            # Never hand the next caller a half-finished transaction
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close_all(self) -> None:
+        """Close every idle connection; connections in use go back to the pool when released."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+            with self._pool_lock:
+                self._opened -= 1
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            open_new = self._opened < self.pool_size
+            if open_new:
+                self._opened += 1
+        if open_new:
+            try:
+                return self._connect()
+            except Exception:
+                with self._pool_lock:
+                    self._opened -= 1
+                raise
+        try:
+            return self._idle.get(timeout=BUSY_TIMEOUT_SECONDS)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"no free connection to {self.path} after {BUSY_TIMEOUT_SECONDS}s"
+            ) from None
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            cached_statements=self.cached_statements,
+            # Pooled connections move between threads, but only one uses a connection at a time
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    with conn:
+                        self._init_schema(conn)
+                    self._schema_ready = True
+        return conn
+
+
+_managers: Dict[str, SQLiteConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_connection_manager(
+    path: str,
+    init_schema: Optional[Callable[[sqlite3.Connection], None]] = None,
+) -> SQLiteConnectionManager:
+    """Shared manager for path; init_schema is only used when the manager is first created."""
+    path = os.path.abspath(path)
+    with _managers_lock:
+        manager = _managers.get(path)
+        if manager is None:
+            manager = _managers[path] = SQLiteConnectionManager(path, init_schema)
+        return manager
+
+
+def close_all_connections() -> None:
+    """Close the pooled connections of every database."""
+    with _managers_lock:
+        managers = list(_managers.values())
+    for manager in managers:
+        manager.close_all()
+
+
+atexit.register(close_all_connections)
@@ -93,7 +93,56 @@ class TestGraphQLAPI:
         assert 'data' in data
         assert 'relatedProducts' in data['data']
         assert isinstance(data['data']['relatedProducts'], list)
-    
+
+    def test_related_products_read_path_never_writes(self, client, db_session):
+        """Test that relatedProducts serves unbuilt relations without writing and schedules the build"""
+        import threading
+        from sqlalchemy import event
+        from models import Product, ProductRelation, engine
+        from product_relations import relation_jobs
+
+        product_id = db_session.query(Product.id).order_by(Product.id.desc()).first()[0]
+        db_session.query(ProductRelation).filter(
+            (ProductRelation.product_id == product_id) | (ProductRelation.related_product_id == product_id)
+        ).delete(synchronize_session=False)
+        db_session.commit()
+
+        request_thread = threading.get_ident()
+        writes = []
+
+        def record_write(conn, cursor, statement, parameters, context, executemany):
+            if threading.get_ident() == request_thread and statement.lstrip().upper().startswith('INSERT'):
+                writes.append(statement)
+
+        query = """
+        query Related($id: Int!) {
+            relatedProducts(productId: $id, limit: 4) {
+                id
+            }
+        }
+        """
+        event.listen(engine, 'before_cursor_execute', record_write)
+        try:
+            response = client.post(
+                '/graphql',
+                json={'query': query, 'variables': {'id': product_id}},
+                content_type='application/json'
+            )
+        finally:
+            event.remove(engine, 'before_cursor_execute', record_write)
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert 'errors' not in data
+        served = [product['id'] for product in data['data']['relatedProducts']]
+        assert 0 < len(served) <= 4
+        assert writes == []
+
+        relation_jobs.join()
+        db_session.rollback()
+        stored = db_session.query(ProductRelation).filter(ProductRelation.product_id == product_id).count()
+        assert stored > 0
+
     def test_query_user(self, client):
         """Test querying a user"""
         query = """
@@ -156,3 +205,251 @@ class TestGraphQLAPI:
         data = response.get_json()
         if response.status_code == 200:
             assert 'errors' in data
+
+    def test_query_batch_recommendations(self, client):
+        """Test recommending for several users in one request"""
+        query = """
+        query {
+            batchRecommendations(userIds: [1, 2], limit: 3) {
+                userId
+                products {
+                    id
+                    name
+                }
+            }
+        }
+        """
+        response = client.post(
+            '/graphql',
+            json={'query': query},
+            content_type='application/json'
+        )
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert 'errors' not in data
+        results = data['data']['batchRecommendations']
+        assert [r['userId'] for r in results] == [1, 2]
+        assert all(len(r['products']) <= 3 for r in results)
+
+    def test_recommendation_metrics_endpoint(self, client):
+        """Test that per-stage recommendation timings are exported"""
+        from instrumentation import reset_stage_histograms
+        from recommendation_cache import invalidate_user_recommendations
+        from recommendations import get_personalized_recommendations, rebuild_item_similarity_model
+        reset_stage_histograms()
+        rebuild_item_similarity_model()
+        invalidate_user_recommendations(1)
+        get_personalized_recommendations(1, limit=3)
+
+        response = client.get('/api/recommendations/metrics')
+
+        assert response.status_code == 200
+        stages = response.get_json()['stages']
+        assert {'matrix_build', 'similarity'} <= set(stages)
+        for histogram in stages.values():
+            assert histogram['count'] > 0
+            assert histogram['buckets'][-1]['le'] == '+Inf'
+            assert histogram['buckets'][-1]['count'] == histogram['count']
+
+    def test_product_page_loads_variants_in_one_query(self, client):
+        """Test that variants for a page of products are batched into one IN query"""
+        from sqlalchemy import event
+        from models import engine
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        query = """
+        query {
+            products(limit: 50) {
+                id
+                variants {
+                    id
+                    color
+                }
+            }
+        }
+        """
+        event.listen(engine, 'before_cursor_execute', count_statement)
+        try:
+            response = client.post(
+                '/graphql',
+                json={'query': query},
+                content_type='application/json'
+            )
+        finally:
+            event.remove(engine, 'before_cursor_execute', count_statement)
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert 'errors' not in data
+        assert len(data['data']['products']) == 50
+        assert all(product['variants'] for product in data['data']['products'])
+        assert len([s for s in statements if 'FROM variants' in s]) == 1
+        assert len(statements) == 2
+
+    def test_unselected_variants_are_never_loaded(self, client):
+        """Test that a listing that does not select variants never queries them"""
+        from sqlalchemy import event
+        from models import engine
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        query = """
+        query {
+            products(limit: 50) {
+                id
+                name
+                price
+            }
+        }
+        """
+        event.listen(engine, 'before_cursor_execute', count_statement)
+        try:
+            response = client.post(
+                '/graphql',
+                json={'query': query},
+                content_type='application/json'
+            )
+        finally:
+            event.remove(engine, 'before_cursor_execute', count_statement)
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert 'errors' not in data
+        assert set(data['data']['products'][0]) == {'id', 'name', 'price'}
+        assert not [s for s in statements if 'FROM variants' in s]
+        assert len(statements) == 1
+
+    def test_search_ranks_prefix_matches_by_relevance(self, client):
+        """Test that searchTerm uses prefix matching and orders by relevance"""
+        query = """
+        query {
+            products(searchTerm: "cott", limit: 5) {
+                id
+                name
+            }
+        }
+        """
+        response = client.post(
+            '/graphql',
+            json={'query': query},
+            content_type='application/json'
+        )
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert 'errors' not in data
+        products = data['data']['products']
+        assert products
+        assert all('cotton' in p['name'].lower() for p in products)
+
+    def test_search_index_follows_product_updates(self, db_session):
+        """Test that triggers keep the search index in sync with product rows"""
+        from models import Product
+        from schema import schema
+
+        product = db_session.query(Product).first()
+        product.name = 'Zebrawood Desk Organizer'
+        db_session.flush()
+
+        result = schema.execute_sync('{ products(searchTerm: "zebraw") { id } }')
+
+        assert result.errors is None
+        assert result.data['products'] == [{'id': product.id}]
+
+    def test_products_connection_walks_all_pages(self, db_session):
+        """Test that following endCursor visits every product exactly once"""
+        from models import Product
+        from schema import schema
+
+        query = """
+        query($after: String) {
+            productsConnection(first: 40, after: $after) {
+                totalCount
+                pageInfo { hasNextPage endCursor }
+                edges { cursor node { id } }
+            }
+        }
+        """
+        seen, after = [], None
+        while True:
+            result = schema.execute_sync(query, variable_values={'after': after})
+            assert result.errors is None
+            connection = result.data['productsConnection']
+            seen.extend(edge['node']['id'] for edge in connection['edges'])
+            if not connection['pageInfo']['hasNextPage']:
+                break
+            after = connection['pageInfo']['endCursor']
+
+        expected = [p.id for p in db_session.query(Product).order_by(Product.id)]
+        assert seen == expected
+        assert connection['totalCount'] == len(expected)
+
+    def test_reviews_connection_orders_ties_by_id(self, db_session):
+        """Test review pages newest first, with equal timestamps split by id"""
+        from datetime import datetime
+        from models import Product, Review, User
+        from schema import schema
+
+        product = db_session.query(Product).first()
+        user = db_session.query(User).first()
+        created_at = datetime(2026, 1, 1, 12, 0, 0)
+        reviews = [
+            Review(product_id=product.id, user_id=user.id, rating=4, created_at=created_at)
+            for _ in range(5)
+        ]
+        db_session.add_all(reviews)
+        db_session.flush()
+
+        query = """
+        query($productId: Int!, $after: String) {
+            reviewsConnection(productId: $productId, first: 2, after: $after) {
+                totalCount
+                pageInfo { hasNextPage endCursor }
+                edges { node { id } }
+            }
+        }
+        """
+        seen, after = [], None
+        while True:
+            result = schema.execute_sync(query, variable_values={'productId': product.id, 'after': after})
+            assert result.errors is None
+            connection = result.data['reviewsConnection']
+            seen.extend(edge['node']['id'] for edge in connection['edges'])
+            if not connection['pageInfo']['hasNextPage']:
+                break
+            after = connection['pageInfo']['endCursor']
+
+        assert seen == sorted((r.id for r in reviews), reverse=True)
+        assert connection['totalCount'] == 5
+
+        result = schema.execute_sync(query, variable_values={'productId': product.id, 'after': 'not-a-cursor'})
+        assert result.errors and 'Invalid cursor' in result.errors[0].message
+
+    def test_concurrent_requests_use_their_own_sessions(self, app):
+        """Test that parallel requests each get (and release) a thread-local session"""
+        from concurrent.futures import ThreadPoolExecutor
+        from models import session
+
+        query = '{ products(limit: 10) { id variants { id } } }'
+
+        def run(_):
+            client = app.test_client()
+            response = client.post('/graphql', json={'query': query}, content_type='application/json')
+            return response.status_code, response.get_json(), session.registry.has()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(run, range(32)))
+
+        for status_code, data, session_left_open in results:
+            assert status_code == 200
+            assert 'errors' not in data
+            assert len(data['data']['products']) == 10
+            assert not session_left_open
@@ -0,0 +1,334 @@
+"""
+Tests for the GitHub client against a local stub of the REST API
+Run with: pytest test_github_client.py -v
+"""
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from github_client import GitHubClient, build_http_session
+
+
+class StubGitHub:
+    """Paginated /pulls, /branches and /commits for one repository"""
+
+    def __init__(self, pull_count=250, branch_count=120, commit_count=150):
+        self.pulls = [self.make_pull(number, merged=bool(number % 2)) for number in range(1, pull_count + 1)]
+        self.branches = [{"name": f"branch-{n}"} for n in range(branch_count)]
+        self.commits = [{"sha": f"{n:040d}"} for n in range(commit_count)]
+        self.rate_limit_remaining = 4999
+        self.transient_failures = 0
+        # Retry-After values of the next responses, each answered with a 429
+        self.rate_limited = []
+        self.requests = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_pull(number, merged, updated_minute=None):
+        updated_minute = number if updated_minute is None else updated_minute
+        return {
+            "number": number,
+            "head": {"ref": f"feature-{number}"},
+            "created_at": "2030-01-01T00:00:00Z",
+            "updated_at": f"2030-01-02T{updated_minute // 60:02d}:{updated_minute % 60:02d}:00Z",
+            "merged_at": "2030-01-01T06:00:00Z" if merged else None,
+        }
+
+    def handle(self, handler: BaseHTTPRequestHandler) -> None:
+        parsed = urlparse(handler.path)
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        with self._lock:
+            failing = self.transient_failures > 0
+            self.transient_failures -= failing
+            retry_after = self.rate_limited.pop(0) if self.rate_limited else None
+        if failing:
+            handler.send_response(502)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+        if retry_after is not None:
+            handler.send_response(429)
+            handler.send_header("Retry-After", str(retry_after))
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+
+        endpoint = parsed.path.rsplit("/", 1)[-1]
+        items = {"pulls": self.pulls, "branches": self.branches, "commits": self.commits}[endpoint]
+        if endpoint == "pulls":
+            items = sorted(items, key=lambda pr: pr["updated_at"], reverse=True)
+        per_page = int(query.get("per_page", 30))
+        page = int(query.get("page", 1))
+        last_page = max((len(items) + per_page - 1) // per_page, 1)
+        body = json.dumps(items[(page - 1) * per_page:page * per_page]).encode()
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        not_modified = handler.headers.get("If-None-Match") == etag
+        with self._lock:
+            self.requests.append((parsed.path, query, 304 if not_modified else 200))
+
+        if not_modified:
+            handler.send_response(304)
+            handler.send_header("ETag", etag)
+            handler.end_headers()
+            return
+
+        handler.send_response(200)
+        handler.send_header("ETag", etag)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.send_header("X-RateLimit-Remaining", str(self.rate_limit_remaining))
+        handler.send_header("X-RateLimit-Reset", "0")
+        links = []
+        base = f"http://{handler.headers['Host']}{parsed.path}"
+        if page < last_page:
+            links.append(f'<{base}?{_query(query, page + 1)}>; rel="next"')
+            links.append(f'<{base}?{_query(query, last_page)}>; rel="last"')
+        if links:
+            handler.send_header("Link", ", ".join(links))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def requests_for(self, endpoint, status=None):
+        return [
+            query for path, query, code in self.requests
+            if path.endswith(endpoint) and status in (None, code)
+        ]
+
+
+def _query(query, page):
+    return "&".join(f"{key}={value}" for key, value in {**query, "page": page}.items())
+
+
+@pytest.fixture
+def github_stub():
+    stub = StubGitHub()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            stub.handle(self)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    stub.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield stub
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def github_client(github_stub, tmp_path):
+    client = GitHubClient("test-token", db_path=str(tmp_path / "repo_cache.db"))
+    client.base_url = github_stub.base_url
+    return client
+
+
+def test_repository_stats_follow_every_page(github_client, github_stub):
+    """Test that PRs and branches are read across all Link pages and merged PRs are stored"""
+    stats = github_client.fetch_repository_stats("octo/repo", use_cache=False)
+
+    assert sorted(pr["number"] for pr in stats["pull_requests"]) == list(range(1, 251))
+    assert len(stats["branches"]) == 120
+    assert len(stats["commits"]) == 100
+    assert sorted(int(q.get("page", 1)) for q in github_stub.requests_for("/pulls")) == [1, 2, 3]
+    assert len(github_stub.requests_for("/commits")) == 1
+
+    history = github_client.get_historical_tasks("octo/repo")
+    assert len(history) == 125
+    assert stats["metrics"]["total_merged_prs"] == 125
+
+
+def test_pagination_respects_rate_limit_budget(github_client, github_stub):
+    """Test that the page fan-out never exceeds the remaining rate-limit budget"""
+    github_stub.rate_limit_remaining = 1
+
+    pulls = github_client._fetch_pull_requests("octo/repo")
+
+    assert len(pulls) == 200
+    assert len(github_stub.requests_for("/pulls")) == 2
+    assert github_client._get_sync_state("octo/repo", "pulls") == {}
+
+
+def test_throttled_sync_is_backfilled_by_the_next_one(github_client, github_stub):
+    """Test that PRs skipped for lack of rate-limit budget are fetched once the budget recovers"""
+    github_stub.rate_limit_remaining = 1
+    throttled = github_client.fetch_repository_stats("octo/repo", use_cache=False)
+    assert len(throttled["pull_requests"]) == 200
+
+    github_stub.rate_limit_remaining = 4999
+    stats = github_client.fetch_repository_stats("octo/repo", use_cache=False)
+    assert sorted(pr["number"] for pr in stats["pull_requests"]) == list(range(1, 251))
+    assert len(github_client.get_historical_tasks("octo/repo")) == 125
+
+
+def test_pull_request_sync_holds_no_write_lock_while_paging(github_client, github_stub, monkeypatch):
+    """Test that other writers are not blocked while PR pages download, and every merged PR is stored"""
+    fetch_page = github_client._get
+    concurrent_writes = []
+
+    def get_and_write_elsewhere(url, params=None, headers=None):
+        response = fetch_page(url, params=params, headers=headers)
+        writer = threading.Thread(
+            target=lambda: concurrent_writes.append(
+                github_client._save_sync_state("octo/other", "pulls", response)
+            )
+        )
+        writer.start()
+        writer.join(timeout=1)
+        assert not writer.is_alive()
+        return response
+
+    monkeypatch.setattr(github_client, "_get", get_and_write_elsewhere)
+    github_client._fetch_pull_requests("octo/repo")
+
+    assert len(concurrent_writes) == len(github_stub.requests_for("/pulls")) == 3
+    assert len(github_client.get_historical_tasks("octo/repo")) == 125
+
+
+def test_incremental_sync_uses_conditional_requests(github_client, github_stub):
+    """Test that an unchanged repo costs only 304s and a changed one only fetches updated PRs"""
+    github_client.fetch_repository_stats("octo/repo", use_cache=False)
+    full_requests = len(github_stub.requests)
+
+    unchanged = github_client.fetch_repository_stats("octo/repo", use_cache=False)
+    resync = github_stub.requests[full_requests:]
+    # 120 branches span two pages, so they are refetched instead of trusting page 1's 304
+    assert sorted((path.rsplit("/", 1)[-1], status) for path, _, status in resync) == [
+        ("branches", 200), ("branches", 200), ("commits", 304), ("pulls", 304),
+    ]
+    assert len(unchanged["pull_requests"]) == 250
+
+    # PR 2 gets merged and PR 251 is opened and merged
+    github_stub.pulls[1] = github_stub.make_pull(2, merged=True, updated_minute=600)
+    github_stub.pulls.append(github_stub.make_pull(251, merged=True, updated_minute=601))
+    github_stub.requests.clear()
+
+    stats = github_client.fetch_repository_stats("octo/repo", use_cache=False)
+    assert github_stub.requests_for("/pulls") == [github_stub.requests_for("/pulls", 200)[0]]
+    assert len(stats["pull_requests"]) == 251
+    assert stats["metrics"]["total_merged_prs"] == 127
+    assert len(github_client.get_historical_tasks("octo/repo")) == 127
+    assert github_client._get_sync_state("octo/repo", "pulls")["high_water_mark"] == "2030-01-02T10:01:00Z"
+
+
+def test_clients_share_a_retrying_http_session(github_stub, tmp_path):
+    """Test that clients reuse one pooled session and transient 5xx responses are retried"""
+    from urllib3.util.retry import Retry
+
+    first = GitHubClient("token-a", db_path=str(tmp_path / "a.db"))
+    second = GitHubClient("token-b", db_path=str(tmp_path / "b.db"))
+    assert first.http_session is second.http_session
+
+    fast_retry = Retry(total=2, backoff_factor=0, status_forcelist=(502,), raise_on_status=False)
+    client = GitHubClient("test-token", db_path=str(tmp_path / "c.db"), http_session=build_http_session(retry=fast_retry))
+    client.base_url = github_stub.base_url
+    github_stub.transient_failures = 2
+
+    commits = client._fetch_recent_commits("octo/repo")
+    assert len(commits) == 100
+
+
+def test_rate_limit_waits_are_capped(github_client, github_stub, monkeypatch):
+    """Test that a short Retry-After is waited out and a long one fails fast instead of sleeping"""
+    sleeps = []
+    monkeypatch.setattr("time.sleep", sleeps.append)
+
+    github_stub.rate_limited = [2]
+    assert len(github_client._fetch_recent_commits("octo/repo")) == 100
+    assert sleeps == [2.0]
+
+    sleeps.clear()
+    github_stub.rate_limited = [3600]
+    with pytest.raises(requests.HTTPError) as excinfo:
+        github_client._fetch_recent_commits("octo/repo")
+    assert excinfo.value.response.status_code == 429
+    assert sleeps == []
+
+
+def test_retry_after_accepts_http_dates(github_client, github_stub, monkeypatch):
+    """Test that an HTTP-date Retry-After is waited out and an unparsable one raises HTTPError"""
+    from email.utils import format_datetime
+    from datetime import datetime, timedelta, timezone
+
+    sleeps = []
+    monkeypatch.setattr("time.sleep", sleeps.append)
+
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    github_stub.rate_limited = [format_datetime(retry_at, usegmt=True)]
+    assert len(github_client._fetch_recent_commits("octo/repo")) == 100
+    assert len(sleeps) == 1 and 25 < sleeps[0] <= 30
+
+    github_stub.rate_limited = ["soon"]
+    with pytest.raises(requests.HTTPError) as excinfo:
+        github_client._fetch_recent_commits("octo/repo")
+    assert excinfo.value.response.status_code == 429
+
+
+def test_clients_share_a_bounded_connection_pool(tmp_path):
+    """Test that clients share one pool per database, reused across threads and never above its size"""
+    from concurrent.futures import ThreadPoolExecutor
+    from sqlite_connections import POOL_SIZE, get_connection_manager
+
+    schema_runs = []
+    path = str(tmp_path / "shared.db")
+    manager = get_connection_manager(
+        path, lambda conn: schema_runs.append(GitHubClient._create_schema(conn))
+    )
+    first = GitHubClient("token-a", db_path=path)
+    second = GitHubClient("token-b", db_path=path)
+    assert first._db is second._db is manager
+
+    with first._db.connection() as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with second._db.connection() as reused:
+        assert reused is connection
+
+    other_thread = []
+    thread = threading.Thread(target=lambda: other_thread.append(first.get_historical_tasks("octo/repo")))
+    thread.start()
+    thread.join()
+    assert other_thread == [[]]
+
+    def query(_):
+        with manager.connection() as conn:
+            return id(conn), conn.execute("SELECT COUNT(*) FROM sync_state").fetchone()[0]
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(query, range(200)))
+    assert len({conn_id for conn_id, _ in results}) <= POOL_SIZE
+    assert manager._opened <= POOL_SIZE
+    assert len(schema_runs) == 1
+
+    with manager.connection() as conn:
+        conn.execute("INSERT INTO repo_cache (repo_name, data) VALUES ('octo/left-open', '{}')")
+    with manager.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM repo_cache").fetchone()[0] == 0
+
+    manager.close_all()
+    assert manager._opened == 0
+    assert first.get_historical_tasks("octo/repo") == []
+
+
+def test_branch_list_picks_up_branches_beyond_the_first_page(github_client, github_stub):
+    """Test that a branch added on a later page is seen, and a one-page list syncs with a 304"""
+    github_client.fetch_repository_stats("octo/repo", use_cache=False)
+    github_stub.branches.append({"name": "zz-new-branch"})
+
+    stats = github_client.fetch_repository_stats("octo/repo", use_cache=False)
+    assert stats["branches"][-1] == {"name": "zz-new-branch"}
+
+    github_stub.branches[:] = github_stub.branches[:10]
+    github_client.fetch_repository_stats("octo/repo", use_cache=False)
+    github_stub.requests.clear()
+    stats = github_client.fetch_repository_stats("octo/repo", use_cache=False)
+    assert len(stats["branches"]) == 10
+    assert github_stub.requests_for("/branches") == github_stub.requests_for("/branches", 304)
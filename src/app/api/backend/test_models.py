@@ -97,3 +97,64 @@ class TestFavoriteModel:
         
         for fav in active_favorites:
             assert fav.removed_at is None
+
+
+class TestSqliteEngineProfile:
+    """Test the configurable SQLite engine profiles"""
+
+    def _pragmas(self, engine):
+        with engine.connect() as connection:
+            return {
+                name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in ("journal_mode", "synchronous", "cache_size", "mmap_size", "busy_timeout")
+            }
+
+    def test_production_profile_applies_pragmas(self, tmp_path):
+        """Test that the production profile enables WAL and the tuned settings"""
+        from models import create_sqlite_engine
+
+        engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'tuned.db'}", "production")
+        pragmas = self._pragmas(engine)
+        engine.dispose()
+
+        assert pragmas["journal_mode"] == "wal"
+        assert pragmas["synchronous"] == 1  # NORMAL
+        assert pragmas["cache_size"] == -64 * 1024
+        assert pragmas["mmap_size"] == 256 * 1024 * 1024
+        assert pragmas["busy_timeout"] == 5000
+
+    def test_environment_overrides_profile(self, tmp_path, monkeypatch):
+        """Test that SQLITE_* variables override individual profile values"""
+        from models import create_sqlite_engine
+
+        monkeypatch.setenv("SQLITE_CACHE_SIZE_KB", "2048")
+        monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "250")
+        engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'override.db'}", "production")
+        pragmas = self._pragmas(engine)
+        engine.dispose()
+
+        assert pragmas["cache_size"] == -2048
+        assert pragmas["busy_timeout"] == 250
+
+        with pytest.raises(ValueError):
+            create_sqlite_engine(f"sqlite:///{tmp_path / 'bad.db'}", "turbo")
+
+
+class TestIndexMigration:
+    """Test the migration path for indexes declared on the models"""
+
+    def test_ensure_indexes_creates_only_missing_indexes(self, tmp_path):
+        """Test that indexes missing from an existing database are added once"""
+        from sqlalchemy import create_engine, inspect
+        from models import Base, ensure_indexes
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+        Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.exec_driver_sql("DROP INDEX ix_orders_user_id_status")
+            connection.exec_driver_sql("DROP INDEX ix_reviews_product_id_created_at_id")
+
+        assert sorted(ensure_indexes(engine)) == ["ix_orders_user_id_status", "ix_reviews_product_id_created_at_id"]
+        assert ensure_indexes(engine) == []
+        assert "ix_orders_user_id_status" in {i["name"] for i in inspect(engine).get_indexes("orders")}
+        engine.dispose()
@@ -127,3 +127,293 @@ def test_collaborative_filtering_components(db_session):
         similarity = calculate_item_similarity(matrix)
         assert not similarity.empty
         assert similarity.shape[0] == similarity.shape[1]  # Should be square matrix
+
+
+def test_item_similarity_model_is_versioned_and_reused(db_session):
+    """Test that request handlers share one prebuilt model until it is rebuilt"""
+    import recommendations
+
+    first = recommendations.rebuild_item_similarity_model()
+    assert recommendations.get_item_similarity_model() is first
+
+    second = recommendations.rebuild_item_similarity_model()
+    assert second.version == first.version + 1
+    assert recommendations.get_item_similarity_model() is second
+
+
+def test_content_feature_store_matches_full_matrix(db_session):
+    """Test that per-column content similarities match the full TF-IDF matrix"""
+    from recommendations import build_content_similarity_matrix, content_feature_store
+
+    product_ids = [p.id for p in session.query(Product).limit(3).all()]
+    full = build_content_similarity_matrix()
+    columns = content_feature_store.similarities_for(product_ids)
+
+    assert list(columns.columns) == product_ids
+    assert abs(full[product_ids].loc[columns.index].values - columns.values).max() < 1e-9
+
+
+def test_neighbour_index_keeps_top_k_of_dense_similarity():
+    """Test that the sparse neighbour index matches the dense similarity ranking"""
+    import numpy as np
+    import pandas as pd
+    from recommendations import build_item_neighbour_index
+
+    rng = np.random.default_rng(7)
+    matrix = pd.DataFrame(rng.integers(0, 3, (20, 15)), columns=range(100, 115))
+    dense = calculate_item_similarity(matrix)
+    index = build_item_neighbour_index(matrix, k=4)
+
+    neighbour_ids, scores = index.neighbours(103)
+    expected = dense[103].drop(103).sort_values(ascending=False)[:4]
+    assert neighbour_ids.dtype == np.int32 and scores.dtype == np.float32
+    assert list(neighbour_ids) == list(expected.index)
+    assert np.allclose(scores, expected.values, atol=1e-6)
+
+
+def test_lsh_content_neighbours_agree_with_exact(db_session):
+    """Test that the LSH engine returns exact scores for neighbours it finds"""
+    import numpy as np
+    from recommendations import content_feature_store
+
+    product_ids = [p.id for p in session.query(Product).limit(5).all()]
+    exact = content_feature_store.neighbours_for(product_ids, k=10, engine='exact')
+    approximate = content_feature_store.neighbours_for(product_ids, k=10, engine='lsh')
+
+    found = expected = 0
+    for product_id in product_ids:
+        exact_ids, exact_scores = exact.neighbours(product_id)
+        approx_ids, approx_scores = approximate.neighbours(product_id)
+        assert product_id not in approx_ids
+        assert list(approx_scores) == sorted(approx_scores, reverse=True)
+        exact_lookup = dict(zip(exact_ids, exact_scores))
+        for neighbour_id, score in zip(approx_ids, approx_scores):
+            if neighbour_id in exact_lookup:
+                assert np.isclose(score, exact_lookup[neighbour_id], atol=1e-5)
+        found += len(set(approx_ids) & set(exact_ids))
+        expected += len(exact_ids)
+
+    assert found >= 0.5 * expected
+
+    with pytest.raises(ValueError):
+        content_feature_store.neighbours_for(product_ids, engine='hnsw')
+
+
+def test_interaction_store_records_checkouts_incrementally(db_session):
+    """Test that checked-out carts are appended without rescanning orders"""
+    from interaction_store import InteractionStore
+
+    store = InteractionStore()
+    store.rebuild_from_db()
+    baseline = store.to_dataframe()
+
+    store.record_order(987654, [(1, 2), (2, 1), (1, 1)])
+
+    assert sorted(store.products_for_user(987654)) == [1, 2]
+    matrix = store.to_dataframe()
+    assert matrix.loc[987654, 1] == 3
+    assert matrix.shape[0] == baseline.shape[0] + 1
+
+
+def test_personalized_recommendations_are_cached_until_invalidated(db_session):
+    """Test that repeated homepage loads hit the cache and favorites invalidate it"""
+    from recommendation_cache import recommendation_cache, invalidate_user_recommendations
+
+    user = session.query(User).first()
+    invalidate_user_recommendations(user.id)
+    hits_before = recommendation_cache.hits
+
+    first = get_personalized_recommendations(user.id, limit=4)
+    second = get_personalized_recommendations(user.id, limit=3)
+    assert recommendation_cache.hits == hits_before + 1
+    assert [p.id for p in second] == [p.id for p in first][:3]
+
+    invalidate_user_recommendations(user.id)
+    get_personalized_recommendations(user.id, limit=3)
+    assert recommendation_cache.hits == hits_before + 1
+
+
+def test_vectorised_quality_factors_match_scalar():
+    """Test that the array quality factor keeps the scalar piecewise behaviour"""
+    from recommendations import calculate_rating_quality_factor, calculate_rating_quality_factors
+
+    cases = [
+        (0.0, 0), (5.0, 3), (5.0, 10), (4.5, 20), (4.0, 10), (3.5, 10), (3.2, 10), (1.0, 5), (1.0, 100),
+        (0.0, 4), (0.0, 10), (0.5, 50),
+    ]
+    expected = [calculate_rating_quality_factor(avg, count) for avg, count in cases]
+    actual = calculate_rating_quality_factors([avg for avg, _ in cases], [count for _, count in cases])
+
+    assert list(actual) == expected
+    # Sub-1-star averages are treated as 1 star instead of failing the square root
+    assert calculate_rating_quality_factor(0.0, 4) == 1.0
+    assert calculate_rating_quality_factor(0.0, 10) == calculate_rating_quality_factor(1.0, 10)
+
+
+def test_quality_factor_store_follows_rating_changes(db_session):
+    """Test that the precomputed quality column updates when a product's rating changes"""
+    from recommendations import calculate_rating_quality_factor, quality_factor_store
+
+    product = session.query(Product).first()
+    original = (product.rating_avg, product.rating_count)
+    quality_factor_store.load()
+    try:
+        product.rating_avg, product.rating_count = 1.5, 40
+        session.commit()
+        assert quality_factor_store.factors_for([product.id])[0] == calculate_rating_quality_factor(1.5, 40)
+    finally:
+        product.rating_avg, product.rating_count = original
+        session.commit()
+
+
+def test_quality_factor_store_ignores_rolled_back_ratings(db_session):
+    """Test that a rating flushed but rolled back never reaches the quality factors"""
+    from recommendations import quality_factor_store
+
+    product = session.query(Product).first()
+    quality_factor_store.load()
+    before = quality_factor_store.factors_for([product.id])[0]
+
+    product.rating_avg, product.rating_count = 1.5, 40
+    session.flush()
+    session.rollback()
+    assert quality_factor_store.factors_for([product.id])[0] == before
+
+    session.commit()
+    assert quality_factor_store.factors_for([product.id])[0] == before
+
+
+def test_trending_buckets_sum_window_and_decay(db_session):
+    """Test that trending sums hourly buckets in the window, with optional decay"""
+    from datetime import datetime
+    from trending_store import record_cart_add, record_purchases, top_trending
+
+    product_a, product_b = [p.id for p in db_session.query(Product).order_by(Product.id).limit(2)]
+    now = datetime(2030, 1, 1, 12, 30)
+    for _ in range(3):
+        record_cart_add(db_session, product_a, at=datetime(2030, 1, 1, 9, 15))
+    record_cart_add(db_session, product_b, at=datetime(2030, 1, 1, 12, 5))
+    record_cart_add(db_session, product_b, at=datetime(2030, 1, 1, 12, 10))
+    record_cart_add(db_session, product_b, at=datetime(2029, 12, 30, 12, 0))  # outside the window
+    record_purchases(db_session, [product_a, product_b], at=datetime(2030, 1, 1, 12, 20))
+
+    assert top_trending(db_session, hours=4, limit=5, now=now) == [(product_a, 3.0), (product_b, 2.0)]
+    assert [pid for pid, _ in top_trending(db_session, hours=4, limit=1, now=now)] == [product_a]
+
+    # A 1 hour half-life leaves 3 adds from 3 hours ago worth 3/8
+    decayed = top_trending(db_session, hours=4, limit=5, half_life_hours=1, now=now)
+    assert decayed == [(product_b, 2.0), (product_a, 3 / 8)]
+
+
+def test_review_stats_track_new_and_edited_reviews(db_session):
+    """Test that the rating histogram follows new and edited reviews without rescanning"""
+    from review_stats import get_rating_histogram, get_rating_summary, record_rating
+
+    product = db_session.query(Product).order_by(Product.id.desc()).first()
+    before_count, before_avg = get_rating_summary(db_session, product.id)
+    before = get_rating_histogram(db_session, product.id)
+
+    record_rating(db_session, product.id, 5)
+    record_rating(db_session, product.id, 2)
+    record_rating(db_session, product.id, 4, previous_rating=2)
+
+    histogram = get_rating_histogram(db_session, product.id)
+    assert histogram[5] == before[5] + 1
+    assert histogram[4] == before[4] + 1
+    assert histogram[2] == before[2]
+
+    count, avg = get_rating_summary(db_session, product.id)
+    assert count == before_count + 2
+    assert avg == pytest.approx((before_avg * before_count + 9) / count)
+
+
+def test_relation_materialisation_is_batched_and_idempotent(db_session):
+    """Test that materialising relations writes reciprocal pairs once and tolerates reruns"""
+    from models import ProductRelation
+    from product_relations import materialize_product_relations
+
+    product_ids = [pid for (pid,) in db_session.query(Product.id).order_by(Product.id.desc()).limit(3)]
+    involving = (ProductRelation.product_id.in_(product_ids)) | (ProductRelation.related_product_id.in_(product_ids))
+    db_session.query(ProductRelation).filter(involving).delete(synchronize_session=False)
+    db_session.commit()
+
+    assert materialize_product_relations(db_session, product_ids, max_links=5) > 0
+    pairs = set(db_session.query(ProductRelation.product_id, ProductRelation.related_product_id).filter(involving))
+    for product_id in product_ids:
+        related = {rid for pid, rid in pairs if pid == product_id}
+        assert 0 < len(related) <= 5 + len(product_ids) - 1
+        assert product_id not in related
+        assert all((rid, product_id) in pairs for rid in related)
+
+    # Every product now has enough links, so a rerun has nothing to do
+    assert materialize_product_relations(db_session, product_ids, max_links=5) == 0
+    assert db_session.query(ProductRelation).filter(involving).count() == len(pairs)
+
+
+def test_content_store_applies_concurrent_updates_once(db_session):
+    """Test that concurrent readers applying dirty products keep every product exactly once"""
+    import threading
+    from recommendations import ContentFeatureStore
+
+    store = ContentFeatureStore()
+    store.rebuild()
+    product_ids = [p.id for p in db_session.query(Product).order_by(Product.id).limit(20)]
+
+    barrier = threading.Barrier(8)
+
+    def reader(index):
+        store.mark_dirty(product_ids[index::8])
+        barrier.wait()
+        store.similarities_for(product_ids[:1])
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = store._current_snapshot()
+    assert len(snapshot.product_ids) == len(set(snapshot.product_ids)) == db_session.query(Product).count()
+    assert not store._dirty_product_ids
+
+
+def test_neighbour_index_chunks_follow_memory_budget():
+    """Test that budget-sized chunks shrink with catalog size and give the same neighbours"""
+    import numpy as np
+    from neighbour_index import BUILD_BYTES_PER_SCORE, NeighbourIndex, build_chunk_size
+
+    assert build_chunk_size(100_000) * 100_000 * BUILD_BYTES_PER_SCORE <= 128 * 1024 * 1024
+    assert build_chunk_size(10 ** 9) == 1
+
+    rng = np.random.default_rng(3)
+    vectors = rng.random((40, 12))
+    product_ids = range(500, 540)
+    small_chunks = NeighbourIndex.from_vectors(product_ids, vectors, k=5, chunk_size=build_chunk_size(40, 40 * 24 * 3))
+    one_chunk = NeighbourIndex.from_vectors(product_ids, vectors, k=5, chunk_size=40)
+
+    assert np.array_equal(small_chunks.indptr, one_chunk.indptr)
+    assert np.array_equal(small_chunks.neighbour_ids, one_chunk.neighbour_ids)
+    assert np.allclose(small_chunks.scores, one_chunk.scores)
+
+
+def test_cold_interaction_store_counts_committed_order_once(db_session):
+    """Test that recording an order on an unloaded store does not add the committed order twice"""
+    from interaction_store import InteractionStore
+
+    user = db_session.query(User).first()
+    product = db_session.query(Product).first()
+    order = Order(user_id=user.id, status="delivered")
+    db_session.add(order)
+    db_session.flush()
+    db_session.add(OrderItem(
+        order_id=order.id, product_id=product.id, variant_id=product.variants[0].id, quantity=2,
+        price=product.price, product_name=product.name, color="c", size="s",
+    ))
+    db_session.commit()
+
+    expected = InteractionStore()
+    expected.rebuild_from_db()
+    cold = InteractionStore()
+    cold.record_order(user.id, [(product.id, 2)])
+
+    assert cold.to_dataframe().loc[user.id, product.id] == expected.to_dataframe().loc[user.id, product.id]
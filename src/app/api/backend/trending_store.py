@@ -0,0 +1,134 @@
+"""
+Time-bucketed trending counters
+Keeps hourly per-product cart-add and purchase counts in trending_buckets, so
+the trending query reads a handful of small buckets instead of grouping every
+order item in the window:
+- record_cart_add() / record_purchases(): upsert into the current hour's bucket
+  inside the caller's transaction
+- top_trending(): sum of the buckets in the window (optionally exponentially
+  decayed) and a heap top-K
+- backfill_trending(): rebuild all buckets from order history
+"""
+
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+
+from models import Order, OrderItem, TrendingBucket
+
+# Score contribution of a purchase on top of the cart add that preceded it.
+# 0 keeps the ranking the GROUP BY query produced (cart additions only).
+TRENDING_PURCHASE_WEIGHT = 0.0
+
+
+def bucket_start(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def _increment(db_session, counts: Dict[int, int], column: str, at: datetime) -> None:
+    if not counts:
+        return
+    rows = [
+        {"product_id": product_id, "bucket_start": bucket_start(at), "cart_adds": 0, "purchases": 0, column: count}
+        for product_id, count in counts.items()
+    ]
+    statement = insert(TrendingBucket).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[TrendingBucket.product_id, TrendingBucket.bucket_start],
+        set_={column: getattr(TrendingBucket, column) + getattr(statement.excluded, column)},
+    )
+    db_session.execute(statement)
+
+
+def record_cart_add(db_session, product_id: int, at: Optional[datetime] = None) -> None:
+    """Count one add-to-cart of product_id in the current hour (not committed)."""
+    _increment(db_session, {product_id: 1}, "cart_adds", at or datetime.utcnow())
+
+
+def record_purchases(db_session, product_ids: Iterable[int], at: Optional[datetime] = None) -> None:
+    """Count one purchase per order line in the current hour (not committed)."""
+    counts = defaultdict(int)
+    for product_id in product_ids:
+        counts[product_id] += 1
+    _increment(db_session, counts, "purchases", at or datetime.utcnow())
+
+
+def top_trending(
+    db_session,
+    hours: int,
+    limit: int,
+    half_life_hours: Optional[float] = None,
+    now: Optional[datetime] = None,
+) -> List[Tuple[int, float]]:
+    """
+    (product_id, score) of the top `limit` products over the last `hours`,
+    best first. The window is aligned to whole hours, so it may include up to
+    one extra partial hour at its start. With half_life_hours, each bucket's
+    counts are weighted by 0.5 ** (age / half_life_hours).
+    """
+    now = now or datetime.utcnow()
+    current_bucket = bucket_start(now)
+    rows = (
+        db_session.query(
+            TrendingBucket.product_id,
+            TrendingBucket.bucket_start,
+            TrendingBucket.cart_adds,
+            TrendingBucket.purchases,
+        )
+        .filter(TrendingBucket.bucket_start >= bucket_start(now - timedelta(hours=hours)))
+        .all()
+    )
+
+    scores = defaultdict(float)
+    for product_id, start, cart_adds, purchases in rows:
+        score = cart_adds + TRENDING_PURCHASE_WEIGHT * purchases
+        if half_life_hours:
+            age_hours = (current_bucket - start).total_seconds() / 3600
+            score *= 0.5 ** (age_hours / half_life_hours)
+        scores[product_id] += score
+
+    # Ties go to the lower product id so results are stable
+    top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+    return [(product_id, score) for product_id, score in top if score > 0]
+
+
+def backfill_trending(db_session) -> None:
+    """Rebuild every bucket from order_items (cart adds) and placed orders (purchases)."""
+    hour = func.strftime('%Y-%m-%d %H:00:00.000000', OrderItem.added_at)
+    cart_adds = (
+        db_session.query(OrderItem.product_id, hour, func.count(OrderItem.id))
+        .group_by(OrderItem.product_id, hour)
+        .all()
+    )
+    order_hour = func.strftime('%Y-%m-%d %H:00:00.000000', Order.updated_at)
+    purchases = (
+        db_session.query(OrderItem.product_id, order_hour, func.count(OrderItem.id))
+        .join(Order, OrderItem.order_id == Order.id)
+        .filter(Order.status != "cart")
+        .group_by(OrderItem.product_id, order_hour)
+        .all()
+    )
+
+    buckets = defaultdict(lambda: {"cart_adds": 0, "purchases": 0})
+    for product_id, start, count in cart_adds:
+        buckets[(product_id, start)]["cart_adds"] = count
+    for product_id, start, count in purchases:
+        if start is not None:
+            buckets[(product_id, start)]["purchases"] = count
+
+    db_session.query(TrendingBucket).delete()
+    db_session.bulk_insert_mappings(TrendingBucket, [
+        {"product_id": product_id, "bucket_start": datetime.fromisoformat(start), **counts}
+        for (product_id, start), counts in buckets.items()
+    ])
+    db_session.commit()
+
+
+def ensure_trending_backfilled(db_session) -> None:
+    """Backfill once when the bucket table is empty but order history exists."""
+    if db_session.query(TrendingBucket.product_id).first() is None and db_session.query(OrderItem.id).first() is not None:
+        backfill_trending(db_session)